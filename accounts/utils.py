@@ -16,6 +16,48 @@ SIMULATION_POINTS = {
 }
 
 
+def simulation_points(simulation_type, energy=None):
+    """Очки за симуляцию: база по типу + 5, если энергия > 10 ТэВ"""
+    base_points = SIMULATION_POINTS.get(simulation_type, 10)
+    energy_bonus = 5 if energy and energy > 10 else 0
+    return base_points + energy_bonus
+
+
+def _rating_update(total_points):
+    """Поля пользователя, которые меняет одна симуляция"""
+    return {
+        'simulation_count': F('simulation_count') + 1,
+        'rating_score': F('rating_score') + total_points,
+        'last_simulation_time': timezone.now(),
+    }
+
+
+def _simulation_log(user, simulation_type, energy, duration, simulation_results):
+    return {
+        'user': user,
+        'simulation_type': simulation_type,
+        'energy': energy,
+        'duration': duration,
+        'simulation_results': simulation_results or [],
+    }
+
+
+def _rating_result(user, total_points, simulation_log):
+    return {
+        'success': True,
+        'points_earned': total_points,
+        'total_rating': user.rating_score,
+        'total_simulations': user.simulation_count,
+        'simulation_id': simulation_log.id
+    }
+
+
+USER_NOT_FOUND = {
+    'success': False,
+    'error': 'Пользователь не найден'
+}
+
+
 def add_simulation_rating(user, simulation_type, 
                          energy=None, duration=None, simulation_results =None):
 
@@ -23,38 +65,35 @@ def add_simulation_rating(user, simulation_type,
         try:
             user = User.objects.get(id=user)
         except User.DoesNotExist:
-            return {
-                'success': False,
-                'error': 'Пользователь не найден'
-            }
+            return dict(USER_NOT_FOUND)
 
+    total_points = simulation_points(simulation_type, energy)
 
-
-    base_points = SIMULATION_POINTS.get(simulation_type, 10)
-    energy_bonus = 5 if energy and energy > 10 else 0  # +5 если энергия > 10 ТэВ
-    
-    total_points = base_points + energy_bonus
-    
-    User.objects.filter(pk=user.pk).update(
-        simulation_count=F('simulation_count') + 1,
-        rating_score=F('rating_score') + total_points,
-        last_simulation_time=timezone.now()
-    )
-    
+    User.objects.filter(pk=user.pk).update(**_rating_update(total_points))
     simulation_log = SimulationLog.objects.create(
-        user=user,
-        simulation_type=simulation_type,
-        energy=energy,
-        duration=duration,
-        simulation_results =simulation_results  or []
+        **_simulation_log(user, simulation_type, energy, duration, simulation_results)
     )
-    
     user.refresh_from_db()
-    
-    return {
-        'success': True,
-        'points_earned': total_points,
-        'total_rating': user.rating_score,
-        'total_simulations': user.simulation_count,
-        'simulation_id': simulation_log.id
-    }
\ No newline at end of file
+
+    return _rating_result(user, total_points, simulation_log)
+
+
+async def aadd_simulation_rating(user, simulation_type,
+                                 energy=None, duration=None, simulation_results=None):
+    """Асинхронный вариант add_simulation_rating (async ORM)"""
+
+    if isinstance(user, int):
+        try:
+            user = await User.objects.aget(id=user)
+        except User.DoesNotExist:
+            return dict(USER_NOT_FOUND)
+
+    total_points = simulation_points(simulation_type, energy)
+
+    await User.objects.filter(pk=user.pk).aupdate(**_rating_update(total_points))
+    simulation_log = await SimulationLog.objects.acreate(
+        **_simulation_log(user, simulation_type, energy, duration, simulation_results)
+    )
+    await user.arefresh_from_db()
+
+    return _rating_result(user, total_points, simulation_log)
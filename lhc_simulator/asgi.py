@@ -11,6 +11,13 @@ from accounts.routing import websocket_urlpatterns
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lhc_simulator.settings')
 django.setup()
 
+from django.conf import settings
+
+if settings.SIMULATION_WARM_UP:
+    # Каталог/пул грузятся в фоне, пока сервер уже отвечает (/api/ready = 503)
+    from main.pool import start_warm_up
+    start_warm_up()
+
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AuthMiddlewareStack(
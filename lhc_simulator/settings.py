@@ -169,6 +169,65 @@ DATABASES = {
     }
 }
 
+# Пул процессов для симуляций (0 - симуляция выполняется прямо в запросе)
+SIMULATION_WORKERS = int(os.environ.get("SIMULATION_WORKERS", "0"))
+SIMULATION_QUEUE_DEPTH = int(os.environ.get("SIMULATION_QUEUE_DEPTH", str(SIMULATION_WORKERS * 4)))
+SIMULATION_TIMEOUT = float(os.environ.get("SIMULATION_TIMEOUT", "30"))
+SIMULATION_MAX_TASKS_PER_CHILD = int(os.environ.get("SIMULATION_MAX_TASKS_PER_CHILD", "1000")) or None
+# spawn - каждый воркер сам открывает снимок каталога; fork - воркеры форкаются
+# из отдельного однопоточного forkserver с уже загруженным каталогом (только
+# Unix). Веб-процесс не форкается: в нём уже работают потоки. Ограничение:
+# forkserver загружает каталог один раз при старте пула - пересобранный снимок
+# воркеры увидят только после перезапуска сервера.
+SIMULATION_START_METHOD = os.environ.get("SIMULATION_START_METHOD", "spawn")
+SIMULATION_RESERVOIR_EVENTS = int(os.environ.get("SIMULATION_RESERVOIR_EVENTS", "256"))  # 0 - без запаса; только с пулом (SIMULATION_WORKERS > 0)
+SIMULATION_RESERVOIR_MEMORY = int(os.environ.get("SIMULATION_RESERVOIR_MEMORY_MB", "16")) * 2**20
+SIMULATION_RESERVOIR_MIN_REQUESTS = int(os.environ.get("SIMULATION_RESERVOIR_MIN_REQUESTS", "8"))  # запросов до первого пополнения
+SIMULATION_RESERVOIR_MAX_CONFIGS = int(os.environ.get("SIMULATION_RESERVOIR_MAX_CONFIGS", "256"))
+SIMULATION_WARM_UP = os.environ.get("SIMULATION_WARM_UP", "True") == "True"  # прогрев при старте ASGI
+SIMULATION_WARM_UP_TIMEOUT = float(os.environ.get("SIMULATION_WARM_UP_TIMEOUT", "120"))  # дольше - пул в состоянии failed
+
+# Профили запросов сотрудников (?profile=1): сколько функций в профиле и
+# сколько последних профилей хранить
+SIMULATION_PROFILE_TOP = int(os.environ.get("SIMULATION_PROFILE_TOP", "25"))
+SIMULATION_PROFILE_KEEP = int(os.environ.get("SIMULATION_PROFILE_KEEP", "100"))
+
+# /metrics отдаётся только с этих адресов (и не через прокси)
+METRICS_ALLOWED_IPS = os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+
+# Журнал симулятора: уровень (DEBUG - записи по каждой стадии события) и
+# предел записей в секунду на логгер (0 - без ограничения)
+SIMULATION_LOG_LEVEL = os.environ.get("SIMULATION_LOG_LEVEL", "DEBUG" if DEBUG else "INFO")
+SIMULATION_LOG_RATE = float(os.environ.get("SIMULATION_LOG_RATE", "50"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "sampled": {"()": "main.logs.SampledFilter", "rate": SIMULATION_LOG_RATE},
+    },
+    "formatters": {
+        "structured": {
+            "()": "main.logs.StructuredFormatter",
+            "format": "%(asctime)s %(levelname)s %(name)s %(message)s",
+        },
+    },
+    "handlers": {
+        "simulation": {
+            "class": "main.logs.BackgroundHandler",
+            "filters": ["sampled"],
+            "formatter": "structured",
+        },
+    },
+    "loggers": {
+        "main": {
+            "handlers": ["simulation"],
+            "level": SIMULATION_LOG_LEVEL,
+            "propagate": False,
+        },
+    },
+}
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels.layers.InMemoryChannelLayer",
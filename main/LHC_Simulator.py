@@ -1,13 +1,20 @@
-import sys
 import os
-import pdg
-import shutil
-import random
-from math import *
+import time
+import logging
+import threading
+from math import ceil, floor, inf, log, log10, log1p, sqrt
 import numpy as np
-from collections import defaultdict
-from particle import Particle
+from collections import OrderedDict
+from itertools import combinations, combinations_with_replacement
 from functools import lru_cache
+from dataclasses import dataclass, replace
+
+from . import catalog
+from . import metrics
+from .sampling import AliasTable
+from .formats import ANIMATION_TYPES   # номера типов - часть двоичного формата ответа
+
+logger = logging.getLogger(__name__)
 
 # ============================================================================
 # ИНИЦИАЛИЗАЦИЯ PDG API
@@ -19,13 +26,22 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # pdg.sqlite лежит рядом с этим файлом
 os.environ["PDG_DATA"] = BASE_DIR
 
-# создаётся ОДИН РАЗ на worker
-api = pdg.connect()
+# Подключение к PDG-базе открывается только при первом обращении: при
+# загрузке из снимка (и в manage.py, админке и т.п.) pdg, particle и
+# sqlalchemy не импортируются вовсе
+@lru_cache(maxsize=1)
+def get_pdg_api():
+    """PDG API (создаётся ОДИН РАЗ на процесс)"""
+    import pdg
+    return pdg.connect()
 
 # Глобальный кэш для частиц
 _particle_cache = {}
-PARTICLE_VALUES = {}
-RESONANCE_DECAYS = {}
+PARTICLES = catalog.ParticleTable()
+DECAYS = catalog.DecayTable()
+
+# Частицы-партнёры резонанса (нерезонансные), сгруппированные по квантовым числам
+PARTNERS = catalog.QuantumIndex()
 
 LEPTON_NUM = {
     # Электронное семейство
@@ -58,7 +74,8 @@ GAMMA_C = 0.01
 GAMMA_B = 0.001
 
 MIN_MASS = 0.01
-MAX_MASS_FRACTION = 0.7
+MAX_MASS_FRACTION = 0.7         # сорта частиц: не тяжелее 0.7 √s (как в generate_weight)
+RESONANCE_MASS_FRACTION = 0.9   # резонансы hadron-hadron: легче 0.9 √s (как в исходном генераторе)
 
 # ============================================================================
 # УТИЛИТЫ (с кэшированием)
@@ -86,14 +103,15 @@ def lepton_num(id):
     except:
         return 0
 
-@lru_cache(maxsize=1000)
 def get_particle_quarks(mcid):
-    """Кэшированное получение кварков частицы"""
-    try:
-        item = Particle.from_pdgid(mcid)
-        return item.quarks
-    except:
-        return ""
+    """
+    Валентные кварки частицы: счётчики по ароматам catalog.QUARK_FLAVOURS
+
+    Берутся из таблицы, для частиц вне каталога - из цифр mcid.
+    """
+    if mcid in PARTICLES:
+        return PARTICLES.valence_of(mcid)
+    return catalog.quark_content([mcid])[1][0]
 
 
 @lru_cache(maxsize=1000)
@@ -108,16 +126,6 @@ def is_resonance(name):
     return any(marker in name for marker in resonance_markers)
 
 
-@lru_cache(maxsize=1000)
-def get_baryon_number(mcid):
-    """Вычисление барионного числа с кэшированием"""
-    try:
-        quarks = get_particle_quarks(mcid)
-        count = sum(-1 if q.isupper() else 1 for q in quarks)
-        return count / 3
-    except:
-        return 0
-    
 @lru_cache(maxsize=1000)
 def get_lepton_numbers(mcid):
     """
@@ -131,76 +139,149 @@ def get_lepton_numbers(mcid):
     else:
         return {'e': 0, 'mu': 0, 'tau': 0}
     
-@lru_cache(maxsize=1000)
-def get_quark_number(mcid, quark):
-    """Вычисление квантового числа для кварка с кэшированием"""
-    try:
-        quarks = get_particle_quarks(mcid)
-        count = 0
-        
-        for q in quarks:
-            if q.lower() == quark:
-                if q.islower():  # кварк
-                    count += -1 if quark == 's' else 1
-                else:  # антикварк
-                    count += 1 if quark == 's' else -1
-        
-        return count
-    except:
-        return 0
-    
-@lru_cache(maxsize=1000)
-def GetAnimationType(info): # info = [A, B, C, D]
 
-    types = []
-    names = []
-    IType = ''
+@lru_cache(maxsize=1000)
+def animation_type(products):
+    """Тип анимации для кортежа mcid продуктов (без вывода)"""
     try:
-        for i in info:
-            p = PARTICLE_VALUES[i]['type']
-            if PARTICLE_VALUES[i]['Name'] is not None:
-                n = PARTICLE_VALUES[i]['Name']
-            types.append(p)
-            names.append(n)
-    except:
+        types = [PARTICLES.type_of(i) for i in products]
+        names = [PARTICLES.name_of(i) for i in products]
+    except KeyError:
         return "Standard"
 
-    print(names)
-    print('\n',types)
-
     if all(x in {"lepton"} for x in types):
-        IType = "Muon Event"
-    elif "higgs" in names:
-        IType = "Higgs Boson"
+        return "Muon Event"
+    elif 25 in products:        # в каталоге бозон Хиггса называется "H"
+        return "Higgs Boson"
     elif "W+" in names or "W-" in names or "Z0" in names:
-        IType = "W/Z Boson"
+        return "W/Z Boson"
     elif all(x in {"meson", "baryon", "hadron"} for x in types):
-        IType = "Jet Event"
-    else:
-        IType = "Standard"
-    
-    return IType
+        return "Jet Event"
+    return "Standard"
 
-    
 
-        
+def GetAnimationType(info): # info = [A, B, C, D]
+    info = tuple(info)
+    if logger.isEnabledFor(logging.DEBUG):
+        try:
+            logger.debug("Типы продуктов", extra={
+                "stage": "animation",
+                "names": [PARTICLES.name_of(i) for i in info],
+                "types": [PARTICLES.type_of(i) for i in info],
+            })
+        except KeyError:
+            pass
+    return animation_type(info)
 
 
+# ============================================================================
+# ЗАГРУЗКА ЧАСТИЦ (ОПТИМИЗИРОВАННАЯ)
+# ============================================================================
 
-            
+def load_particles(use_snapshot=True):
+    """
+    Загрузка частиц (из снимка каталога, если он собран)
 
+    Снимок собирается командой `python manage.py build_catalog`.
+    Если снимка нет, он собирается из PDG-базы, записывается и открывается
+    заново: таблицы всех процессов отображают одни и те же файлы.
+    """
+    if use_snapshot:
+        snapshot = catalog.open_snapshot()
+        if snapshot is None:
+            logger.warning("Снимок каталога не найден, сборка из PDG-базы")
+            try:
+                build_catalog_snapshot()
+            except OSError as e:
+                # Снимок записать некуда - работаем с таблицами в памяти процесса
+                logger.warning("Снимок не записан: %s", e)
+                return catalog_particles()
+            snapshot = catalog.open_snapshot()
+        if snapshot is not None:
+            return load_particles_from_snapshot(snapshot)
 
+    return load_particles_from_pdg()
 
-# ============================================================================
-# ЗАГРУЗКА ЧАСТИЦ (ОПТИМИЗИРОВАННАЯ)
-# ============================================================================
 
-def load_particles():
+def load_particles_from_snapshot(snapshot):
+    """Заполнение таблиц из снимка каталога (без обращения к PDG)"""
+    PARTICLES.load(snapshot.arrays, snapshot.names, snapshot.types, snapshot.spins)
+    DECAYS.load(snapshot.arrays, PARTICLES)
+    PARTNERS.load_columns(snapshot.arrays)
+
+    reset_samplers()
+
+    particles, resonances = catalog_particles()
+    logger.info("Снимок %s: %d частиц, %d резонансов", snapshot.path, len(particles), len(resonances))
+    return particles, resonances
+
+
+def catalog_particles():
+    """Лёгкие CatalogParticle для всех строк PARTICLES: (частицы, резонансы)"""
+    particles = []
+    resonances = []
+    _particle_cache.clear()
+
+    for i, mcid in enumerate(PARTICLES.mcid.tolist()):
+        particle = catalog.CatalogParticle(
+            mcid=mcid,
+            name=PARTICLES.names[i],
+            mass=float(PARTICLES.mass[i]),
+            charge=PARTICLES.charge3[i] / 3,
+            width=float(PARTICLES.width[i]),
+            quantum_J=PARTICLES.spins[i],
+            flags=int(PARTICLES.flags[i]),
+        )
+        _particle_cache[mcid] = particle
+
+        if PARTICLES.resonance[i]:
+            resonances.append(particle)
+        else:
+            particles.append(particle)
+
+    return particles, resonances
+
+
+def release_pdg_objects():
+    """
+    Освободить объекты PDG API после переноса данных в таблицы
+
+    Их держат _particle_cache, кэши safe_mass/safe_charge и само подключение.
+    """
+    _particle_cache.clear()
+    safe_mass.cache_clear()
+    safe_charge.cache_clear()
+    get_pdg_api.cache_clear()
+
+
+def resolve_decay_channels(branching_fractions):
+    """
+    Каналы распада в виде [(mcid продуктов, доля), ...]
+
+    Каналы, продукты которых не сводятся к конкретной частице, отбрасываются.
+    """
+    channels = []
+    for branching in branching_fractions:
+        try:
+            products = [p.item.particle.mcid for p in branching.decay_products]
+        except Exception as e:
+            metrics.swallowed("resolve_decay_channels", e)
+            continue
+        if None in products:
+            continue
+        channels.append((products, branching.value))
+    return channels
+
+
+def load_particles_from_pdg():
     """Быстрая загрузка частиц из базы данных"""
-    print("% Загрузка частиц из базы...")
+    logger.info("Загрузка частиц из базы PDG")
     particles = []
     resonances = []
+    rows = {}
+    decays = {}
     Type = ''
+    api = get_pdg_api()
     # Получаем все частицы одним запросом
     all_pdgids = list(api.get_particles())
     
@@ -233,37 +314,69 @@ def load_particles():
                 lepton_nums = get_lepton_numbers(particle.mcid)
 
                 name = particle.name if hasattr(particle, "name") else None
+                resonance = bool(is_resonance(particle.name) or (particle.width and particle.width > 0))
 
-                PARTICLE_VALUES[particle.mcid] = {
+                rows[particle.mcid] = {
+                        "mcid": particle.mcid,
                         "mass": safe_mass(particle),
-                        "charge": safe_charge(particle),
-                        "baryon": get_baryon_number(particle.mcid),
-                        "s": get_quark_number(particle.mcid, "s"),
-                        "c": get_quark_number(particle.mcid, "c"),
-                        "b": get_quark_number(particle.mcid, "b"),
-                        "J": particle.quantum_J,
+                        "charge3": round(3 * (safe_charge(particle) or 0.0)),
+                        "width": particle.width or 0.0,
                         "L_e": lepton_nums['e'],
                         "L_mu": lepton_nums['mu'],
                         "L_tau": lepton_nums['tau'],
+                        "flags": catalog.particle_flags(particle),
+                        "resonance": resonance,
 
+                        "J": particle.quantum_J,
                         "type": Type,
                         "Name": name
                     }
                 
                 # Разделяем на частицы и резонансы
-                if is_resonance(particle.name) or (particle.width and particle.width > 0):
+                if resonance:
                     resonances.append(particle)
                     bf = api.get_particle_by_name(particle.name).exclusive_branching_fractions()
-                    if bf:
-                        RESONANCE_DECAYS[particle.mcid] = bf
+                    channels = resolve_decay_channels(bf)
+                    if channels:
+                        decays[particle.mcid] = channels
                 else:
                     particles.append(particle)
         except BaseException as es:
-            print(es)
+            logger.debug("Запись PDG пропущена: %s", es)
+            metrics.swallowed("load_particles_from_pdg", es)
             continue
     
-    print(f"\n$ Загружено {len(particles)} частиц, {len(resonances)} резонансов")
-    return particles, resonances
+    values = list(rows.values())
+    # baryon3/s/c/b и валентные кварки ParticleTable вычисляет сама по mcid
+    computed = ("qkey", "baryon3", "s", "c", "b")
+    PARTICLES.load(
+        {name: [v[name] for v in values] for name in catalog.PARTICLE_ARRAYS if name not in computed},
+        names=[v["Name"] for v in values],
+        types=[v["type"] for v in values],
+        spins=[v["J"] for v in values],
+    )
+    DECAYS.load(catalog.DecayTable.columns_from_channels(decays), PARTICLES)
+    PARTNERS.load(PARTICLES, np.flatnonzero(~PARTICLES.resonance))
+
+    logger.info("Загружено %d частиц, %d резонансов", len(particles), len(resonances))
+
+    reset_samplers()
+
+    # Всё нужное уже в таблицах - объекты PDG больше не держим
+    release_pdg_objects()
+    return catalog_particles()
+
+
+def build_catalog_snapshot(root=catalog.SNAPSHOT_ROOT):
+    """Собрать снимок каталога из PDG-базы"""
+    api = get_pdg_api()
+    source = {
+        "pdg_edition": str(api.edition),
+        "database": api.database_url if hasattr(api, "database_url") else None,
+    }
+    del api
+    load_particles_from_pdg()
+    return catalog.write_snapshot(PARTICLES, DECAYS, PARTNERS, source=source, root=root)
 
 
 # ============================================================================
@@ -282,148 +395,195 @@ def calculate_temperature(sqrt_s):
         return T_base * 1.2
 
 
-def generate_weight(particle, sqrt_s, interaction_type='hadron-hadron'):
-    
-    m = safe_mass(particle)
-    
-    # Быстрые фильтры
-    if m > sqrt_s * MAX_MASS_FRACTION:
-        return 0.0
-    
-    try:
-        T = 0.16
-        gamma_s = 0.3
-        gamma_c = 0.001
-        
-        J = particle.quantum_J
-        
-        # Базовый вес
-        if (particle.is_baryon or particle.is_meson):
-            quarks = get_particle_quarks(particle.mcid)
-            n_s = quarks.count('s') + quarks.count('S')
-            n_c = quarks.count('c') + quarks.count('C')
-            weight = (2 * J + 1) * exp(-m / T) * (gamma_s ** n_s) * (gamma_c ** n_c)
-            
-            # Усиление для протонов и нейтронов
-            if particle.mcid in [2212, 2112]:
-                weight *= 5
-        
-        elif particle.is_lepton:
-            # Лептоны легче рождаются
-            weight = (2 * J + 1) * exp(-m / T) * 2.0
-        
-        elif particle.is_boson:
-            # Бозоны рождаются реже (кроме фотонов)
-            if particle.mcid == 22:  # фотон
-                weight = exp(-m / T) * 10.0
-            else:
-                weight = exp(-m / T) * 0.1
-        
-        else:
-            weight = 0.0
-        
-        # НОВОЕ: модификация веса в зависимости от типа взаимодействия
-        if interaction_type == 'hadron-lepton':
-            # При глубоконеупругом рассеянии предпочтительны кварки/глюоны
-            if (particle.is_baryon or particle.is_meson):
-                weight *= 2.0  # адроны рождаются чаще
-        
-        elif interaction_type == 'lepton-lepton':
-            # e+e- → μ+μ-, τ+τ-, адроны
-            if particle.is_lepton:
-                weight *= 3.0
-            elif particle.is_boson and particle.mcid == 22:
-                weight *= 5.0  # фотоны
-        
-        return weight if weight >= 1e-12 else 0.0
-        
-    except:
-        return 0.0
+# ============================================================================
+# ВЫБОР СОРТОВ ЧАСТИЦ ПО СТАТИСТИЧЕСКОЙ МОДЕЛИ
+# ============================================================================
+#
+# Веса зависят от √s только через температуру и порог по массе. Пулы
+# кандидатов каждого генератора отсортированы по массе один раз, так что
+# порог по массе для любого √s - один бинарный поиск (номер среза). Веса
+# считаются сразу для всего каталога на температуру, а таблицы псевдонимов
+# (выбор сорта частицы за O(1)) - на (пул, срез, температура) и хранятся в
+# ограниченном LRU-кэше: энергии с тем же срезом и все энергии выше 20 ГэВ
+# (постоянная температура) делят одну таблицу.
+#
+# Больцмановский множитель тяжёлых состояний (W, Z, H, t, B, Υ при T ≈ 0.19)
+# исчезающе мал или равен нулю в double. Такие сорта не выбрасываются: в
+# таблице вес каждого не меньше MIN_RELATIVE_WEIGHT от наибольшего в пуле,
+# поэтому они выпадают редко, но выпадают, и проверяются в проходе по
+# оставшимся резонансам.
+
+SQRT_S_BINS_PER_DECADE = 50
+SAMPLER_CACHE_SIZE = 64
+MIN_RELATIVE_WEIGHT = 1e-3
+
+
+def sqrt_s_bin(sqrt_s):
+    """Номер интервала √s на логарифмической сетке"""
+    return int(floor(log10(max(sqrt_s, 1e-3)) * SQRT_S_BINS_PER_DECADE))
+
+
+def bin_sqrt_s(bin_index):
+    """Нижняя граница интервала (порог по массе не завышается)"""
+    return 10 ** (bin_index / SQRT_S_BINS_PER_DECADE)
+
 
+def bin_temperature(bin_index):
+    return calculate_temperature(bin_sqrt_s(bin_index))
 
-def get_weights(particles_list, sqrt_s, interaction_type='hadron-hadron'):
+
+@lru_cache(maxsize=SAMPLER_CACHE_SIZE)
+def thermal_weights(interaction_type, T):
     """
-    Вычисление весов для списка частиц
-    
-    НОВОЕ: учитывает тип взаимодействия
+    Статистические веса всех строк PARTICLES при температуре T
+
+    Порог по массе сюда не входит - он задаётся срезом пула (pool_cut),
+    нижняя граница веса - таблицей пула (pool_sampler).
+
+    Returns:
+        массив длины len(PARTICLES) (только для чтения); 0 - не адрон,
+        не лептон и не бозон или exp(-m/T) меньше наименьшего double
     """
-    valid_particles = []
-    weights = []
-    
-    for particle in particles_list:
-        w = generate_weight(particle, sqrt_s, interaction_type)
-        if w > 0:
-            valid_particles.append(particle)
-            weights.append(w)
-    
-    if not valid_particles:
-        raise ValueError("Нет доступных частиц для данной энергии")
-    
-    weights = np.array(weights, dtype=np.float64)
-    noise = np.random.normal(1.0, 0.1, len(weights))
-    weights *= np.clip(noise, 0.5, 2.0)
-    probabilities = weights / np.sum(weights)
-    
-    return probabilities, valid_particles
+    flags = PARTICLES.flags
+    hadron = (flags & (catalog.FLAG_BARYON | catalog.FLAG_MESON)) != 0
+    lepton = ~hadron & ((flags & catalog.FLAG_LEPTON) != 0)
+    boson = ~hadron & ~lepton & ((flags & catalog.FLAG_BOSON) != 0)
+    photon = PARTICLES.mcid == 22
+
+    boltzmann = PARTICLES.degeneracy * np.exp(-PARTICLES.mass / T)
+    valence = PARTICLES.valence.astype(np.float64)
+    flavour = catalog.QUARK_FLAVOURS
+    suppression = (
+        GAMMA_S ** valence[:, flavour.index("s")]
+        * GAMMA_C ** valence[:, flavour.index("c")]
+        * GAMMA_B ** valence[:, flavour.index("b")]
+    )
+
+    weights = np.zeros(len(PARTICLES), dtype=np.float64)
+    weights[hadron] = (boltzmann * suppression)[hadron]
+    # Усиление для протонов и нейтронов
+    weights[hadron & np.isin(PARTICLES.mcid, (2212, 2112))] *= 5
+    # Лептоны легче рождаются
+    weights[lepton] = 2.0 * boltzmann[lepton]
+    # Бозоны рождаются реже (кроме фотонов), спин не учитывается
+    weights[boson] = (np.exp(-PARTICLES.mass / T) * np.where(photon, 10.0, 0.1))[boson]
+
+    # Модификация веса в зависимости от типа взаимодействия
+    if interaction_type == 'hadron-lepton':
+        # При глубоконеупругом рассеянии адроны рождаются чаще
+        weights[hadron] *= 2.0
+    elif interaction_type == 'lepton-lepton':
+        # e+e- → μ+μ-, τ+τ-, фотоны
+        weights[lepton] *= 3.0
+        weights[photon] *= 5.0
+
+    weights.flags.writeable = False
+    return weights
+
+
+def species_pool(interaction_type):
+    """Строки PARTICLES, из которых генератор выбирает сорта частиц"""
+    if interaction_type == 'hadron-hadron':
+        # резонансы с разрешёнными каналами распада
+        return PARTICLES.rows(DECAYS.ranges)
+    rows = np.flatnonzero(~PARTICLES.resonance)
+    if interaction_type == 'hadron-lepton':
+        # одиночные кварки, мезоны и бесцветные частицы
+        return rows[PARTICLES.valence[rows].sum(axis=1) <= 2]
+    # адроны для аннигиляции лептонов
+    hadron = catalog.FLAG_BARYON | catalog.FLAG_MESON
+    return rows[(PARTICLES.flags[rows] & hadron) != 0]
+
+
+@lru_cache(maxsize=None)
+def candidate_pool(interaction_type):
+    """Пул species_pool, отсортированный по массе: (строки, массы)"""
+    rows = species_pool(interaction_type)
+    rows = rows[np.argsort(PARTICLES.mass[rows], kind="stable")]
+    return rows, np.asarray(PARTICLES.mass[rows], dtype=np.float64)
+
+
+def mass_fraction(interaction_type):
+    """Доля √s, до которой сорт частицы попадает в пул генератора"""
+    return RESONANCE_MASS_FRACTION if interaction_type == 'hadron-hadron' else MAX_MASS_FRACTION
+
+
+def pool_cut(interaction_type, mass_limit):
+    """Сколько первых строк пула имеют массу не больше mass_limit"""
+    return int(np.searchsorted(candidate_pool(interaction_type)[1], mass_limit, side="right"))
+
+
+def species_sampler(interaction_type, sqrt_s):
+    """Таблица псевдонимов для √s (из кэша)"""
+    cut = pool_cut(interaction_type, sqrt_s * mass_fraction(interaction_type))
+    return pool_sampler(interaction_type, cut, bin_temperature(sqrt_s_bin(sqrt_s)))
+
+
+def floor_weights(weights):
+    """Веса не меньше MIN_RELATIVE_WEIGHT от наибольшего (все нулевые - поровну)"""
+    top = weights.max() if len(weights) else 0.0
+    if top <= 0:
+        return np.ones(len(weights))
+    return np.maximum(weights, top * MIN_RELATIVE_WEIGHT)
+
+
+@lru_cache(maxsize=SAMPLER_CACHE_SIZE)
+def pool_sampler(interaction_type, cut, T):
+    """Таблица псевдонимов по первым cut строкам пула с весами thermal_weights"""
+    rows = candidate_pool(interaction_type)[0][:cut]
+    return AliasTable(rows, floor_weights(thermal_weights(interaction_type, T)[rows]))
+
+
+def reset_samplers():
+    """Сбросить пулы и кэши весов (после перезагрузки каталога)"""
+    candidate_pool.cache_clear()
+    thermal_weights.cache_clear()
+    pool_sampler.cache_clear()
+    channel_thresholds.cache_clear()
+    channel_fractions.cache_clear()
+    channel_floor.cache_clear()
+    fragment_combinations.cache_clear()
+    hadron_combinations.cache_clear()
+    threshold_sqrt_s.cache_clear()
 
 
 # ============================================================================
 # ПРОВЕРКА ЗАКОНОВ СОХРАНЕНИЯ (ОПТИМИЗИРОВАНО)
 # ============================================================================
 
+# Сколько кандидатов проверяется за одно обращение к check_conservation_batch
+ATTEMPT_CHUNK = 512
+
+
+def check_conservation_batch(rows, initial_state, sqrt_s):
+    """
+    Проверка законов сохранения сразу для набора кандидатов
+
+    Args:
+        rows: 2-D массив строк PARTICLES, одна строка массива = один кандидат;
+              короткие кандидаты дополняются -1
+        initial_state: квантовые числа начального состояния
+        sqrt_s: энергия в системе центра масс
+
+    Returns:
+        булев массив: какие кандидаты удовлетворяют законам сохранения
+    """
+    with metrics.timer("conservation"):
+        # Строка -1 указывает на нулевой элемент-заглушку в конце padded_*
+        masses = PARTICLES.padded_mass[rows].sum(axis=1)
+        keys = PARTICLES.padded_qkey[rows].sum(axis=1)
+
+        # Все квантовые числа сохраняются <=> сумма упакованных ключей совпадает
+        return (masses <= sqrt_s * 1.1) & (keys == catalog.state_key(initial_state))
+
+
 def check_conservation(particles, initial_state, sqrt_s):
     """
     Быстрая проверка законов сохранения
     """
-    # Создание массивов нужных свойств
-    masses = np.array([PARTICLE_VALUES[p.mcid]['mass'] for p in particles])
-    charges = np.array([PARTICLE_VALUES[p.mcid]['charge'] for p in particles])
-    baryons = np.array([PARTICLE_VALUES[p.mcid]['baryon'] for p in particles])
-    strangenesses = np.array([PARTICLE_VALUES[p.mcid]['s'] for p in particles])
-    charms = np.array([PARTICLE_VALUES[p.mcid]['c'] for p in particles])
-    bottoms = np.array([PARTICLE_VALUES[p.mcid]['b'] for p in particles])
-    L_e = np.array([PARTICLE_VALUES[p.mcid]['L_e'] for p in particles])
-    L_mu = np.array([PARTICLE_VALUES[p.mcid]['L_mu'] for p in particles])
-    L_tau = np.array([PARTICLE_VALUES[p.mcid]['L_tau'] for p in particles])
-    
-    # Выполняем суммирование
-    total_mass = np.sum(masses)
-    final_state = {
-        'charge': np.sum(charges),
-        'baryon': np.sum(baryons),
-        'strangeness': np.sum(strangenesses),
-        'charm': np.sum(charms),
-        'bottom': np.sum(bottoms),
-        'L_e': np.sum(L_e),
-        'L_mu': np.sum(L_mu),
-        'L_tau': np.sum(L_tau),
-    }
-    
-    # Кинематика
-    if total_mass > sqrt_s * 1.1:
-        return False
-    
-    # Квантовые числа
-    tolerance = 1e-9
-    for key in initial_state:
-        if abs(final_state[key] - initial_state[key]) > tolerance:
-            return False
-    
-    return True
+    rows = PARTICLES.rows(p.mcid for p in particles)
+    return bool(check_conservation_batch(rows[np.newaxis, :], initial_state, sqrt_s)[0])
 
-"""    total_mass = 0.0
-    final_state = defaultdict(float)
-    total_mass = np.sum([safe_mass(p.mcid) for p in particles])
-    
-    for particle in particles:
-        mcid = particle.mcid
-        total_mass += safe_mass(particle)
-        final_state['charge'] += safe_charge(particle)
-        final_state['baryon'] += get_baryon_number(mcid)
-        final_state['strangeness'] += get_quark_number(mcid, 's')
-        final_state['charm'] += get_quark_number(mcid, 'c')
-        final_state['bottom'] += get_quark_number(mcid, 'b')
-    import numpy as np"""
 
 def is_valid_final_state(particles):
     """Проверка что все частицы - барионы или мезоны"""
@@ -431,395 +591,928 @@ def is_valid_final_state(particles):
 
 def get_interaction_type(id1, id2):
 
-    type1 = PARTICLE_VALUES[id1]['type']
-    type2 = PARTICLE_VALUES[id2]['type']
+    type1 = PARTICLES.type_of(id1)
+    type2 = PARTICLES.type_of(id2)
     
     types = {type1, type2}
     
     # Адрон + Адрон
     if types <= {'baryon', 'meson'}:
-        print('hh')
         return 'hadron-hadron'
     
     
     # Адрон + Лептон (глубоконеупругое рассеяние)
     if types == {'baryon', 'lepton'} or types == {'meson', 'lepton'}:
-        print('hl')
         return 'hadron-lepton'
     
     # Лептон + Лептон
     if types == {'lepton'}:
-        print('ll')
         return 'lepton-lepton'
     
     # Адрон + Бозон
     if ('baryon' in types or 'meson' in types) and 'gauge_boson' in types:
-        print('hb')
         return 'hadron-boson'
     
     # Лептон + Бозон
     if types == {'lepton', 'gauge_boson'}:
-        print('hh')
         return 'lb'
     
     return 'unknown'
 
-def generate_hadron_hadron_event(id1, id2, sqrt_s, initial_state, particles_all, resonances):
+# ============================================================================
+# ГЕНЕРАТОРЫ СЛУЧАЙНЫХ ЧИСЕЛ
+# ============================================================================
+#
+# Каждая симуляция получает собственный numpy.random.Generator от
+# SeedSequence(seed): общее состояние random/np.random не используется, а по
+# зерну событие воспроизводится в точности. Пакет делится на блоки по
+# STREAM_BLOCK событий с независимыми дочерними потоками
+# SeedSequence(seed, spawn_key=(блок,)) - блок разыгрывается одинаково
+# независимо от размера пакета и от того, какой процесс его считает.
+
+SEED_BITS = 53      # зерно точно представимо в JSON (и в JavaScript)
+STREAM_BLOCK = 64
+
+
+def new_seed():
+    """Случайное зерно из энтропии ОС"""
+    state = np.random.SeedSequence().generate_state(1, np.uint64)[0]
+    return int(state >> np.uint64(64 - SEED_BITS))
+
 
-    valid_resonances = [r for r in resonances if PARTICLE_VALUES[r.mcid]['mass'] < sqrt_s * 0.9]
+def normalize_seed(seed):
+    """Зерно из запроса (None - новое случайное)"""
+    if seed is None:
+        return new_seed()
+    if isinstance(seed, bool) or not isinstance(seed, int) or not 0 <= seed < 2 ** SEED_BITS:
+        raise ValueError(f"seed must be an integer in [0, 2**{SEED_BITS})")
+    return seed
+
+
+def make_rng(seed, block=None):
+    """Генератор для зерна (block - номер дочернего потока пакета)"""
+    if block is None:
+        return np.random.default_rng(np.random.SeedSequence(seed))
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,)))
+
+
+# ============================================================================
+# ГЕНЕРАТОРЫ СОБЫТИЙ
+# ============================================================================
+#
+# Каждый генератор разделён на подготовку (setup_*: всё, что зависит только
+# от конфигурации пучков) и розыгрыш одного события (generate_*_event:
+# только случайные выборки и операции с массивами). Розыгрыш возвращает
+# (mcid продуктов, mcid первой частицы, mcid второй частицы) или None.
+
+
+@dataclass
+class Collision:
+    """Параметры столкновения, общие для всех событий одной конфигурации"""
+    id1: int
+    id2: int
+    beam_energy: float
+    sqrt_s: float
+    initial_state: dict
+    initial_key: int
+    tracks_count: int
+    momentum: float
+    interaction_type: str
+    m1: float = 0.0
+    m2: float = 0.0
+
+
+def kinematics(m1, m2, beam_energy):
+    """(√s, momentum) для масс частиц и энергии пучка"""
+    s = m1**2 + m2**2 + 2 * m2 * beam_energy
+    E1 = sqrt(beam_energy**2 + m1**2)
+    E2 = sqrt(beam_energy**2 + m2**2)
+    return sqrt(max(0.1, s)), abs(E1 - E2)
+
+
+def prepare_collision(id1, id2, beam_energy):
+    """Кинематика и квантовые числа начального состояния"""
+    m1 = PARTICLES.mass_of(id1)
+    m2 = PARTICLES.mass_of(id2)
+    sqrt_s, momentum = kinematics(m1, m2, beam_energy)
     
-    if not valid_resonances:
-        return None
+    # Квантовые числа начального состояния
+    initial = PARTICLES.quantum_of(id1) + PARTICLES.quantum_of(id2)
+
+    return Collision(
+        id1=id1,
+        id2=id2,
+        beam_energy=beam_energy,
+        sqrt_s=sqrt_s,
+        initial_state=catalog.quantum_state(initial),
+        initial_key=int(catalog.pack_quantum(initial)),
+        tracks_count=int(PARTICLES.charge_of(id1)) + int(PARTICLES.charge_of(id2) != 0),
+        momentum=momentum,
+        interaction_type=get_interaction_type(id1, id2),
+        m1=m1,
+        m2=m2,
+    )
+
+
+def collision_at(collision, beam_energy):
+    """То же столкновение при другой энергии пучка (без обращения к каталогу)"""
+    sqrt_s, momentum = kinematics(collision.m1, collision.m2, beam_energy)
+    return replace(collision, beam_energy=beam_energy, sqrt_s=sqrt_s, momentum=momentum)
+
+
+def rows_to_particles(rows):
+    """Строки PARTICLES (без заглушек -1) -> объекты частиц"""
+    return [_particle_cache[m] for m in PARTICLES.mcid[rows[rows >= 0]].tolist()]
+
+
+def sample_distinct_rows(sampler, n, rng):
+    """
+    n кандидатов по 2-3 строки из таблицы псевдонимов sampler
+
+    Returns:
+        (массив (n, 3) с -1 в третьем столбце у пар, маска кандидатов
+        из различных строк)
+    """
+    if len(sampler) < 2:
+        return np.full((n, 3), -1, dtype=np.int64), np.zeros(n, dtype=bool)
+
+    result = sampler.draw(rng, (n, 3))
+    triple = rng.random(n) < 0.5
+    distinct = (result[:, 0] != result[:, 1]) & (
+        ~triple | ((result[:, 2] != result[:, 0]) & (result[:, 2] != result[:, 1]))
+    )
+    result[:, 2] = np.where(triple, result[:, 2], -1)
+    return result, distinct
+
+
+def setup_hadron_hadron(collision, particles_all, resonances):
+
+    # Резонансы без разрешённых каналов распада не участвуют вовсе;
+    # остальные выбираются с весами статистической модели
+    bin_index = sqrt_s_bin(collision.sqrt_s)
+    sampler = species_sampler(collision.interaction_type, collision.sqrt_s)
     
-    for _ in range(10000):
-        try:
-            chosen_particle = random.choice(particles_all)
-            chosen_resonance = random.choice(valid_resonances)
-            
-            branching_fractions = api.get_particle_by_name(chosen_resonance.name).exclusive_branching_fractions()
-            if not branching_fractions:
-                continue
-            
-            for branching in branching_fractions:
-                try:
-                    decay_products = [p.item.particle for p in branching.decay_products]
-                    final_products = decay_products + [chosen_particle]
-                    
-                    if check_conservation(final_products, initial_state, sqrt_s) and is_valid_final_state(final_products):
-                        return final_products, chosen_particle, chosen_resonance
-                except:
-                    continue
-        except:
+    if not len(sampler):
+        return None
+
+    return {
+        "resonances": sampler,
+        "weights": thermal_weights(collision.interaction_type, bin_temperature(bin_index)),
+        "initial_key": collision.initial_key,
+        "mass_budget": collision.sqrt_s * 1.1,
+    }
+
+
+def generate_hadron_hadron_event(setup, rng, budget):
+
+    # Вместо перебора случайных пар (частица, канал) для каждого канала
+    # ищем в индексе ровно те частицы, которые дополняют его до начального
+    # состояния и укладываются в бюджет по массе
+    sampler = setup["resonances"]
+    weights = setup["weights"]
+    mass_budget = setup["mass_budget"]
+
+    # Резонансы выбираются с весами (таблица псевдонимов); каждый
+    # проверяется один раз
+    tried = set()
+    for row in sampler.draw(rng, min(ATTEMPT_CHUNK, len(sampler))).tolist():
+        if row in tried:
             continue
+        tried.add(row)
+        if not budget.take(1):
+            return None
+        result = try_resonance(int(PARTICLES.mcid[row]), setup["initial_key"], mass_budget, weights, rng)
+        if result is not None:
+            return result
+
+    # Редкие резонансы, до которых выборка не дошла: все оставшиеся в
+    # случайном порядке с теми же весами (экспоненциальные ключи)
+    order = np.argsort(rng.exponential(size=len(sampler)) / sampler.weights)
+    for row in sampler.rows[order].tolist():
+        if row in tried:
+            continue
+        if not budget.take(1):
+            return None
+        result = try_resonance(int(PARTICLES.mcid[row]), setup["initial_key"], mass_budget, weights, rng)
+        if result is not None:
+            return result
     
     return None
 
-def generate_hadron_lepton_event(hadron_id, lepton_id, sqrt_s, initial_state, particles_all, resonances):
+
+def draw_channel(chosen_resonance, initial_key, mass_budget, rng):
+    """
+    Канал распада резонанса (номер в DECAYS) или None
+
+    Канал выбирается по долям ветвления среди возможных при этом начальном
+    состоянии: есть партнёр с недостающими квантовыми числами, и вместе
+    они укладываются в бюджет по массе.
+    """
+    start, stop = DECAYS.ranges[chosen_resonance]
+    possible = channel_floor(initial_key)[start:stop] <= mass_budget
+    if not possible.any():
+        return None
+    cumulative = np.cumsum(np.where(possible, channel_fractions()[start:stop], 0.0))
+    if cumulative[-1] <= 0:
+        cumulative = np.cumsum(possible)   # доли возможных каналов нулевые - поровну
+    return start + int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side="right"))
+
+
+def try_resonance(chosen_resonance, initial_key, mass_budget, weights, rng):
+    """Событие резонанс + партнёр для одного резонанса (или None)"""
+    channel = draw_channel(chosen_resonance, initial_key, mass_budget, rng)
+    if channel is None:
+        return None
+
+    partners = PARTNERS.lookup(int(initial_key - DECAYS.keys[channel]), mass_budget - DECAYS.mass[channel])
+    if not len(partners):
+        return None
+
+    # Партнёр - с теми же весами (с той же нижней границей, что в таблицах)
+    cumulative = np.cumsum(floor_weights(weights[partners]))
+    pick = np.searchsorted(cumulative, rng.random() * cumulative[-1], side="right")
+    chosen_particle = int(PARTICLES.mcid[partners[pick]])
+    final_products = DECAYS.products_of(channel).tolist() + [chosen_particle]
+    if is_valid_final_state([_particle_cache[m] for m in final_products]):
+        return final_products, chosen_particle, chosen_resonance
+
+    return None
+
+
+def setup_hadron_lepton(collision, particles_all, resonances):
+
+    # Определяем кто адрон, кто лептон
+    id1, id2 = collision.id1, collision.id2
+    hadron_id = id1 if PARTICLES.type_of(id1) in ('baryon', 'meson') else id2
+    lepton_id = id1 if PARTICLES.type_of(id1) == 'lepton' else id2
 
     # Получаем кварковую структуру адрона
     hadron_quarks = get_particle_quarks(hadron_id)
-    if not hadron_quarks:
+    if not hadron_quarks.any():
         return None
     
-    print(f"   Кварки адрона: {hadron_quarks}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Кварки адрона", extra={
+            "stage": "setup",
+            "quarks": dict(zip(catalog.QUARK_FLAVOURS, hadron_quarks.tolist())),
+        })
 
-    # Фильтруем возможные кварковые состояния заранее,
-    # выбирая только одиночные кварки и мезоны
-    quark_particles = [
-        p for p in particles_all
-        if len(get_particle_quarks(p.mcid)) <= 2
-    ]
+    # Возможные кварковые состояния (одиночные кварки и мезоны) выбираются
+    # с весами статистической модели
+    quarks = species_sampler(collision.interaction_type, collision.sqrt_s)
 
-    if not quark_particles:
-        print("   ⚠️ Нет доступных кварковых состояний")
+    if not len(quarks):
+        logger.debug("Нет доступных кварковых состояний", extra={"stage": "setup"})
         return None
 
-    # Количество попыток генерации события
-    max_attempts = 5000
+    return {
+        "quarks": quarks,
+        "lepton_id": lepton_id,
+        "lepton_row": PARTICLES.row(lepton_id),
+        "anti_row": PARTICLES.index.get(-lepton_id, -1),
+        "initial_state": collision.initial_state,
+        "sqrt_s": collision.sqrt_s,
+    }
 
-    while max_attempts > 0:
-        try:
-            # Случайно генерируем число фрагментов (от 2 до 3)
-            n_fragments = random.randint(2, 3)
-            fragments = random.sample(quark_particles, n_fragments)
-        
-            # Генератор случайного числа для выбора поведения лептона
-            rand_num = random.random()
-        
-            # Если вероятность меньше 0.7, сохраняем лептон как начальный
-            if rand_num < 0.7:
-                lepton_final = [_particle_cache[lepton_id]]
-            else:
-                # Иначе создаём пару лептон-анти-лептон
-                anti_lepton_id = -lepton_id
-                if anti_lepton_id in PARTICLE_VALUES:
-                    lepton_final = [_particle_cache[lepton_id], _particle_cache[anti_lepton_id]]
-                else:
-                    lepton_final = [_particle_cache[lepton_id]]
-                
-            # Объединяем фрагменты и лептонные продукты
-            final_products = fragments + lepton_final
-        
-            # Проверяем сохранение энергии и зарядов
-            if check_conservation(final_products, initial_state, sqrt_s) \
-               and is_valid_final_state(final_products):
-                return final_products, fragments[0], _particle_cache[lepton_id]
-        except Exception as e:
-            pass  # Продолжаем попытки даже при исключениях
-        
-        max_attempts -= 1
-    
-    return None
 
-def generate_lepton_lepton_event(id1, id2, sqrt_s, initial_state, particles_all, resonances):
+def draw_hadron_lepton_candidates(setup, rng, n):
+    """n кандидатов адрон-лептон и маска прошедших проверку"""
+
+    # Случайно генерируем 2-3 различных фрагмента на кандидата
+    fragments, valid = sample_distinct_rows(setup["quarks"], n, rng)
+
+    # С вероятностью 0.7 сохраняем лептон, иначе добавляем античастицу
+    pair = rng.random(n) >= 0.7
+    leptons = np.column_stack([
+        np.full(n, setup["lepton_row"]),
+        np.where(pair, setup["anti_row"], -1),
+    ])
+    candidates = np.hstack([fragments, leptons])
+
+    # Проверяем сохранение энергии и зарядов
+    return candidates, valid & check_conservation_batch(candidates, setup["initial_state"], setup["sqrt_s"])
+
+
+def finish_hadron_lepton_event(setup, mcids):
+    return mcids, mcids[0], setup["lepton_id"]
+
+
+def generate_hadron_lepton_event(setup, rng, budget):
+    return generate_from_stream(setup, rng, budget, draw_hadron_lepton_candidates, finish_hadron_lepton_event)
+
+
+def setup_lepton_lepton(collision, particles_all, resonances):
     
     # Проверяем: частица + античастица?
-    is_annihilation = (id1 == -id2)
+    id1, id2 = collision.id1, collision.id2
+    setup = {
+        "annihilation": id1 == -id2,
+        "photon_row": PARTICLES.index.get(22),
+        "initial_state": collision.initial_state,
+        "sqrt_s": collision.sqrt_s,
+    }
     
-    if is_annihilation:
-        print("   💥 Аннигиляция лептон-антилептон")
-        
-        # e+e- → γγ, μ+μ-, τ+τ-, адроны
-        for _ in range(5000):
-            try:
-                # Выбор канала
-                channel = random.choice(['photons', 'leptons', 'hadrons'])
-                
-                if channel == 'photons':
-                    # → γγ
-                    photon = _particle_cache[22]
-                    final_products = [photon, photon]
-                
-                elif channel == 'leptons':
-                    # → l+l- (другое поколение)
-                    lepton_pairs = [(13, -13), (15, -15)]  # μ+μ-, τ+τ-
-                    pair = random.choice(lepton_pairs)
-                    if pair[0] in PARTICLE_VALUES and pair[1] in PARTICLE_VALUES:
-                        final_products = [_particle_cache[pair[0]], _particle_cache[pair[1]]]
-                    else:
-                        continue
-                
-                else:  # hadrons
-                    # → адроны (2-3 пиона)
-                    hadrons = [p for p in particles_all if (p.is_baryon or p.is_meson)]
-                    n_hadrons = random.randint(2, 3)
-                    final_products = random.choices(hadrons, k=n_hadrons)
-                
-                if check_conservation(final_products, initial_state, sqrt_s) and is_valid_final_state(final_products):
-                    return final_products, final_products[0], final_products[-1]
-            except:
-                continue
+    if setup["annihilation"]:
+        logger.debug("Аннигиляция лептон-антилептон", extra={"stage": "setup"})
+
+        setup["hadrons"] = species_sampler(collision.interaction_type, collision.sqrt_s)
+        setup["lepton_pairs"] = np.array([
+            (PARTICLES.row(a), PARTICLES.row(b))
+            for a, b in [(13, -13), (15, -15)]  # μ+μ-, τ+τ-
+            if a in PARTICLES and b in PARTICLES
+        ], dtype=np.int64).reshape(-1, 2)
     else:
         # Обычное рассеяние l1 + l2 → l1 + l2 (+ фотоны)
-        print("   ↔️ Лептон-лептонное рассеяние")
-        
-        for _ in range(5000):
-            try:
-                # Упругое рассеяние + возможно фотон
-                final_products = [_particle_cache[id1], _particle_cache[id2]]
-                
-                if random.random() < 0.3 and sqrt_s > 1.0:
-                    # Излучение фотона
-                    photon = _particle_cache[22]
-                    final_products.append(photon)
-                
-                if check_conservation(final_products, initial_state, sqrt_s) and is_valid_final_state(final_products):
-                    return final_products, final_products[0], final_products[1]
-            except:
+        logger.debug("Лептон-лептонное рассеяние", extra={"stage": "setup"})
+
+        if id1 not in PARTICLES or id2 not in PARTICLES:
+            return None
+        setup["beam_rows"] = (PARTICLES.row(id1), PARTICLES.row(id2))
+
+    return setup
+
+
+def draw_lepton_lepton_candidates(setup, rng, n):
+    """n кандидатов лептон-лептон и маска прошедших проверку"""
+
+    photon_row = setup["photon_row"]
+    candidates = np.full((n, 3), -1, dtype=np.int64)
+    valid = np.ones(n, dtype=bool)
+
+    if setup["annihilation"]:
+        # e+e- → γγ, μ+μ-, τ+τ-, адроны
+        # Выбор канала: 0 - фотоны, 1 - лептоны, 2 - адроны
+        channel = rng.integers(0, 3, size=n)
+
+        # → γγ
+        photons = channel == 0
+        if photon_row is None:
+            valid &= ~photons
+        else:
+            candidates[photons, :2] = photon_row
+
+        # → l+l- (другое поколение)
+        leptons = channel == 1
+        lepton_pairs = setup["lepton_pairs"]
+        if len(lepton_pairs):
+            candidates[leptons, :2] = lepton_pairs[rng.integers(0, len(lepton_pairs), size=n)][leptons]
+        else:
+            valid &= ~leptons
+
+        # → адроны (2-3 частицы, с повторениями)
+        hadrons = channel == 2
+        hadron_sampler = setup["hadrons"]
+        if len(hadron_sampler):
+            picks = hadron_sampler.draw(rng, (n, 3))
+            picks[rng.random(n) < 0.5, 2] = -1
+            candidates[hadrons] = picks[hadrons]
+        else:
+            valid &= ~hadrons
+    else:
+        # Упругое рассеяние + возможно излучение фотона
+        candidates[:, 0], candidates[:, 1] = setup["beam_rows"]
+        if photon_row is not None and setup["sqrt_s"] > 1.0:
+            candidates[rng.random(n) < 0.3, 2] = photon_row
+
+    return candidates, valid & check_conservation_batch(candidates, setup["initial_state"], setup["sqrt_s"])
+
+
+def finish_lepton_lepton_event(setup, mcids):
+    if setup["annihilation"]:
+        return mcids, mcids[0], mcids[-1]
+    return mcids, mcids[0], mcids[1]
+
+
+def generate_lepton_lepton_event(setup, rng, budget):
+    return generate_from_stream(setup, rng, budget, draw_lepton_lepton_candidates, finish_lepton_lepton_event)
+
+
+# ============================================================================
+# ПОТОК КАНДИДАТОВ
+# ============================================================================
+#
+# Генераторы адрон-лептон и лептон-лептон разыгрывают кандидатов порциями по
+# ATTEMPT_CHUNK и берут первого прошедшего проверку. Для одного события почти
+# вся порция пропадает; в пакете события блока берут кандидатов из общего
+# потока: следующее событие продолжает порцию с места, где остановилось
+# предыдущее. Каждое событие по-прежнему тратит свой бюджет попыток.
+
+def stream_events(setup, rng, budgets, draw, finish):
+    """
+    События из общего потока кандидатов
+
+    Args:
+        setup: подготовка генератора
+        rng: генератор случайных чисел блока
+        budgets: AttemptBudget по одному на событие (берутся по мере надобности,
+            так что срок отсчитывается от начала события)
+        draw: функция (setup, rng, n) -> (кандидаты, маска прошедших)
+        finish: функция (setup, mcid продуктов) -> результат генератора
+
+    Yields:
+        (результат или None, потрачено попыток) для каждого бюджета
+    """
+    candidates = hits = None
+    position = 0
+    for budget in budgets:
+        result = None
+        while allowed := budget.remaining():
+            if candidates is None or position == len(candidates):
+                candidates, accepted = draw(setup, rng, ATTEMPT_CHUNK)
+                hits = np.flatnonzero(accepted)
+                position = 0
+            stop = min(position + allowed, len(candidates))
+            k = int(np.searchsorted(hits, position))
+            if k == len(hits) or hits[k] >= stop:
+                budget.charge(stop - position)
+                position = stop
                 continue
-    
-    return None
+            hit = int(hits[k])
+            budget.charge(hit + 1 - position)
+            position = hit + 1
+            final_products = rows_to_particles(candidates[hit])
+            if is_valid_final_state(final_products):
+                result = finish(setup, [p.mcid for p in final_products])
+                break
+        yield result, budget.used
 
 
+def generate_from_stream(setup, rng, budget, draw, finish):
+    """Одно событие из потока кандидатов (порции, не доставшиеся событию, пропадают)"""
+    return next(stream_events(setup, rng, [budget], draw, finish))[0]
 
 
-def generate_event(id1, id2, beam_energy, particles_list, resonances, max_attempts=100000):
-    
-    if not particles_list or not resonances:
-        print("❌ ОШИБКА: Пустые списки частиц или резонансов")
-        return None
-    
-    m1 = PARTICLE_VALUES[id1]['mass']
-    m2 = PARTICLE_VALUES[id2]['mass']
-    s = m1**2 + m2**2 + 2 * m2 * beam_energy
-    sqrt_s = sqrt(max(0.1, s))
-    
-    # Квантовые числа начального состояния
-    initial_state = {
-        'charge': PARTICLE_VALUES[id1]['charge'] + PARTICLE_VALUES[id2]['charge'],
-        'baryon': PARTICLE_VALUES[id1]['baryon'] + PARTICLE_VALUES[id2]['baryon'],
-        'strangeness': PARTICLE_VALUES[id1]['s'] + PARTICLE_VALUES[id2]['s'],
-        'charm': PARTICLE_VALUES[id1]['c'] + PARTICLE_VALUES[id2]['c'],
-        'bottom': PARTICLE_VALUES[id1]['b'] + PARTICLE_VALUES[id2]['b'],
-        'L_e': PARTICLE_VALUES[id1]['L_e'] + PARTICLE_VALUES[id2]['L_e'],
-        'L_mu': PARTICLE_VALUES[id1]['L_mu'] + PARTICLE_VALUES[id2]['L_mu'],
-        'L_tau': PARTICLE_VALUES[id1]['L_tau'] + PARTICLE_VALUES[id2]['L_tau'],
-    }
+# ============================================================================
+# ДОСТИЖИМОСТЬ СОБЫТИЯ
+# ============================================================================
+#
+# Если ни один канал не сохраняет квантовые числа начального состояния или
+# не укладывается в бюджет по массе, генератор впустую тратит все попытки.
+# Порог √s, ниже которого событие невозможно, считается один раз на
+# (тип взаимодействия, ключ начального состояния, пучки с лептонами) по
+# заранее посчитанным таблицам каналов и комбинациям пулов, и такие запросы
+# сразу получают рассеяние.
+#
+# Условия берутся необходимые (без is_valid_final_state и весов), поэтому
+# "достижимо" не гарантирует событие, а "недостижимо" - точно.
+
+FEASIBILITY_CACHE_SIZE = 1024
+MASS_BUDGET = 1.1       # бюджет по массе: sqrt_s * 1.1 (как в генераторах)
+
+
+@lru_cache(maxsize=None)
+def channel_thresholds():
+    """
+    Таблица каналов резонансов для оракула
 
+    Returns:
+        (ключи групп партнёров по возрастанию, минимальная масса партнёра
+        в группе, масса резонанса каждого канала DECAYS)
+    """
+    keys = PARTNERS.keys
+    lightest = PARTNERS.mass[PARTNERS.offsets[:-1]]   # группы отсортированы по массе
+    order = np.argsort(keys)
+    parent_mass = PARTICLES.mass[PARTICLES.rows(DECAYS.parent.tolist())]
+    return keys[order], lightest[order], parent_mass
 
-    E1 = sqrt(beam_energy**2 + m1**2)
-    E2 = sqrt(beam_energy**2 + m2**2)
 
-    tracks_count = int(PARTICLE_VALUES[id1]['charge']) + int(PARTICLE_VALUES[id2]['charge'] != 0)
-    momentum = abs(E1 - E2)
-    
-    interaction_type = get_interaction_type(id1, id2)
+@lru_cache(maxsize=None)
+def channel_fractions():
+    """
+    Доли ветвления каналов DECAYS, нормированные внутри каждого резонанса
 
-    AnimType = "Standard"
+    Каналы без измеренной доли (NaN) делят поровну остаток до 1; если
+    у резонанса все доли нулевые, каналы равновероятны.
+    """
+    fraction = DECAYS.fraction
+    if not len(fraction):
+        return np.zeros(0, dtype=np.float64)
+
+    # Каналы резонанса лежат подряд: группа канала по началам диапазонов
+    starts = np.sort(np.fromiter((start for start, _ in DECAYS.ranges.values()), dtype=np.int64))
+    group = np.searchsorted(starts, np.arange(len(fraction)), side="right") - 1
+    lengths = np.diff(np.append(starts, len(fraction)))
+
+    known = np.isfinite(fraction)
+    value = np.where(known, np.clip(np.nan_to_num(fraction), 0.0, None), 0.0)
+    rest = np.clip(1.0 - np.add.reduceat(value, starts), 0.0, None)
+    unknown = np.add.reduceat((~known).astype(np.int64), starts)
+    share = np.where(unknown > 0, rest / np.maximum(unknown, 1), 0.0)
+    value = np.where(known, value, share[group])
+
+    total = np.add.reduceat(value, starts)
+    value = np.where(total[group] > 0, value / np.where(total > 0, total, 1.0)[group], 1.0 / lengths[group])
+    value.flags.writeable = False
+    return value
+
+
+@lru_cache(maxsize=FEASIBILITY_CACHE_SIZE)
+def channel_floor(initial_key):
+    """
+    Минимальная масса конечного состояния каждого канала DECAYS (канал +
+    самый лёгкий партнёр с недостающими квантовыми числами); inf - партнёра нет
+    """
+    keys, lightest, _ = channel_thresholds()
+    if not len(keys):
+        return np.full(len(DECAYS), np.inf)
+    residual = initial_key - DECAYS.keys
+    pos = np.minimum(np.searchsorted(keys, residual), len(keys) - 1)
+    floor = DECAYS.mass + np.where(keys[pos] == residual, lightest[pos], np.inf)
+    floor.flags.writeable = False
+    return floor
+
+
+@lru_cache(maxsize=None)
+def fragment_combinations():
+    """Пары и тройки различных строк пула hadron-lepton: (строки, массы)"""
+    rows, masses = candidate_pool('hadron-lepton')
+    combos = []
+    for size in (2, 3):
+        index = np.array(list(combinations(range(len(rows)), size)), dtype=np.int64).reshape(-1, size)
+        combos.append((rows[index], masses[index]))
+    return combos
+
+
+@lru_cache(maxsize=None)
+def hadron_combinations():
+    """Пары и тройки строк пула lepton-lepton с повторениями: (строки, массы)"""
+    rows, masses = candidate_pool('lepton-lepton')
+    combos = []
+    for size in (2, 3):
+        index = np.array(
+            list(combinations_with_replacement(range(len(rows)), size)), dtype=np.int64
+        ).reshape(-1, size)
+        combos.append((rows[index], masses[index]))
+    return combos
+
+
+def combination_threshold(combos, need, extra_mass=0.0):
+    """
+    Наименьшая √s, при которой одна из комбинаций пула с суммой ключей need
+    (вместе с частицами массы extra_mass) укладывается в бюджет по массе,
+    а каждая её частица - в пул по MAX_MASS_FRACTION; inf - такой нет
+    """
+    best = inf
+    for rows, masses in combos:
+        match = PARTICLES.qkey[rows].sum(axis=1) == need
+        if match.any():
+            threshold = np.maximum(
+                (masses[match].sum(axis=1) + extra_mass) / MASS_BUDGET,
+                masses[match].max(axis=1) / MAX_MASS_FRACTION,
+            )
+            best = min(best, float(threshold.min()))
+    return best
+
+
+@lru_cache(maxsize=FEASIBILITY_CACHE_SIZE)
+def threshold_sqrt_s(interaction_type, initial_key, id1=None, id2=None):
+    """
+    Минимальная √s, при которой событие в принципе возможно (inf - никогда)
 
-    default = [
-    [
-        {
-            "id_1": id1,
-            "id_2": id2
-        }
-    ],
-    [
-        {
-            "id_1": id1,
-            "id_2": id2
-        }
-    ],
-    [
-        {
-            "Mass": sqrt_s,
-            "BaryonNum": initial_state['baryon'],
-            "S,B,C": [
-                initial_state['strangeness'],
-                initial_state['bottom'],
-                initial_state['charm'] ], 
-            "Charge": initial_state['charge'],
-
-            "track_count": tracks_count,
-            "momentum": momentum,
-            "type": AnimType
-        }
-    ],
-    [
+    id1, id2 - пучки (нужны для hadron-lepton и lepton-lepton)
+    """
+    if interaction_type == 'hadron-hadron':
+        if not len(DECAYS):
+            return inf
+        parent_mass = channel_thresholds()[2]
+        threshold = np.maximum(
+            channel_floor(initial_key) / MASS_BUDGET,
+            parent_mass / RESONANCE_MASS_FRACTION,  # резонанс должен попасть в пул
+        )
+        return float(threshold.min())
+
+    if interaction_type == 'hadron-lepton':
+        # Фрагменты + лептон (+ его античастица)
+        lepton_id = id1 if PARTICLES.type_of(id1) == 'lepton' else id2
+        extras = [[PARTICLES.row(lepton_id)]]
+        if -lepton_id in PARTICLES:
+            extras.append([PARTICLES.row(lepton_id), PARTICLES.row(-lepton_id)])
+        return min(
+            combination_threshold(
+                fragment_combinations(),
+                initial_key - int(PARTICLES.qkey[extra].sum()),
+                float(PARTICLES.mass[extra].sum()),
+            )
+            for extra in extras
+        )
+
+    if interaction_type == 'lepton-lepton':
+        if id1 != -id2:
+            # Рассеяние: те же лептоны (фотон добавляется не всегда)
+            return (PARTICLES.mass_of(id1) + PARTICLES.mass_of(id2)) / MASS_BUDGET
+
+        # Аннигиляция: γγ, пара μ/τ или 2-3 адрона с нулевыми квантовыми числами
+        best = combination_threshold(hadron_combinations(), initial_key)
+        if 22 in PARTICLES:
+            best = 0.0
+        for a, b in ((13, -13), (15, -15)):
+            if a in PARTICLES and b in PARTICLES:
+                best = min(best, (PARTICLES.mass_of(a) + PARTICLES.mass_of(b)) / MASS_BUDGET)
+        return best
+
+    return 0.0
+
+
+def is_feasible(collision):
+    """Может ли генератор в принципе найти событие для этого столкновения"""
+    interaction_type = collision.interaction_type
+    # Порог hadron-hadron зависит только от начального состояния - общий для пар пучков
+    beams = () if interaction_type == 'hadron-hadron' else (collision.id1, collision.id2)
+    return collision.sqrt_s >= threshold_sqrt_s(interaction_type, collision.initial_key, *beams)
+
+
+# ============================================================================
+# БЮДЖЕТ ПОПЫТОК
+# ============================================================================
+#
+# Сколько попыток давать генератору, зависит от конфигурации: p + p при
+# 13 ТэВ находит событие с первого резонанса, а редкие комбинации тратят
+# весь бюджет. Для каждой (тип, пара пучков, интервал √s) копится
+# статистика - сколько попыток и времени ушло и сколько событий найдено, -
+# и по ней задаются лимит попыток и срок по часам для следующего запроса.
+#
+# Попытка - один проверенный резонанс (hadron-hadron) или один кандидат
+# (hadron-lepton, lepton-lepton). Кандидаты всегда разыгрываются порциями
+# полного размера, а бюджет лишь обрывает проверку: случайные числа
+# расходуются одинаково при любом лимите. Запросы с seed получают
+# постоянный бюджет без срока (fixed_budget) - не меньше любого
+# адаптивного, поэтому событие, найденное без seed, по его seed
+# повторяется в любом процессе. (Рассеяние, к которому привёл урезанный
+# бюджет, при повторе может смениться событием.)
+
+# Лимит без статистики (прежние постоянные значения)
+DEFAULT_ATTEMPTS = {
+    'hadron-hadron': 10000,
+    'hadron-lepton': 5000,
+    'lepton-lepton': 5000,
+}
+MIN_ATTEMPTS = 64
+MAX_ATTEMPTS_FACTOR = 4         # лимит не больше DEFAULT_ATTEMPTS * 4
+MISS_PROBABILITY = 1e-3         # допустимая доля "не нашли, хотя могли"
+
+ATTEMPT_DEADLINE = 10.0         # срок одного события без статистики (сек)
+MIN_DEADLINE = 0.05
+DEADLINE_SLACK = 4.0            # запас срока относительно ожидаемого времени
+
+MIN_OBSERVATIONS = 5            # запросов до того, как статистике доверяют
+HOPELESS_BUDGETS = 4            # столько полных бюджетов без событий - безнадёжно
+HOPELESS_RETRY = 32             # каждый такой запрос безнадёжной конфигурации - проба
+STATS_WINDOW = 256              # после стольких запросов счётчики делятся пополам
+ACCEPTANCE_STATS_SIZE = 4096
+
+_acceptance = OrderedDict()     # ключ -> [запросы, найдено, попытки, секунды, пропущено]
+_acceptance_lock = threading.Lock()
+
+
+class AttemptBudget:
+    """Бюджет одного события: лимит попыток и срок по часам (perf_counter)"""
+
+    def __init__(self, limit, deadline=None):
+        self.limit = limit
+        self.deadline = deadline
+        self.used = 0
+
+    def remaining(self):
+        """Сколько попыток ещё можно сделать (0 - бюджет исчерпан или срок вышел)"""
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            return 0
+        return max(0, self.limit - self.used)
+
+    def charge(self, n):
+        """Учесть n проверенных кандидатов"""
+        self.used += n
+
+    def take(self, n):
+        """Взять до n попыток сразу: сколько разрешено (0 - бюджет исчерпан)"""
+        n = min(n, self.remaining())
+        self.used += n
+        return n
+
+
+def acceptance_key(collision):
+    return (collision.interaction_type, collision.id1, collision.id2, sqrt_s_bin(collision.sqrt_s))
+
+
+def attempt_budget(key):
+    """
+    Лимит попыток и длительность срока (сек) для следующего события
+
+    Returns:
+        (limit, seconds) или None - конфигурация безнадёжна, сразу рассеяние
+    """
+    default = DEFAULT_ATTEMPTS.get(key[0], MIN_ATTEMPTS)
+    with _acceptance_lock:
+        stats = _acceptance.get(key)
+        if stats is None or stats[0] < MIN_OBSERVATIONS:
+            return default, ATTEMPT_DEADLINE
+        _acceptance.move_to_end(key)
+        requests, found, attempts, seconds, skipped = stats
+
+        if not found:
+            if attempts < HOPELESS_BUDGETS * default:
+                return default, ATTEMPT_DEADLINE
+            # Безнадёжно: изредка пробуем снова полным бюджетом
+            stats[4] += 1
+            if stats[4] % HOPELESS_RETRY:
+                return None
+            return default, ATTEMPT_DEADLINE
+
+    # Попыток до успеха с вероятностью 1 - MISS_PROBABILITY при доле успеха p
+    p = found / max(attempts, 1)
+    if p >= 1:
+        limit = MIN_ATTEMPTS
+    else:
+        limit = ceil(log(MISS_PROBABILITY) / log1p(-p))
+    limit = int(min(max(limit, MIN_ATTEMPTS), default * MAX_ATTEMPTS_FACTOR))
+
+    per_attempt = seconds / max(attempts, 1)
+    deadline = min(max(DEADLINE_SLACK * limit * per_attempt, MIN_DEADLINE), ATTEMPT_DEADLINE)
+    return limit, deadline
+
+
+def fixed_budget(interaction_type):
+    """Бюджет запроса с seed: наибольший лимит attempt_budget и без срока"""
+    return DEFAULT_ATTEMPTS.get(interaction_type, MIN_ATTEMPTS) * MAX_ATTEMPTS_FACTOR, None
+
+
+def new_budget(budget):
+    """AttemptBudget для одного события по (limit, seconds); seconds None - без срока"""
+    limit, seconds = budget
+    return AttemptBudget(limit, None if seconds is None else time.perf_counter() + seconds)
+
+
+def record_acceptance(key, attempts, found, seconds, requests=1):
+    """Учесть результат запроса (или пакета из requests событий)"""
+    with _acceptance_lock:
+        stats = _acceptance.get(key)
+        if stats is None:
+            stats = _acceptance[key] = [0, 0, 0, 0.0, 0]
+            while len(_acceptance) > ACCEPTANCE_STATS_SIZE:
+                _acceptance.popitem(last=False)
+        _acceptance.move_to_end(key)
+        if stats[0] >= STATS_WINDOW:
+            # Старые наблюдения весят меньше: бюджет следит за изменениями
+            stats[0] //= 2
+            stats[1] //= 2
+            stats[2] //= 2
+            stats[3] /= 2
+        stats[0] += requests
+        stats[1] += found
+        stats[2] += attempts
+        stats[3] += seconds
+
+
+def acceptance_stats():
+    """Статистика по конфигурациям (список словарей, для настройки бюджетов)"""
+    with _acceptance_lock:
+        items = [(key, list(stats)) for key, stats in _acceptance.items()]
+    return [
         {
-            "init_id1": id1,
-            "init_id2:": id2
+            "interaction_type": key[0],
+            "id_1": key[1],
+            "id_2": key[2],
+            "sqrt_s_bin": key[3],
+            "requests": requests,
+            "found": found,
+            "attempts": attempts,
+            "seconds": seconds,
+            "acceptance": found / attempts if attempts else None,
         }
+        for key, (requests, found, attempts, seconds, _) in items
     ]
-]
 
-    if interaction_type == 'hadron-hadron':
-        result = generate_hadron_hadron_event(id1, id2, sqrt_s, initial_state, particles_list, resonances)
-    
-    elif interaction_type == 'hadron-lepton':
-        # Определяем кто адрон, кто лептон
-        hadron_id = id1 if (PARTICLE_VALUES[id1]['type'] == 'baryon' or PARTICLE_VALUES[id1]['type'] == 'meson') else id2
-        lepton_id = id1 if PARTICLE_VALUES[id1]['type'] == 'lepton' else id2
-        result = generate_hadron_lepton_event(hadron_id, lepton_id, sqrt_s, initial_state, particles_list, resonances)
-    
-    elif interaction_type == 'lepton-lepton':
-        result = generate_lepton_lepton_event(id1, id2, sqrt_s, initial_state, particles_list, resonances)
-    
-    else:
-        print(f"   ⚠️ Тип взаимодействия {interaction_type} пока не реализован")
-        return default
-    
-    if result:
-        final_products, first_particle, second_particle = result
-        
-        # Формируем результат
-        products = {f'id_{i+1}': p.mcid for i, p in enumerate(final_products)}
 
-        initial = [{'init_id1': id1, 'init_id2:': id2}]
-        
-        first_products = [{
-            "id_1": first_particle.mcid,
-            "id_2": second_particle.mcid
-        }]
+def load_acceptance_stats(rows):
+    """Загрузить статистику, сохранённую acceptance_stats (например, с другого процесса)"""
+    for row in rows:
+        key = (row["interaction_type"], row["id_1"], row["id_2"], row["sqrt_s_bin"])
+        record_acceptance(key, row["attempts"], row["found"], row["seconds"], requests=row["requests"])
 
-        AnimType = GetAnimationType(p.mcid for p in final_products)
-        
-        values = [{
-            "Mass": sqrt_s,
-            "BaryonNum": initial_state['baryon'],
-            "S,B,C": [
-                initial_state['strangeness'],
-                initial_state['bottom'],
-                initial_state['charm']
-            ],
-            "Charge": initial_state['charge'],
-            
-            "track_count": tracks_count,
-            "momentum": momentum,
-            "type": AnimType
-        }]
-        
-        print(f"✓ Событие найдено!")
-        print(f"   Продукты: {[_particle_cache[p.mcid].name for p in final_products]}")
-        print(AnimType)
+
+def reset_acceptance_stats():
+    with _acceptance_lock:
+        _acceptance.clear()
+
+
+GENERATORS = {
+    'hadron-hadron': (setup_hadron_hadron, generate_hadron_hadron_event),
+    'hadron-lepton': (setup_hadron_lepton, generate_hadron_lepton_event),
+    'lepton-lepton': (setup_lepton_lepton, generate_lepton_lepton_event),
+}
+
+# Генераторы с потоком кандидатов: в пакете события блока делят один поток
+CANDIDATE_STREAMS = {
+    'hadron-lepton': (draw_hadron_lepton_candidates, finish_hadron_lepton_event),
+    'lepton-lepton': (draw_lepton_lepton_candidates, finish_lepton_lepton_event),
+}
+
+
+def event_result(collision, products, first, second, anim_type):
+    """Результат в формате API: [продукты], [первичные], [параметры], [начальные]"""
+    initial_state = collision.initial_state
+    values = [{
+        "Mass": collision.sqrt_s,
+        "BaryonNum": initial_state['baryon'],
+        "S,B,C": [
+            initial_state['strangeness'],
+            initial_state['bottom'],
+            initial_state['charm']
+        ],
+        "Charge": initial_state['charge'],
         
-        return [products], first_products, values, initial
-    
-    print(f"Рассеяние")
-    return default
+        "track_count": collision.tracks_count,
+        "momentum": collision.momentum,
+        "type": anim_type
+    }]
+
+    return [
+        [{f'id_{i+1}': mcid for i, mcid in enumerate(products)}],
+        [{"id_1": first, "id_2": second}],
+        values,
+        [{"init_id1": collision.id1, "init_id2:": collision.id2}],
+    ]
+
+
+def default_result(collision):
+    """Результат, когда событие не найдено (рассеяние без изменений)"""
+    return event_result(collision, [collision.id1, collision.id2], collision.id1, collision.id2, "Standard")
+
+
+def count_events(interaction_type, outcome, events=1, attempts=None):
+    """
+    Метрики исходов: found - событие найдено; fallback - бюджет исчерпан;
+    infeasible, hopeless, unsupported - рассеяние без генерации
+    """
+    metrics.inc("simulation_events_total", events, interaction_type=interaction_type, outcome=outcome)
+    if attempts is not None:
+        metrics.inc("simulation_attempts_total", attempts, interaction_type=interaction_type)
 
 
-    """# ОПТИМИЗАЦИЯ: предфильтруем резонансы по массе
-    valid_resonances = [r for r in resonances if PARTICLE_VALUES[r.mcid]['mass'] < sqrt_s * 0.9]
+def generate_event(id1, id2, beam_energy, particles_list, resonances, rng=None, seeded=False):
     
-    if not valid_resonances:
-        print(f"⚠️  Нет подходящих резонансов для энергии {sqrt_s:.2f} ГэВ")
+    if not particles_list or not resonances:
+        logger.error("Пустые списки частиц или резонансов")
         return None
+
+    collision = prepare_collision(id1, id2, beam_energy)
+    interaction_type = collision.interaction_type
+
+    if interaction_type not in GENERATORS:
+        logger.debug("Тип взаимодействия не реализован", extra={"stage": "setup", "interaction_type": interaction_type})
+        count_events(interaction_type, "unsupported")
+        return default_result(collision)
+
+    if not is_feasible(collision):
+        logger.debug("Событие недостижимо, рассеяние", extra={"stage": "feasibility", "sqrt_s": collision.sqrt_s})
+        count_events(interaction_type, "infeasible")
+        return default_result(collision)
+
+    # С seed - постоянный бюджет: событие не зависит от истории процесса
+    key = acceptance_key(collision)
+    budget = fixed_budget(interaction_type) if seeded else attempt_budget(key)
+    if budget is None:
+        logger.debug("Конфигурация безнадёжна по статистике попыток, рассеяние", extra={"stage": "budget"})
+        count_events(interaction_type, "hopeless")
+        return default_result(collision)
+
+    setup_generator, generate = GENERATORS[interaction_type]
+    with metrics.timer("setup", interaction_type=interaction_type):
+        setup = setup_generator(collision, particles_list, resonances)
+    result = None
+    attempts = 0
+    if setup is not None:
+        started = time.perf_counter()
+        budget = new_budget(budget)
+        result = generate(setup, rng if rng is not None else make_rng(new_seed()), budget)
+        elapsed = time.perf_counter() - started
+        attempts = budget.used
+        record_acceptance(key, attempts, int(bool(result)), elapsed)
+        metrics.observe("simulation_stage_seconds", elapsed, stage="generate", interaction_type=interaction_type)
+        metrics.observe("simulation_attempts", attempts, buckets=metrics.ATTEMPT_BUCKETS,
+                        interaction_type=interaction_type)
     
-    
-    
-    print(f"🔄 Генерация события: √s = {sqrt_s:.2f} ГэВ")
-    print(f"   Доступно {len(particles_list)} частиц, {len(valid_resonances)} резонансов")
-    
-    successful_attempts = 0
-    
-    for attempt in range(max_attempts):
-        #if attempt % 10000 == 0 and attempt > 0:
-            #print(f"   Попытка {attempt}/{max_attempts} (успешных проверок: {successful_attempts})", end='\r')
-        
-        try:
-            # Выбираем случайные частицу и резонанс
-            chosen_particle = random.choice(particles_list)
-            chosen_resonance = random.choice(valid_resonances)
+    if result:
+        count_events(interaction_type, "found", attempts=attempts)
+        with metrics.timer("result", interaction_type=interaction_type):
+            final_products, first_particle, second_particle = result
+            AnimType = GetAnimationType(final_products)
             
-            # ИСПРАВЛЕНИЕ: проверяем что резонанс может распадаться
-            try:
-                branching_fractions = api.get_particle_by_name(chosen_resonance.name).exclusive_branching_fractions()
-                if not branching_fractions:
-                    continue
-            except Exception as e:
-                continue
+            # Имена продуктов собираются, только если запись будет выведена
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Событие найдено", extra={
+                    "stage": "result",
+                    "products": [PARTICLES.name_of(m) for m in final_products],
+                    "animation": AnimType,
+                })
             
-            # Перебираем каналы распада
-            for branching in branching_fractions:
-                try:
-                    decay_products = [p.item.particle for p in branching.decay_products]
-                    
-                    # Добавляем выбранную частицу
-                    final_products = decay_products + [chosen_particle]
-                    
-                    # Проверяем законы сохранения
-                    if check_conservation(final_products, initial_state, sqrt_s) and is_valid_final_state(final_products):
-                        
-                        successful_attempts += 1
-                        
-                        # Формируем результат
-                        products = {f'id_{i+1}': p.mcid for i, p in enumerate(final_products)}
-                        
-                        first_products = [{
-                            "id_1": chosen_particle.mcid,
-                            "id_2": chosen_resonance.mcid
-                        }]
-                        
-                        values = [{
-                            "Mass": sqrt_s,
-                            "BaryonNum": initial_state['baryon'],
-                            "S,B,C": [
-                                initial_state['strangeness'],
-                                initial_state['bottom'],
-                                initial_state['charm']
-                            ],
-                            "Charge": initial_state['charge']
-                        }]
-                        
-                        print(f"\n✓ Событие найдено после {attempt + 1} попыток")
-                        return [products], first_products, values
-                
-                except Exception as e:
-                    continue
-        
-        except Exception as e:
-            print(e)
-            continue
+            return event_result(collision, final_products, first_particle, second_particle, AnimType)
     
-    print(f"\n❌ Событие не найдено после {max_attempts} попыток")
-    print(f"   Успешных проверок законов сохранения: {successful_attempts}")
-    return None"""
-
+    count_events(interaction_type, "fallback", attempts=attempts)
+    logger.debug("Событие не найдено, рассеяние", extra={"stage": "result", "sqrt_s": collision.sqrt_s})
+    return default_result(collision)
 
 
-
-def SimulationEvent(id_1, id_2, beam_energy, particle_list, resonances):
+def SimulationEvent(id_1, id_2, beam_energy, particle_list, resonances, rng=None, seeded=False):
     """
     Симуляция одного события столкновения
     
@@ -829,6 +1522,9 @@ def SimulationEvent(id_1, id_2, beam_energy, particle_list, resonances):
         beam_energy: Энергия пучка (ГэВ)
         particle_list: Список частиц
         resonances: Список резонансов
+        rng: numpy.random.Generator (None - со случайным зерном)
+        seeded: зерно задано в запросе - постоянный бюджет попыток без
+            срока, событие не зависит от истории процесса
     
     Returns:
         (event, first_products, values) или None
@@ -836,33 +1532,172 @@ def SimulationEvent(id_1, id_2, beam_energy, particle_list, resonances):
     
     # ИСПРАВЛЕНИЕ: проверка входных данных
     if not particle_list:
-        print("❌ ОШИБКА: Список частиц пуст! Сначала вызовите load_particles()")
+        logger.error("Список частиц пуст: сначала вызовите load_particles()")
         return None
     
     if not resonances:
-        print("❌ ОШИБКА: Список резонансов пуст! Сначала вызовите load_particles()")
+        logger.error("Список резонансов пуст: сначала вызовите load_particles()")
         return None
     
-    print(f"\n{'='*60}")
-    print(f"🎯 СИМУЛЯЦИЯ СТОЛКНОВЕНИЯ")
-    print(f"   Частица 1: {id_1}")
-    print(f"   Частица 2: {id_2}")
-    print(f"   Энергия пучка: {beam_energy} ГэВ")
-    print(f"{'='*60}")
+    logger.debug("Симуляция столкновения", extra={
+        "stage": "start", "id_1": id_1, "id_2": id_2, "beam_energy": beam_energy,
+    })
     
-    result = generate_event(id_1, id_2, beam_energy, particle_list, resonances)
+    result = generate_event(id_1, id_2, beam_energy, particle_list, resonances, rng=rng, seeded=seeded)
     
     if result:
         event, first_products, values, init = result
-        print(f"\n✓ УСПЕХ! Событие сгенерировано")
-        print(f"   Продукты реакции: {event}")
-        print(f"   Первичные частицы: {first_products}")
-        print(f"   Параметры: {values}")
+        logger.debug("Событие сгенерировано", extra={
+            "stage": "done", "event": event, "first_products": first_products, "values": values,
+        })
         return event, first_products, values, init
     else:
-        print(f"\n✗ НЕУДАЧА: Событие не сгенерировано")
-        print(f"   Попробуйте:")
-        print(f"   - Увеличить энергию пучка")
-        print(f"   - Использовать другие начальные частицы")
-        print(f"   - Проверить что списки частиц загружены корректно")
+        logger.warning("Событие не сгенерировано", extra={
+            "stage": "done", "id_1": id_1, "id_2": id_2, "beam_energy": beam_energy,
+        })
         return None
+
+
+# ============================================================================
+# ПАКЕТНАЯ ГЕНЕРАЦИЯ
+# ============================================================================
+
+@dataclass
+class EventBatch:
+    """
+    N событий одной конфигурации в столбцовом виде
+
+    Продукты события i: products[offsets[i]:offsets[i + 1]].
+    first[i] - первичные частицы, found[i] - False, если событие
+    не найдено и вместо него записано рассеяние (id_1, id_2),
+    anim[i] - номер типа анимации в ANIMATION_TYPES.
+    """
+    collision: Collision
+    seed: int
+    products: np.ndarray
+    offsets: np.ndarray
+    first: np.ndarray
+    found: np.ndarray
+    anim: np.ndarray
+
+    def __len__(self):
+        return len(self.found)
+
+    def products_of(self, i):
+        return self.products[self.offsets[i]:self.offsets[i + 1]]
+
+    def event(self, i):
+        """Событие i в формате результата generate_event"""
+        first, second = self.first[i].tolist()
+        return event_result(
+            self.collision, self.products_of(i).tolist(), first, second,
+            ANIMATION_TYPES[self.anim[i]]
+        )
+
+
+def catalog_lists():
+    """Списки частиц и резонансов из загруженного каталога"""
+    particles = []
+    resonances = []
+    for mcid, resonance in zip(PARTICLES.mcid.tolist(), PARTICLES.resonance.tolist()):
+        (resonances if resonance else particles).append(_particle_cache[mcid])
+    return particles, resonances
+
+
+def simulate_batch(id_1, id_2, beam_energy, n_events, seed=None, particle_list=None, resonances=None,
+                   first_block=0):
+    """
+    Симуляция N событий одной конфигурации
+
+    Подготовка (кинематика, начальное состояние, отбор кандидатов) делается
+    один раз, затем события разыгрываются блоками по STREAM_BLOCK без вывода
+    в консоль; в генераторах из CANDIDATE_STREAMS события блока берут
+    кандидатов из общего потока (см. stream_events).
+
+    Args:
+        id_1, id_2: Monte Carlo ID сталкивающихся частиц
+        beam_energy: Энергия пучка (ГэВ)
+        n_events: Количество событий
+        seed: Зерно генератора случайных чисел (None - случайное; с зерном
+            бюджет попыток постоянный, см. fixed_budget)
+        particle_list, resonances: Списки частиц (по умолчанию - весь каталог)
+        first_block: Номер первого блока STREAM_BLOCK событий: пакет можно
+            разбить по блокам между процессами и получить те же события
+
+    Returns:
+        EventBatch
+    """
+    if particle_list is None or resonances is None:
+        particle_list, resonances = catalog_lists()
+
+    seeded = seed is not None
+    seed = normalize_seed(seed)
+    collision = prepare_collision(id_1, id_2, beam_energy)
+
+    setup = None
+    generate = None
+    key = acceptance_key(collision)
+    budget = None
+    skipped = "unsupported"     # исход для метрик, если генерации не будет
+    if collision.interaction_type in GENERATORS:
+        skipped = "infeasible"
+        if is_feasible(collision):
+            skipped = "hopeless"
+            # С seed пакет можно разбить по процессам: бюджет постоянный
+            budget = fixed_budget(collision.interaction_type) if seeded else attempt_budget(key)
+    if budget is not None:
+        skipped = "fallback"
+        setup_generator, generate = GENERATORS[collision.interaction_type]
+        setup = setup_generator(collision, particle_list, resonances)
+
+    products = []
+    offsets = [0]
+    first = np.empty((n_events, 2), dtype=np.int32)
+    found = np.zeros(n_events, dtype=bool)
+    anim = np.zeros(n_events, dtype=np.int8)
+
+    attempts = 0
+    started = time.perf_counter()
+    for block_start in range(0, n_events, STREAM_BLOCK):
+        block = range(block_start, min(block_start + STREAM_BLOCK, n_events))
+        rng = make_rng(seed, first_block + block_start // STREAM_BLOCK)
+        results = [(None, 0)] * len(block)
+        if setup is not None:
+            budgets = (new_budget(budget) for _ in block)
+            stream = CANDIDATE_STREAMS.get(collision.interaction_type)
+            if stream is not None:
+                results = stream_events(setup, rng, budgets, *stream)
+            else:
+                results = ((generate(setup, rng, b), b.used) for b in budgets)
+
+        for i, (result, used) in zip(block, results):
+            attempts += used
+            if result:
+                final_products, first[i] = result[0], result[1:]
+                found[i] = True
+                anim[i] = ANIMATION_TYPES.index(animation_type(tuple(final_products)))
+            else:
+                final_products = [id_1, id_2]
+                first[i] = (id_1, id_2)
+            products.extend(final_products)
+            offsets.append(len(products))
+
+    interaction_type = collision.interaction_type
+    if setup is not None and n_events:
+        elapsed = time.perf_counter() - started
+        record_acceptance(key, attempts, int(found.sum()), elapsed, requests=n_events)
+        metrics.observe("simulation_stage_seconds", elapsed, stage="batch", interaction_type=interaction_type)
+        count_events(interaction_type, "found", int(found.sum()), attempts=attempts)
+        count_events(interaction_type, "fallback", n_events - int(found.sum()))
+    elif n_events:
+        count_events(interaction_type, skipped, n_events)
+
+    return EventBatch(
+        collision=collision,
+        seed=seed,
+        products=np.asarray(products, dtype=np.int32),
+        offsets=np.asarray(offsets, dtype=np.int64),
+        first=first,
+        found=found,
+        anim=anim,
+    )
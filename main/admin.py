@@ -1,3 +1,46 @@
 from django.contrib import admin
+from django.utils.html import format_html, format_html_join
 
-# Register your models here.
+from .models import SimulationProfile
+
+
+@admin.register(SimulationProfile)
+class SimulationProfileAdmin(admin.ModelAdmin):
+
+    list_display = ['id', 'user', 'beams', 'energy', 'seconds_display', 'created_at']
+    list_filter = ['created_at']
+    search_fields = ['user__username']
+    date_hierarchy = 'created_at'
+    readonly_fields = ['user', 'options', 'seconds', 'top_table', 'created_at']
+    exclude = ['top']
+
+    # Пучки и энергия из параметров запроса
+    def beams(self, obj):
+        return f"{obj.options.get('id_1')} + {obj.options.get('id_2')}"
+    beams.short_description = 'Пучки'
+
+    def energy(self, obj):
+        return obj.options.get('Energy', '-')
+    energy.short_description = 'Энергия'
+
+    def seconds_display(self, obj):
+        return f"{obj.seconds * 1000:.1f} мс"
+    seconds_display.short_description = 'Время'
+    seconds_display.admin_order_field = 'seconds'
+
+    # Профиль таблицей
+    def top_table(self, obj):
+        rows = format_html_join(
+            '',
+            '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>',
+            ((r['function'], r['calls'], f"{r['tottime']:.6f}", f"{r['cumtime']:.6f}") for r in obj.top),
+        )
+        return format_html(
+            '<table><tr><th>Функция</th><th>Вызовы</th><th>Собственное (сек)</th>'
+            '<th>Всего (сек)</th></tr>{}</table>',
+            rows,
+        )
+    top_table.short_description = 'Самые затратные функции'
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,750 @@
+import os
+import re
+import json
+import time
+import shutil
+import numpy as np
+from dataclasses import dataclass
+
+# ============================================================================
+# СНИМОК КАТАЛОГА ЧАСТИЦ
+# ============================================================================
+#
+# Обход PDG-базы (api.get_particles() + api.get() + exclusive_branching_fractions()
+# для каждого резонанса) занимает секунды. Снимок собирается один раз командой
+#
+#     python manage.py build_catalog
+#
+# и хранится как набор .npy-файлов плюс index.json. Воркеры открывают массивы
+# через mmap (np.load(..., mmap_mode='r')), поэтому холодный старт занимает
+# миллисекунды, а страницы файла общие для всех процессов.
+#
+# В снимок пишутся и производные массивы (матрица квантовых чисел, суммы по
+# каналам, индекс партнёров): процесс ничего не пересчитывает и не копирует,
+# его собственная память - только словари mcid -> строка и имена частиц.
+
+SNAPSHOT_VERSION = 4
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_ROOT = os.environ.get("LHC_CATALOG_DIR", os.path.join(BASE_DIR, "catalog_snapshot"))
+
+INDEX_FILE = "index.json"
+
+# Снимок версии N - каталог vN с поколениями g<время>-<pid>/ и указателем
+# CURRENT (имя действующего поколения). Новое поколение пишется рядом и
+# включается атомарной заменой CURRENT: читатель видит либо старый снимок,
+# либо новый целиком. Действующее и предыдущее поколения не удаляются -
+# их могут отображать в память работающие процессы.
+CURRENT_FILE = "CURRENT"
+SNAPSHOT_KEEP = 2
+
+# Флаги типа частицы (как в PDG API)
+FLAG_BARYON = 1
+FLAG_MESON = 2
+FLAG_LEPTON = 4
+FLAG_BOSON = 8
+FLAG_QUARK = 16
+
+# Аддитивные квантовые числа хранятся целыми: заряд и барионное число
+# в единицах 1/3 (charge3 = 3 * Q, baryon3 = 3 * B)
+PARTICLE_ARRAYS = {
+    "mcid": np.int64,
+    "mass": np.float64,
+    "width": np.float64,
+    "charge3": np.int8,
+    "baryon3": np.int8,
+    "s": np.int8,
+    "c": np.int8,
+    "b": np.int8,
+    "L_e": np.int8,
+    "L_mu": np.int8,
+    "L_tau": np.int8,
+    "qkey": np.int64,
+    "flags": np.uint8,
+    "resonance": np.bool_,
+}
+
+DECAY_ARRAYS = {
+    "decay_parent": np.int64,     # mcid резонанса для каждого канала
+    "decay_bf": np.float64,       # относительная ширина канала (nan если неизвестна)
+    "decay_offsets": np.int64,    # границы каналов в decay_products (n_channels + 1)
+    "decay_products": np.int64,   # mcid продуктов всех каналов подряд
+}
+
+# Производные массивы: вычисляются при сборке снимка и только читаются
+DERIVED_ARRAYS = {
+    "quantum": np.int64,          # квантовые числа строк (N x len(QUANTUM_COLUMNS))
+    "valence": np.int8,           # валентные кварки по ароматам (N x len(QUARK_FLAVOURS))
+    "degeneracy": np.float64,     # спиновое вырождение 2J + 1
+    "padded_mass": np.float64,    # mass + нулевая заглушка для строки -1
+    "padded_qkey": np.int64,      # qkey + нулевая заглушка для строки -1
+    "decay_rows": np.int64,       # строки ParticleTable для decay_products
+    "decay_mass": np.float64,     # суммарная масса продуктов канала
+    "decay_keys": np.int64,       # упакованный ключ квантовых чисел канала
+    "partner_rows": np.int64,     # строки партнёров, по ключу и по массе
+    "partner_mass": np.float64,   # их массы
+    "partner_keys": np.int64,     # ключ каждой группы партнёров
+    "partner_offsets": np.int64,  # границы групп в partner_rows (n_groups + 1)
+}
+
+
+def snapshot_path(root=SNAPSHOT_ROOT):
+    """Каталог снимков текущей версии формата (поколения и указатель CURRENT)"""
+    return os.path.join(root, f"v{SNAPSHOT_VERSION}")
+
+
+def current_snapshot(root=SNAPSHOT_ROOT):
+    """Каталог действующего поколения снимка"""
+    base = snapshot_path(root)
+    try:
+        with open(os.path.join(base, CURRENT_FILE), encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return base  # снимок старого вида: файлы прямо в vN
+    return os.path.join(base, name)
+
+
+@dataclass(frozen=True)
+class CatalogParticle:
+    """Лёгкая замена объекта PDG-частицы для данных из снимка"""
+    mcid: int
+    name: str
+    mass: float
+    charge: float
+    width: float
+    quantum_J: str
+    flags: int
+
+    @property
+    def is_baryon(self):
+        return bool(self.flags & FLAG_BARYON)
+
+    @property
+    def is_meson(self):
+        return bool(self.flags & FLAG_MESON)
+
+    @property
+    def is_lepton(self):
+        return bool(self.flags & FLAG_LEPTON)
+
+    @property
+    def is_boson(self):
+        return bool(self.flags & FLAG_BOSON)
+
+    @property
+    def is_quark(self):
+        return bool(self.flags & FLAG_QUARK)
+
+
+def particle_flags(particle):
+    """Битовая маска типов частицы"""
+    flags = 0
+    if particle.is_baryon:
+        flags |= FLAG_BARYON
+    if particle.is_meson:
+        flags |= FLAG_MESON
+    if particle.is_lepton:
+        flags |= FLAG_LEPTON
+    if particle.is_boson:
+        flags |= FLAG_BOSON
+    if particle.is_quark:
+        flags |= FLAG_QUARK
+    return flags
+
+
+# ============================================================================
+# КВАРКОВЫЙ СОСТАВ ПО ЦИФРАМ PDG ID
+# ============================================================================
+#
+# Монте-Карло номер адрона: ±n nr nL nq1 nq2 nq3 nJ. Кварки - это цифры
+# nq1..nq3 (1=d ... 6=t):
+#   мезон  (nq1 = 0): верхний по типу (чётный) из nq2/nq3 - кварк, другой -
+#          антикварк; например 211 = u d~, 321 = u s~, 411 = c d~
+#   барион (nq1 > 0): кварки nq1, nq2, nq3
+# Отрицательный номер - античастица (все знаки меняются). K_S и K_L -
+# смеси d s~ и s d~, их суммарный аромат нулевой.
+
+QUARK_FLAVOURS = ("d", "u", "s", "c", "b", "t")
+
+_NEUTRAL_KAONS = (130, 310)
+
+
+def quark_content(mcids):
+    """
+    Кварковый состав частиц по их mcid (векторно, без обращения к PDG)
+
+    Returns:
+        (net, valence) - массивы N x len(QUARK_FLAVOURS):
+        net - кварки минус антикварки, valence - кварки плюс антикварки
+    """
+    mcids = np.asarray(mcids, dtype=np.int64).reshape(-1)
+    net = np.zeros((len(mcids), len(QUARK_FLAVOURS)), dtype=np.int64)
+    valence = np.zeros_like(net)
+
+    code = np.abs(mcids)
+    sign = np.where(mcids < 0, -1, 1)
+    nq1, nq2, nq3 = code // 1000 % 10, code // 100 % 10, code // 10 % 10
+
+    # Ядра (10LZZZAAAI) и дикварки (nq3 = 0) кварковым составом не считаем
+    hadron = (code < 10 ** 9) & (nq2 >= 1) & (nq2 <= 6) & (nq3 >= 1) & (nq3 <= 6) & (nq1 <= 6)
+    baryon = hadron & (nq1 > 0)
+    meson = hadron & (nq1 == 0)
+    quark = (code >= 1) & (code <= 6)
+
+    rows = np.arange(len(mcids))
+
+    def add(mask, digit, amount):
+        np.add.at(net, (rows[mask], digit[mask] - 1), amount[mask])
+        np.add.at(valence, (rows[mask], digit[mask] - 1), 1)
+
+    add(quark, code, sign)
+    for digit in (nq1, nq2, nq3):
+        add(baryon, digit, sign)
+
+    up_type = nq2 % 2 == 0
+    mixed = np.isin(code, _NEUTRAL_KAONS)
+    amount = np.where(mixed, 0, sign)
+    add(meson, np.where(up_type, nq2, nq3), amount)
+    add(meson, np.where(up_type, nq3, nq2), -amount)
+
+    return net, valence
+
+
+def flavour_numbers(net):
+    """
+    Столбцы baryon3, s, c, b из суммарного кваркового состава
+
+    Знаки как в исходном каталоге: s-кварк даёт -1, c- и b-кварк +1.
+    """
+    net = np.asarray(net, dtype=np.int64)
+    return {
+        "baryon3": net.sum(axis=1),
+        "s": -net[:, QUARK_FLAVOURS.index("s")],
+        "c": net[:, QUARK_FLAVOURS.index("c")],
+        "b": net[:, QUARK_FLAVOURS.index("b")],
+    }
+
+
+_SPIN = re.compile(r"\d+(?:/\d+)?")
+
+
+def spin_degeneracy(spins):
+    """
+    Спиновое вырождение 2J + 1 по строкам quantum_J ('1/2', '3', '>=5/2', ...)
+
+    Берётся первое число строки; для неизвестного спина ('?') - 1.
+    """
+    result = np.ones(len(spins), dtype=np.float64)
+    for i, spin in enumerate(spins):
+        match = _SPIN.search(spin or "")
+        if match:
+            num, _, den = match.group().partition("/")
+            result[i] = 2 * int(num) / int(den or 1) + 1
+    return result
+
+
+# ============================================================================
+# ТАБЛИЦА ЧАСТИЦ (СТОЛБЦЫ)
+# ============================================================================
+
+# Аддитивные квантовые числа в порядке столбцов матрицы ParticleTable.quantum
+QUANTUM_COLUMNS = ("charge3", "baryon3", "s", "c", "b", "L_e", "L_mu", "L_tau")
+
+# Те же числа под ключами словаря initial_state (заряд и барионное число - обычные)
+QUANTUM_KEYS = ("charge", "baryon", "strangeness", "charm", "bottom", "L_e", "L_mu", "L_tau")
+QUANTUM_SCALE = np.array([3, 3, 1, 1, 1, 1, 1, 1], dtype=np.int64)
+
+# Упаковка: компонента i занимает байт i ключа int64. Компоненты со знаком
+# (-128..127), поэтому упаковка линейна: ключ суммы = сумма ключей, и
+# сохранение всех восьми чисел проверяется одним сравнением целых.
+QUANTUM_RADIX = np.array([256 ** i for i in range(len(QUANTUM_COLUMNS))], dtype=np.int64)
+
+
+def pack_quantum(quantum):
+    """Целые квантовые числа (..., 8) -> ключ(и) int64"""
+    return np.asarray(quantum, dtype=np.int64) @ QUANTUM_RADIX
+
+
+def quantum_state(quantum):
+    """Целые квантовые числа -> словарь initial_state"""
+    values = np.asarray(quantum, dtype=np.int64).tolist()
+    state = dict(zip(QUANTUM_KEYS, values))
+    state["charge"] = values[0] / 3
+    state["baryon"] = values[1] / 3
+    return state
+
+
+def state_key(state):
+    """Словарь initial_state -> упакованный ключ"""
+    values = np.array([state[key] for key in QUANTUM_KEYS], dtype=np.float64)
+    return int(pack_quantum(np.rint(values * QUANTUM_SCALE)))
+
+
+class ParticleTable:
+    """
+    Каталог частиц в виде столбцов NumPy (struct-of-arrays)
+
+    Строка таблицы = частица, mcid -> номер строки хранится в index.
+    Столбцы из снимка не копируются, а остаются отображёнными в память.
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.names = []
+        self.types = []
+        self.spins = []
+        self.quantum = np.zeros((0, len(QUANTUM_COLUMNS)), dtype=np.int64)
+        self.valence = np.zeros((0, len(QUARK_FLAVOURS)), dtype=np.int8)
+        self.degeneracy = np.zeros(0, dtype=np.float64)
+        self.padded_mass = np.zeros(1)
+        self.padded_qkey = np.zeros(1, dtype=np.int64)
+        for name, dtype in PARTICLE_ARRAYS.items():
+            setattr(self, name, np.zeros(0, dtype=dtype))
+
+    def load(self, columns, names, types, spins):
+        """
+        Заполнить таблицу столбцами {имя: массив} и списками строк
+
+        Столбцы qkey, quantum, valence, degeneracy, padded_mass и padded_qkey, а также
+        baryon3/s/c/b (из кваркового состава по mcid) можно не передавать -
+        они вычисляются; переданные (из снимка) используются без копирования.
+        """
+        if "valence" not in columns:
+            net, valence = quark_content(columns["mcid"])
+            columns = dict(columns, valence=valence.astype(np.int8))
+            if "baryon3" not in columns:
+                columns.update(flavour_numbers(net))
+
+        quantum = columns.get("quantum")
+        if quantum is None:
+            quantum = np.column_stack(
+                [np.asarray(columns[name], dtype=np.int64) for name in QUANTUM_COLUMNS]
+            ) if len(columns["mcid"]) else np.zeros((0, len(QUANTUM_COLUMNS)), dtype=np.int64)
+        if "qkey" not in columns:
+            columns = dict(columns, qkey=pack_quantum(quantum))
+
+        for name, dtype in PARTICLE_ARRAYS.items():
+            setattr(self, name, np.asarray(columns[name], dtype=dtype))
+        self.names = list(names)
+        self.types = list(types)
+        self.spins = list(spins)
+        self.quantum = np.asarray(quantum, dtype=np.int64)
+        self.valence = np.asarray(columns["valence"], dtype=np.int8)
+        self.degeneracy = np.asarray(
+            columns["degeneracy"] if "degeneracy" in columns else spin_degeneracy(self.spins),
+            dtype=np.float64,
+        )
+
+        # Копии mass и qkey с нулевым элементом в конце: строка -1 служит
+        # заглушкой для кандидатов разной длины
+        if "padded_mass" in columns:
+            self.padded_mass = np.asarray(columns["padded_mass"], dtype=np.float64)
+            self.padded_qkey = np.asarray(columns["padded_qkey"], dtype=np.int64)
+        else:
+            self.padded_mass = np.append(self.mass, 0.0)
+            self.padded_qkey = np.append(self.qkey, 0).astype(np.int64)
+        self.index = {int(m): i for i, m in enumerate(self.mcid)}
+        return self
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, mcid):
+        return mcid in self.index
+
+    def row(self, mcid):
+        """Номер строки частицы (KeyError для неизвестного mcid)"""
+        return self.index[mcid]
+
+    def rows(self, mcids):
+        """Номера строк для набора mcid"""
+        index = self.index
+        return np.fromiter((index[m] for m in mcids), dtype=np.int64)
+
+    def type_of(self, mcid):
+        return self.types[self.index[mcid]]
+
+    def name_of(self, mcid):
+        return self.names[self.index[mcid]]
+
+    def mass_of(self, mcid):
+        return float(self.mass[self.index[mcid]])
+
+    def charge_of(self, mcid):
+        return self.charge3[self.index[mcid]] / 3
+
+    def quantum_of(self, mcid):
+        """Вектор целых аддитивных квантовых чисел частицы"""
+        return self.quantum[self.index[mcid]]
+
+    def key_of(self, mcid):
+        """Упакованный ключ квантовых чисел частицы"""
+        return int(self.qkey[self.index[mcid]])
+
+    def valence_of(self, mcid):
+        """Число валентных кварков частицы по ароматам QUARK_FLAVOURS"""
+        return self.valence[self.index[mcid]]
+
+    def columns(self):
+        """Столбцы таблицы (с производными) для записи в снимок"""
+        columns = {name: getattr(self, name) for name in PARTICLE_ARRAYS}
+        columns.update(
+            quantum=self.quantum,
+            valence=self.valence,
+            degeneracy=self.degeneracy,
+            padded_mass=self.padded_mass,
+            padded_qkey=self.padded_qkey,
+        )
+        return columns
+
+
+# ============================================================================
+# ИНДЕКС ПО КВАНТОВЫМ ЧИСЛАМ
+# ============================================================================
+
+class QuantumIndex:
+    """
+    Частицы, сгруппированные по упакованному ключу квантовых чисел
+
+    Для каждого ключа хранятся строки ParticleTable, отсортированные по массе,
+    поэтому частицы с нужными квантовыми числами и массой не больше заданной
+    находятся одним обращением к словарю и одним бинарным поиском.
+    """
+
+    def __init__(self):
+        self.groups = {}
+        self.rows = _NO_ROWS
+        self.mass = np.zeros(0, dtype=np.float64)
+        self.keys = _NO_ROWS
+        self.offsets = np.zeros(1, dtype=np.int64)
+
+    def load(self, table, rows):
+        """Построить индекс по строкам rows таблицы table"""
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        # Сортировка по ключу, внутри ключа - по массе
+        order = np.lexsort((table.mass[rows], table.qkey[rows]))
+        rows = rows[order]
+        keys = np.asarray(table.qkey[rows], dtype=np.int64)
+        starts = np.flatnonzero(np.diff(keys)) + 1 if len(keys) else _NO_ROWS
+        return self.load_columns({
+            "partner_rows": rows,
+            "partner_mass": np.asarray(table.mass[rows], dtype=np.float64),
+            "partner_keys": keys[np.concatenate(([0], starts))] if len(keys) else _NO_ROWS,
+            "partner_offsets": np.concatenate(([0], starts, [len(rows)])).astype(np.int64),
+        })
+
+    def load_columns(self, columns):
+        """Подключить индекс из столбцов partner_* (например, из снимка)"""
+        self.rows = np.asarray(columns["partner_rows"], dtype=np.int64)
+        self.mass = np.asarray(columns["partner_mass"], dtype=np.float64)
+        self.keys = np.asarray(columns["partner_keys"], dtype=np.int64)
+        self.offsets = np.asarray(columns["partner_offsets"], dtype=np.int64)
+
+        # Группы - срезы общих массивов (без копирования)
+        bounds = self.offsets.tolist()
+        self.groups = {
+            key: (self.rows[start:stop], self.mass[start:stop])
+            for key, start, stop in zip(self.keys.tolist(), bounds[:-1], bounds[1:])
+        }
+        return self
+
+    def columns(self):
+        """Столбцы индекса для записи в снимок"""
+        return {
+            "partner_rows": self.rows,
+            "partner_mass": self.mass,
+            "partner_keys": self.keys,
+            "partner_offsets": self.offsets,
+        }
+
+    def __len__(self):
+        return sum(len(members) for members, _ in self.groups.values())
+
+    def lookup(self, key, mass_limit=np.inf):
+        """Строки частиц с ключом key и массой не больше mass_limit"""
+        group = self.groups.get(key)
+        if group is None:
+            return _NO_ROWS
+        members, masses = group
+        return members[:np.searchsorted(masses, mass_limit, side="right")]
+
+
+_NO_ROWS = np.zeros(0, dtype=np.int64)
+
+
+# ============================================================================
+# ТАБЛИЦА КАНАЛОВ РАСПАДА
+# ============================================================================
+
+class DecayTable:
+    """
+    Каналы распада резонансов в виде плоских массивов
+
+    Каналы одного резонанса лежат подряд: ranges[mcid] = (start, stop).
+    Продукты канала i: products[offsets[i]:offsets[i + 1]] (mcid) и
+    product_rows[...] (строки ParticleTable). Для каждого канала заранее
+    посчитаны суммарная масса продуктов и упакованный ключ их квантовых чисел.
+    """
+
+    def __init__(self):
+        self.ranges = {}
+        self.parent = np.zeros(0, dtype=np.int64)
+        self.fraction = np.zeros(0, dtype=np.float64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.products = np.zeros(0, dtype=np.int64)
+        self.product_rows = np.zeros(0, dtype=np.int64)
+        self.mass = np.zeros(0, dtype=np.float64)
+        self.keys = np.zeros(0, dtype=np.int64)
+
+    @staticmethod
+    def columns_from_channels(decays):
+        """{mcid: [(mcid продуктов, доля), ...]} -> столбцы DECAY_ARRAYS"""
+        columns = {name: [] for name in DECAY_ARRAYS}
+        columns["decay_offsets"].append(0)
+        for parent, channels in decays.items():
+            for products, fraction in channels:
+                columns["decay_parent"].append(parent)
+                columns["decay_bf"].append(np.nan if fraction is None else fraction)
+                columns["decay_products"].extend(products)
+                columns["decay_offsets"].append(len(columns["decay_products"]))
+        return {name: np.asarray(columns[name], dtype=dtype) for name, dtype in DECAY_ARRAYS.items()}
+
+    def load(self, columns, table):
+        """
+        Заполнить таблицу столбцами DECAY_ARRAYS
+
+        Каналы без продуктов или с продуктами, которых нет в table,
+        отбрасываются сразу, чтобы генератор их больше не видел.
+        Столбцы из снимка (с decay_rows и т.д.) уже отфильтрованы и
+        подключаются без копирования.
+        """
+        if "decay_rows" in columns:
+            self.parent = np.asarray(columns["decay_parent"], dtype=np.int64)
+            self.fraction = np.asarray(columns["decay_bf"], dtype=np.float64)
+            self.offsets = np.asarray(columns["decay_offsets"], dtype=np.int64)
+            self.products = np.asarray(columns["decay_products"], dtype=np.int64)
+            self.product_rows = np.asarray(columns["decay_rows"], dtype=np.int64)
+            self.mass = np.asarray(columns["decay_mass"], dtype=np.float64)
+            self.keys = np.asarray(columns["decay_keys"], dtype=np.int64)
+            self.ranges = self._ranges(self.parent)
+            return self
+
+        parent = np.asarray(columns["decay_parent"], dtype=np.int64)
+        fraction = np.asarray(columns["decay_bf"], dtype=np.float64)
+        offsets = np.asarray(columns["decay_offsets"], dtype=np.int64)
+        products = np.asarray(columns["decay_products"], dtype=np.int64)
+
+        keep = []
+        for i in range(len(parent)):
+            chunk = products[offsets[i]:offsets[i + 1]]
+            if len(chunk) and all(int(m) in table.index for m in chunk):
+                keep.append(i)
+
+        # Группируем каналы по резонансу, сохраняя порядок внутри группы
+        groups = {}
+        for i in keep:
+            groups.setdefault(int(parent[i]), []).append(i)
+        order = [i for channels in groups.values() for i in channels]
+
+        lengths = np.array([offsets[i + 1] - offsets[i] for i in order], dtype=np.int64)
+        self.parent = parent[order]
+        self.fraction = fraction[order]
+        self.offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        self.products = np.concatenate(
+            [products[offsets[i]:offsets[i + 1]] for i in order]
+        ) if order else np.zeros(0, dtype=np.int64)
+        self.product_rows = table.rows(self.products.tolist())
+        self.ranges = self._ranges(self.parent)
+
+        if order:
+            starts = self.offsets[:-1]
+            self.mass = np.add.reduceat(table.mass[self.product_rows], starts)
+            self.keys = np.add.reduceat(table.qkey[self.product_rows], starts)
+        else:
+            self.mass = np.zeros(0, dtype=np.float64)
+            self.keys = np.zeros(0, dtype=np.int64)
+        return self
+
+    @staticmethod
+    def _ranges(parent):
+        """{mcid: (start, stop)} для каналов, сгруппированных по резонансу"""
+        if not len(parent):
+            return {}
+        bounds = np.flatnonzero(np.diff(parent)) + 1
+        starts = np.concatenate(([0], bounds)).tolist()
+        stops = np.concatenate((bounds, [len(parent)])).tolist()
+        return {
+            mcid: (start, stop)
+            for mcid, start, stop in zip(np.asarray(parent)[starts].tolist(), starts, stops)
+        }
+
+    def __len__(self):
+        return len(self.parent)
+
+    def __contains__(self, mcid):
+        return mcid in self.ranges
+
+    def channels_of(self, mcid):
+        """Диапазон номеров каналов резонанса (пустой, если каналов нет)"""
+        start, stop = self.ranges.get(mcid, (0, 0))
+        return range(start, stop)
+
+    def products_of(self, channel):
+        """mcid продуктов канала"""
+        return self.products[self.offsets[channel]:self.offsets[channel + 1]]
+
+    def columns(self):
+        """Столбцы DECAY_ARRAYS для записи в снимок"""
+        return {
+            "decay_parent": self.parent,
+            "decay_bf": self.fraction,
+            "decay_offsets": self.offsets,
+            "decay_products": self.products,
+            "decay_rows": self.product_rows,
+            "decay_mass": self.mass,
+            "decay_keys": self.keys,
+        }
+
+
+# ============================================================================
+# ЗАПИСЬ
+# ============================================================================
+
+def write_snapshot(table, decays, partners, source=None, root=SNAPSHOT_ROOT):
+    """
+    Записать снимок каталога
+
+    Args:
+        table: заполненная ParticleTable
+        decays: заполненная DecayTable
+        partners: QuantumIndex по частицам-партнёрам
+        source: описание источника (издание PDG и т.п.) для index.json
+
+    Returns:
+        путь к записанному поколению снимка
+    """
+    columns = table.columns()
+    columns.update(decays.columns())
+    columns.update(partners.columns())
+
+    base = snapshot_path(root)
+    generation = f"g{time.time_ns()}-{os.getpid()}"
+    tmp = os.path.join(base, f".{generation}.tmp")
+    os.makedirs(tmp)
+
+    arrays = {}
+    for name, dtype in {**PARTICLE_ARRAYS, **DECAY_ARRAYS, **DERIVED_ARRAYS}.items():
+        array = np.asarray(columns[name], dtype=dtype)
+        np.save(os.path.join(tmp, f"{name}.npy"), array)
+        arrays[name] = {"dtype": array.dtype.str, "shape": list(array.shape)}
+
+    index = {
+        "version": SNAPSHOT_VERSION,
+        "source": source or {},
+        "count": len(table),
+        "channels": len(decays),
+        "names": table.names,
+        "types": table.types,
+        "spins": table.spins,
+        "arrays": arrays,
+    }
+    with open(os.path.join(tmp, INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+
+    target = os.path.join(base, generation)
+    os.replace(tmp, target)
+
+    # Переключаем указатель: rename атомарен, старое поколение не трогаем
+    pointer = os.path.join(base, f".{CURRENT_FILE}.{generation}.tmp")
+    with open(pointer, "w", encoding="utf-8") as f:
+        f.write(generation)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer, os.path.join(base, CURRENT_FILE))
+
+    _prune_generations(base, current=generation)
+    return target
+
+
+def _prune_generations(base, current, keep=SNAPSHOT_KEEP):
+    """Удалить поколения старше `keep` последних (действующее - никогда)"""
+    generations = sorted(
+        (entry.name for entry in os.scandir(base) if entry.is_dir() and entry.name.startswith("g")),
+        key=lambda name: int(name[1:].split("-")[0]),
+    )
+    for name in generations[:-keep]:
+        if name != current:
+            shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+
+
+# ============================================================================
+# ЧТЕНИЕ
+# ============================================================================
+
+class Snapshot:
+    """Открытый снимок: массивы отображены в память только для чтения"""
+
+    def __init__(self, path, index, arrays):
+        self.path = path
+        self.index = index
+        self.arrays = arrays
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    @property
+    def names(self):
+        return self.index["names"]
+
+    @property
+    def types(self):
+        return self.index["types"]
+
+    @property
+    def spins(self):
+        return self.index["spins"]
+
+    def __len__(self):
+        return self.index["count"]
+
+
+def open_snapshot(root=SNAPSHOT_ROOT):
+    """
+    Открыть снимок каталога
+
+    Returns:
+        Snapshot или None, если снимка нет или его версия устарела
+    """
+    # Если указатель переключили между его чтением и открытием файлов,
+    # а старое поколение успели удалить, открываем новое
+    for _ in range(2):
+        path = current_snapshot(root)
+        snapshot = _open_generation(path)
+        if snapshot is not None or current_snapshot(root) == path:
+            return snapshot
+    return None
+
+
+def _open_generation(path):
+    try:
+        with open(os.path.join(path, INDEX_FILE), encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if index.get("version") != SNAPSHOT_VERSION:
+        return None
+
+    arrays = {}
+    try:
+        for name, meta in index["arrays"].items():
+            # пустой массив нельзя отобразить в память
+            mode = "r" if np.prod(meta["shape"]) else None
+            array = np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+            if array.dtype.str != meta["dtype"] or list(array.shape) != meta["shape"]:
+                return None
+            arrays[name] = array
+    except (OSError, ValueError, KeyError):
+        return None
+
+    return Snapshot(path, index, arrays)
@@ -0,0 +1,166 @@
+import json
+import struct
+from array import array
+
+try:
+    import orjson
+except ImportError:  # без orjson - стандартный json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack недоступен, формат не предлагается
+    msgpack = None
+
+# ============================================================================
+# ФОРМАТЫ ОТВЕТА СИМУЛЯЦИИ
+# ============================================================================
+#
+# Формат выбирается параметром ?format= или заголовком Accept:
+#   json      application/json                      прежний вид ответа
+#   columnar  application/vnd.lhc.columnar+json     столбцы, без ключей id_N
+#   binary    application/vnd.lhc.event             заголовок + запись + массивы
+#   msgpack   application/x-msgpack                 столбцы в MessagePack
+#
+# Столбцовый вид описывает N событий одного столкновения (запрос - одно
+# событие): продукты события i - products[offsets[i]:offsets[i + 1]].
+#
+# Двоичный вид (little-endian):
+#   HEADER  magic b"LHCE", версия u16, резерв u16, N событий u32, M продуктов u32
+#   RECORD  Mass, BaryonNum, Charge, momentum (f64); S, B, C, track_count,
+#           init_id1, init_id2 (i32); seed (i64, -1 - нет)
+#   offsets i32[N + 1], first i32[2N], type i8[N], products i32[M]
+#
+# Номер типа анимации - индекс в ANIMATION_TYPES; порядок менять нельзя.
+
+ANIMATION_TYPES = ("Standard", "Muon Event", "Higgs Boson", "W/Z Boson", "Jet Event")
+
+MAGIC = b"LHCE"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+RECORD = struct.Struct("<ddddiiiiiiq")
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "columnar": "application/vnd.lhc.columnar+json",
+    "binary": "application/vnd.lhc.event",
+    "msgpack": "application/x-msgpack",
+}
+# Другие названия тех же типов в Accept
+ACCEPT_ALIASES = {
+    "application/octet-stream": "binary",
+    "application/msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+}
+
+
+def available():
+    """Форматы, которые можно выдать в этом окружении"""
+    return [name for name in CONTENT_TYPES if name != "msgpack" or msgpack is not None]
+
+
+def negotiate(query_format=None, accept=None):
+    """
+    Формат ответа по ?format= (приоритетнее) или заголовку Accept
+
+    Accept без поддерживаемых типов (браузер, text/*, опечатка) не ошибка:
+    ответ в json, как без заголовка.
+
+    Returns:
+        имя формата или None, если недоступен формат из ?format=
+    """
+    formats = available()
+    if query_format:
+        return query_format if query_format in formats else None
+    if not accept:
+        return "json"
+
+    by_type = {CONTENT_TYPES[name]: name for name in formats}
+    by_type.update((t, name) for t, name in ACCEPT_ALIASES.items() if name in formats)
+
+    best, best_q = None, 0.0
+    for item in accept.split(","):
+        media, *params = (part.strip() for part in item.split(";"))
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        name = "json" if media in ("*/*", "application/*") else by_type.get(media)
+        if name is not None and q > best_q:
+            best, best_q = name, q
+    return best or "json"
+
+
+# ============================================================================
+# КОДИРОВАНИЕ
+# ============================================================================
+
+def columns(result):
+    """Прежний ответ [продукты], [первичные], [параметры], [начальные] -> столбцы"""
+    products, first, values, init = (part[0] for part in result)
+    values = dict(values)
+    strangeness, bottom, charm = values.pop("S,B,C")
+    event_type = values.pop("type")
+    return {
+        "version": VERSION,
+        "products": list(products.values()),
+        "offsets": [0, len(products)],
+        "first": [first["id_1"], first["id_2"]],
+        "type": [ANIMATION_TYPES.index(event_type) if event_type in ANIMATION_TYPES else 0],
+        "init": [init["init_id1"], init["init_id2:"]],
+        "mass": values.pop("Mass"),
+        "baryon": values.pop("BaryonNum"),
+        "charge": values.pop("Charge"),
+        "sbc": [strangeness, bottom, charm],
+        "track_count": values.pop("track_count"),
+        "momentum": values.pop("momentum"),
+        "seed": values.pop("seed", None),
+        **values,   # остальное (например, profile) - как есть
+    }
+
+
+def encode_binary(data):
+    seed = data["seed"]
+    products = array("i", data["products"])
+    header = HEADER.pack(MAGIC, VERSION, 0, len(data["type"]), len(products))
+    record = RECORD.pack(
+        data["mass"], data["baryon"], data["charge"], data["momentum"],
+        *data["sbc"], data["track_count"], *data["init"],
+        -1 if seed is None else seed,
+    )
+    return b"".join((
+        header,
+        record,
+        array("i", data["offsets"]).tobytes(),
+        array("i", data["first"]).tobytes(),
+        array("b", data["type"]).tobytes(),
+        products.tobytes(),
+    ))
+
+
+def _json(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def encode(result, fmt):
+    """
+    Результат Collide_Simulation в выбранном формате
+
+    Returns:
+        (тело ответа, Content-Type)
+    """
+    if fmt == "json":
+        return _json(result), CONTENT_TYPES["json"]
+    data = columns(result)
+    if fmt == "columnar":
+        return _json(data), CONTENT_TYPES["columnar"]
+    if fmt == "binary":
+        return encode_binary(data), CONTENT_TYPES["binary"]
+    if fmt == "msgpack" and msgpack is not None:
+        return msgpack.packb(data), CONTENT_TYPES["msgpack"]
+    raise ValueError(f"Неизвестный формат ответа: {fmt}")
@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+import queue
+import atexit
+import weakref
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# ============================================================================
+# ЖУРНАЛ СИМУЛЯЦИЙ
+# ============================================================================
+#
+# Симулятор пишет записи по стадиям (setup, generate, result, ...) с полями
+# в extra. В продакшене уровень выше DEBUG: вызов logger.debug стоит одной
+# проверки уровня, строки не форматируются. Включённые записи:
+#   SampledFilter      - при большом потоке пропускает не больше rate записей
+#                        в секунду на логгер (WARNING и выше - всегда);
+#   BackgroundHandler  - форматирует запись в вызывающем потоке (поля extra
+#                        могут измениться сразу после вызова) и кладёт готовую
+#                        строку в очередь; в поток её пишет отдельный поток.
+
+# fork из процесса с потоками (пул в режиме fork): блокировки фильтров
+# берутся перед fork и отпускаются после него, чтобы потомок не получил
+# их захваченными. Блокировки обработчиков после fork пересоздаёт сам
+# модуль logging, очередь и поток BackgroundHandler - сам обработчик.
+_fork_guarded = weakref.WeakSet()
+
+
+def _before_fork():
+    for guarded in list(_fork_guarded):
+        guarded._lock.acquire()
+
+
+def _after_fork():
+    for guarded in list(_fork_guarded):
+        guarded._lock.release()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_before_fork, after_in_parent=_after_fork, after_in_child=_after_fork)
+
+# Атрибуты LogRecord, которые есть у любой записи: остальное пришло из extra
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "skipped"}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Обычная строка журнала + поля из extra в виде key=value"""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = [
+            f"{key}={value!r}" for key, value in vars(record).items()
+            if key not in _STANDARD_ATTRS and not key.startswith("_")
+        ]
+        skipped = getattr(record, "skipped", 0)
+        if skipped:
+            fields.append(f"skipped={skipped}")
+        return f"{line} {' '.join(fields)}" if fields else line
+
+
+class SampledFilter(logging.Filter):
+    """
+    Ограничение потока записей (ведро токенов на каждый логгер)
+
+    Args:
+        rate: записей в секунду на логгер (0 - без ограничения)
+        burst: сколько записей можно выпустить подряд
+
+    Число отброшенных записей попадает в поле skipped следующей пропущенной.
+    """
+
+    def __init__(self, name="", rate=50.0, burst=None):
+        super().__init__(name)
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(self.rate, 1.0))
+        self._buckets = {}      # логгер -> [токены, время, отброшено]
+        self._lock = threading.Lock()
+        _fork_guarded.add(self)
+
+    def filter(self, record):
+        if not self.rate or record.levelno >= logging.WARNING:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                bucket = self._buckets[record.name] = [self.burst, now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1.0
+            record.skipped, bucket[2] = bucket[2], 0
+        return True
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    Неблокирующий обработчик: запись в очередь, вывод в фоновом потоке
+
+    Args:
+        stream: куда писать (по умолчанию sys.stderr)
+
+    Строка собирается в prepare (QueueHandler.prepare: сообщение, поля
+    extra и трассировка - в момент вызова), фоновый поток только пишет её.
+    После fork (воркеры пула) поток-слушатель в дочернем процессе
+    запускается заново.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self._pid = None
+        self._start()
+        atexit.register(self._stop)
+
+    def _start(self):
+        self._pid = os.getpid()
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def _stop(self):
+        if self._pid == os.getpid() and self.listener._thread is not None:
+            self.listener.stop()
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            # Дочерний процесс после fork: очередь и поток родителя не наши
+            self.queue = queue.SimpleQueue()
+            self._start()
+        super().enqueue(record)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from main import catalog
+
+
+class Command(BaseCommand):
+    help = "Собрать снимок каталога частиц из PDG-базы"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--root", default=catalog.SNAPSHOT_ROOT)
+
+    def handle(self, *args, **options):
+        from main.LHC_Simulator import build_catalog_snapshot
+
+        path = build_catalog_snapshot(root=options["root"])
+        snapshot = catalog.open_snapshot(options["root"])
+        if snapshot is None:
+            self.stdout.write(self.style.ERROR(f"ОШИБКА: снимок {path} не читается"))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Снимок → {path}: {len(snapshot)} частиц, {snapshot.index['channels']} каналов распада"
+        ))
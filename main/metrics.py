@@ -0,0 +1,142 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# ============================================================================
+# МЕТРИКИ СИМУЛЯЦИЙ
+# ============================================================================
+#
+# Счётчики и гистограммы в памяти процесса, без внешних сервисов:
+# /metrics отдаёт их в текстовом формате Prometheus. Воркеры пула копят
+# свои значения и возвращают приращения вместе с результатом (drain),
+# родитель добавляет их к своим (merge).
+#
+# Метрика задаётся именем и метками: inc("simulation_events_total",
+# interaction_type="hadron-hadron", outcome="found").
+
+# Границы корзин: время стадий (сек) и число попыток на событие
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+ATTEMPT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000)
+
+_counters = {}      # (имя, метки) -> значение
+_histograms = {}    # (имя, метки) -> [границы, счётчики корзин, сумма, количество]
+_lock = threading.Lock()
+
+# Пул в режиме fork запускает воркеров из процесса с потоками: без этого
+# потомок мог бы получить _lock захваченным посреди inc() другого потока
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_lock.acquire, after_in_parent=_lock.release, after_in_child=_lock.release)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Увеличить счётчик"""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """Добавить наблюдение в гистограмму"""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [buckets, [0] * (len(buckets) + 1), 0.0, 0]
+        histogram[1][bisect_left(histogram[0], value)] += 1
+        histogram[2] += value
+        histogram[3] += 1
+
+
+@contextmanager
+def timer(stage, **labels):
+    """Время блока в гистограмму simulation_stage_seconds{stage=...}"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("simulation_stage_seconds", time.perf_counter() - started, stage=stage, **labels)
+
+
+def swallowed(where, error):
+    """Учесть исключение, которое перехвачено и не дошло до клиента"""
+    inc("simulation_swallowed_exceptions_total", where=where, exception=type(error).__name__)
+
+
+# ============================================================================
+# ПЕРЕДАЧА МЕЖДУ ПРОЦЕССАМИ
+# ============================================================================
+
+def drain():
+    """Накопленные значения (для передачи родителю); сами метрики обнуляются"""
+    with _lock:
+        counters = list(_counters.items())
+        histograms = [(key, (h[0], list(h[1]), h[2], h[3])) for key, h in _histograms.items()]
+        _counters.clear()
+        _histograms.clear()
+    return counters, histograms
+
+
+def merge(delta):
+    """Добавить приращения, полученные от drain() другого процесса"""
+    counters, histograms = delta
+    with _lock:
+        for key, value in counters:
+            _counters[key] = _counters.get(key, 0) + value
+        for key, (buckets, counts, total, count) in histograms:
+            histogram = _histograms.get(key)
+            if histogram is None:
+                histogram = _histograms[key] = [buckets, [0] * len(counts), 0.0, 0]
+            histogram[1] = [a + b for a, b in zip(histogram[1], counts)]
+            histogram[2] += total
+            histogram[3] += count
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+# ============================================================================
+# ТЕКСТОВЫЙ ФОРМАТ
+# ============================================================================
+
+def _labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in items) + "}"
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus"""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, (h[0], list(h[1]), h[2], h[3])) for key, h in _histograms.items())
+
+    lines = []
+    typed = set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+    for (name, labels), (buckets, counts, total, count) in histograms:
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, n in zip(buckets, counts):
+            cumulative += n
+            lines.append(f"{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {count}")
+        lines.append(f"{name}_sum{_labels(labels)} {total}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,32 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimulationProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('options', models.JSONField(default=dict, verbose_name='Параметры запроса')),
+                ('seconds', models.FloatField(verbose_name='Время симуляции (сек)')),
+                ('top', models.JSONField(default=list, help_text='function, calls, tottime, cumtime - по убыванию собственного времени', verbose_name='Самые затратные функции')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='simulation_profiles', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль симуляции',
+                'verbose_name_plural': 'Профили симуляций',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['-created_at'], name='main_simula_created_e7a4ac_idx')],
+            },
+        ),
+    ]
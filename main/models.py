@@ -1,3 +1,59 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class SimulationProfile(models.Model):
+    """Профиль одного запроса симуляции (?profile=1 от сотрудника)"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='simulation_profiles',
+        verbose_name="Пользователь"
+    )
+
+    options = models.JSONField(
+        default=dict,
+        verbose_name="Параметры запроса"
+    )
+
+    seconds = models.FloatField(
+        verbose_name="Время симуляции (сек)"
+    )
+
+    top = models.JSONField(
+        default=list,
+        verbose_name="Самые затратные функции",
+        help_text="function, calls, tottime, cumtime - по убыванию собственного времени"
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата"
+    )
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Профиль симуляции"
+        verbose_name_plural = "Профили симуляций"
+        indexes = [
+            models.Index(fields=['-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.options.get('id_1')} + {self.options.get('id_2')}, {self.seconds:.3f} сек"
+
+    @classmethod
+    def store(cls, user, options, seconds, top, keep):
+        """Сохранить профиль и оставить только keep последних"""
+        profile = cls.objects.create(
+            user=user,
+            options=options if isinstance(options, dict) else {},
+            seconds=seconds,
+            top=top,
+        )
+        stale = cls.objects.order_by('-created_at', '-id').values_list('id', flat=True)[keep:]
+        cls.objects.filter(id__in=list(stale)).delete()
+        return profile
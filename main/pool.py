@@ -0,0 +1,390 @@
+import gc
+import os
+import time
+import resource
+import threading
+from multiprocessing import get_context
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from . import metrics
+
+# ============================================================================
+# ПУЛ ПРОЦЕССОВ ДЛЯ СИМУЛЯЦИЙ
+# ============================================================================
+#
+# Генерация события - чистая CPU-работа на Python, поэтому внутри одного
+# процесса Daphne симуляции разных пользователей выполняются по очереди (GIL).
+# Пул держит заранее прогретые процессы с уже загруженным каталогом и
+# раздаёт им запросы с ограничением очереди и таймаутом.
+#
+# Два способа запуска воркеров:
+#   spawn - каждый воркер сам открывает снимок каталога (по умолчанию);
+#   fork  - каталог загружается один раз в однопоточном процессе forkserver
+#           (main/preload.py), объекты замораживаются (gc.freeze) и воркеры,
+#           порождённые из него fork, получают их копией-при-записи: сборщик
+#           мусора не трогает их счётчики и страницы остаются общими. Сам
+#           веб-процесс не форкается - в нём уже работают потоки.
+
+
+class PoolBusy(Exception):
+    """Очередь пула заполнена"""
+
+
+class SimulationTimeout(Exception):
+    """Симуляция не уложилась в отведённое время"""
+
+
+# Статистика текущего процесса-воркера
+_worker = {}
+
+
+def _warm_worker(start_method="spawn"):
+    """Инициализация воркера: каталог загружается до первого запроса"""
+    # После fork здесь метрики родителя - они уже учтены у него
+    metrics.reset()
+    _worker.update(
+        pid=os.getpid(),
+        start_method=start_method,
+        started=time.perf_counter(),
+        simulations=0,
+        first_simulation_seconds=None,
+    )
+    from .simulation import LoadAll
+    LoadAll()
+    _worker["load_seconds"] = time.perf_counter() - _worker["started"]
+
+
+def _memory():
+    """RSS и его разделяемая часть (МБ) текущего процесса"""
+    try:
+        with open("/proc/self/statm") as f:
+            _, resident, shared = (int(x) for x in f.read().split()[:3])
+        page = os.sysconf("SC_PAGE_SIZE") / 2**20
+        return resident * page, shared * page
+    except (OSError, ValueError):
+        # не Linux: только пиковый RSS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, None
+
+
+def _worker_stats():
+    rss, shared = _memory()
+    stats = {k: v for k, v in _worker.items() if k != "started"}
+    stats.update(rss_mb=round(rss, 1), shared_mb=shared and round(shared, 1))
+    # Приращения метрик воркера: родитель добавит их к своим (см. _record)
+    stats["metrics"] = metrics.drain()
+    return stats
+
+
+def _ping():
+    return _worker_stats()
+
+
+def _run_simulation(options, profile=0):
+    """
+    Симуляция в воркере: (результат, статистика воркера)
+
+    profile > 0 - под cProfile: результат - (результат, профиль) с profile
+    самыми затратными функциями (см. profiling.profile_call)
+    """
+    from .simulation import Collide_Simulation
+    if profile:
+        from .profiling import profile_call
+        result = profile_call(Collide_Simulation, options, top=profile)
+    else:
+        result = Collide_Simulation(options)
+
+    _worker["simulations"] = _worker.get("simulations", 0) + 1
+    if _worker.get("first_simulation_seconds") is None and "started" in _worker:
+        _worker["first_simulation_seconds"] = time.perf_counter() - _worker["started"]
+    return result, _worker_stats()
+
+
+def _run_batch(id_1, id_2, beam_energy, n_events):
+    """Пакет событий в воркере: (пакет, статистика воркера)"""
+    from .LHC_Simulator import simulate_batch
+    return simulate_batch(id_1, id_2, beam_energy, n_events), _worker_stats()
+
+
+def _preload_for_fork():
+    """Загрузка каталога в forkserver перед fork воркеров и заморозка объектов для GC"""
+    from .simulation import LoadAll
+    LoadAll()
+    gc.collect()
+    gc.freeze()
+
+
+# Пауза между раундами пингов, пока не все воркеры загрузили каталог (сек)
+WARM_UP_POLL = 0.1
+
+
+class SimulationPool:
+    """
+    Пул воркеров симуляции
+
+    Args:
+        workers: количество процессов
+        max_pending: максимум одновременно принятых запросов (в работе + в очереди)
+        timeout: время ожидания результата одного запроса (сек)
+        max_tasks_per_child: после стольких запросов воркер перезапускается
+        start_method: "spawn" или "fork" (каталог грузится в forkserver)
+        warm_up_timeout: сколько ждать загрузки каталога во всех воркерах (сек)
+
+    worker_stats - последняя статистика каждого воркера по pid: RSS,
+    время загрузки каталога и время до первой симуляции (меняется из
+    потоков обратного вызова под self._lock; снаружи читать через stats()).
+    """
+
+    def __init__(self, workers, max_pending=None, timeout=30.0, max_tasks_per_child=None,
+                 start_method="spawn", warm_up_timeout=120.0):
+        if start_method not in ("spawn", "fork"):
+            raise ValueError(f"Неизвестный способ запуска воркеров: {start_method}")
+
+        self.workers = workers
+        self.timeout = timeout
+        self.warm_up_timeout = warm_up_timeout
+        self.start_method = start_method
+        self.max_tasks_per_child = max_tasks_per_child
+        self.worker_stats = {}
+        self._slots = threading.BoundedSemaphore(max_pending or workers * 4)
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        if self.start_method == "fork":
+            # Воркеры (и их замены после max_tasks_per_child) форкаются из
+            # forkserver, который при запуске импортировал main.preload
+            context = get_context("forkserver")
+            context.set_forkserver_preload(["main.preload"])
+        else:
+            context = get_context("spawn")
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_warm_worker,
+            initargs=(self.start_method,),
+            max_tasks_per_child=self.max_tasks_per_child,
+        )
+
+    def _record(self, stats):
+        delta = stats.pop("metrics", None)
+        if delta is not None:
+            metrics.merge(delta)
+
+        # Держим только последние `workers` записей: pid перезапущенных
+        # воркеров вытесняются
+        with self._lock:
+            self.worker_stats.pop(stats["pid"], None)
+            self.worker_stats[stats["pid"]] = stats
+            while len(self.worker_stats) > self.workers:
+                self.worker_stats.pop(next(iter(self.worker_stats)))
+
+    def stats(self):
+        """Копия worker_stats (список по воркерам)"""
+        with self._lock:
+            return list(self.worker_stats.values())
+
+    def warm_up(self):
+        """
+        Запустить все процессы и дождаться загрузки каталога в каждом
+
+        Воркер берёт задачи только после загрузки, поэтому на пинги первым
+        отвечает тот, кто уже готов - и может ответить на все. Пинги
+        повторяются, пока не ответит каждый из `workers` процессов, но не
+        дольше warm_up_timeout (иначе SimulationTimeout).
+        """
+        executor = self._executor
+        deadline = time.monotonic() + self.warm_up_timeout
+        pids = set()
+        while True:
+            futures = [executor.submit(_ping) for _ in range(self.workers)]
+            try:
+                for f in futures:
+                    stats = f.result(timeout=max(0.0, deadline - time.monotonic()))
+                    pids.add(stats["pid"])
+                    self._record(stats)
+            except FutureTimeout:
+                for f in futures:
+                    f.cancel()
+                break
+            if len(pids) >= self.workers:
+                return sorted(pids)
+            if time.monotonic() + WARM_UP_POLL > deadline:
+                break
+            time.sleep(WARM_UP_POLL)
+
+        raise SimulationTimeout(
+            f"Воркеры не загрузили каталог за {self.warm_up_timeout:g} с "
+            f"(готово {len(pids)} из {self.workers})"
+        )
+
+    def submit(self, fn, *args):
+        """Поставить задачу в очередь (PoolBusy, если очередь заполнена)"""
+        if not self._slots.acquire(blocking=False):
+            raise PoolBusy("Сервер симуляций перегружен, повторите запрос позже")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def submit_simulation(self, options, profile=0):
+        """
+        Поставить симуляцию столкновения в очередь, вернуть Future
+
+        Воркер возвращает ещё и свою статистику: она попадает в worker_stats,
+        а Future получает только результат (с profile - пару результат,
+        профиль). Отмена Future снимает задачу с очереди пула.
+        """
+        task = self.submit(_run_simulation, options, profile)
+        future = Future()
+
+        def task_done(task):
+            try:
+                if task.cancelled():
+                    future.cancel()
+                elif task.exception() is not None:
+                    future.set_exception(task.exception())
+                else:
+                    result, stats = task.result()
+                    self._record(stats)
+                    future.set_result(result)
+            except InvalidStateError:
+                pass  # future уже отменён ожидающей стороной
+
+        def future_done(future):
+            if future.cancelled():
+                task.cancel()
+
+        task.add_done_callback(task_done)
+        future.add_done_callback(future_done)
+        return future
+
+    def run(self, options, timeout=None):
+        """Симуляция одного столкновения в пуле"""
+        future = self.submit_simulation(options)
+        try:
+            return future.result(timeout=timeout or self.timeout)
+        except FutureTimeout:
+            # Ещё не начатая задача снимается с очереди; начатая доработает
+            # сама (её время ограничено бюджетом попыток генератора)
+            future.cancel()
+            raise SimulationTimeout("Симуляция не завершилась вовремя")
+
+    def run_batch(self, id_1, id_2, beam_energy, n_events, timeout=None):
+        """Пакет событий одной конфигурации в пуле (для запаса событий)"""
+        future = self.submit(_run_batch, id_1, id_2, beam_energy, n_events)
+        try:
+            batch, stats = future.result(timeout=timeout or self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise SimulationTimeout("Пакет событий не завершился вовремя")
+        self._record(stats)
+        return batch
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# ============================================================================
+# ЭКЗЕМПЛЯР ДЛЯ ВЕБ-ПРОЦЕССА
+# ============================================================================
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_state = "cold"        # cold | warming | ready | failed
+_pool_error = None
+
+
+def get_pool():
+    """
+    Пул из настроек SIMULATION_* (создаётся и прогревается при первом вызове)
+
+    Returns:
+        SimulationPool или None, если SIMULATION_WORKERS = 0
+    """
+    global _pool, _pool_state, _pool_error
+
+    if _pool is not None:
+        return _pool
+
+    from django.conf import settings
+
+    workers = getattr(settings, "SIMULATION_WORKERS", 0)
+    if not workers:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            _pool_state = "warming"
+            pool = SimulationPool(
+                workers=workers,
+                max_pending=getattr(settings, "SIMULATION_QUEUE_DEPTH", None),
+                timeout=getattr(settings, "SIMULATION_TIMEOUT", 30.0),
+                max_tasks_per_child=getattr(settings, "SIMULATION_MAX_TASKS_PER_CHILD", None),
+                start_method=getattr(settings, "SIMULATION_START_METHOD", "spawn"),
+                warm_up_timeout=getattr(settings, "SIMULATION_WARM_UP_TIMEOUT", 120.0),
+            )
+            try:
+                pool.warm_up()
+            except Exception as e:
+                pool.shutdown(wait=False)
+                _pool_state = "failed"
+                _pool_error = repr(e)
+                raise
+            _pool = pool
+            _pool_error = None
+            _pool_state = "ready"
+    return _pool
+
+
+# ============================================================================
+# ПРОГРЕВ ПРИ СТАРТЕ И ГОТОВНОСТЬ
+# ============================================================================
+
+def warm_up():
+    """Загрузить всё, что нужно для симуляций: пул (если включён) или каталог"""
+    if get_pool() is None:
+        from .simulation import LoadAll
+        LoadAll()
+
+
+def start_warm_up():
+    """
+    Прогрев в фоновом потоке (вызывается при старте ASGI-приложения)
+
+    Ошибка не роняет сервер: она видна в /api/ready, а первый запрос
+    повторит загрузку.
+    """
+    def run():
+        try:
+            warm_up()
+        except Exception as e:
+            metrics.swallowed("warm_up", e)
+
+    thread = threading.Thread(target=run, name="simulation-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness():
+    """
+    Готов ли процесс принимать симуляции
+
+    Returns:
+        (ready, status) - флаг и подробности для /api/ready
+    """
+    from django.conf import settings
+    from .simulation import catalog_status
+
+    if getattr(settings, "SIMULATION_WORKERS", 0):
+        status = {"mode": "pool", "state": _pool_state, "error": _pool_error}
+        if _pool is not None:
+            status["workers"] = _pool.workers
+            status["start_method"] = _pool.start_method
+            status["worker_stats"] = _pool.stats()
+    else:
+        status = {"mode": "inline", **catalog_status()}
+
+    return status["state"] == "ready", status
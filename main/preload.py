@@ -0,0 +1,13 @@
+# ============================================================================
+# ПРЕДЗАГРУЗКА ДЛЯ FORKSERVER
+# ============================================================================
+#
+# При SIMULATION_START_METHOD=fork воркеры пула порождаются не из веб-процесса
+# (в нём уже работают потоки Daphne, прогрева, запаса событий и журнала, и
+# fork мог бы унести в дочерний процесс чужую захваченную блокировку), а из
+# однопоточного forkserver. Он импортирует этот модуль при запуске: каталог
+# загружается и замораживается один раз, воркеры получают его копией-при-записи.
+
+from .pool import _preload_for_fork
+
+_preload_for_fork()
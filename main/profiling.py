@@ -0,0 +1,47 @@
+import os
+import time
+import pstats
+import cProfile
+
+# ============================================================================
+# ПРОФИЛИРОВАНИЕ ОДНОГО ЗАПРОСА
+# ============================================================================
+#
+# По запросу сотрудника (?profile=1) симуляция выполняется под cProfile,
+# и в ответ попадают самые затратные места. Модуль без Django: профиль
+# снимается там же, где идёт симуляция (в воркере пула или в потоке).
+
+
+def call_sites(profiler, top=25):
+    """
+    Самые затратные функции профиля
+
+    Returns:
+        список словарей по убыванию собственного времени: function
+        ("файл:строка(имя)"), calls, tottime, cumtime (сек)
+    """
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+    return [
+        {
+            "function": f"{os.path.basename(file)}:{line}({name})",
+            "calls": calls,
+            "tottime": round(tottime, 6),
+            "cumtime": round(cumtime, 6),
+        }
+        for (file, line, name), (_, calls, tottime, cumtime, _) in rows
+    ]
+
+
+def profile_call(fn, *args, top=25):
+    """
+    Вызов fn(*args) под cProfile
+
+    Returns:
+        (результат, {"seconds": общее время, "top": call_sites(...)})
+    """
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    result = profiler.runcall(fn, *args)
+    seconds = time.perf_counter() - started
+    return result, {"seconds": round(seconds, 6), "top": call_sites(profiler, top)}
@@ -0,0 +1,280 @@
+import threading
+from math import floor, log10
+from collections import OrderedDict, deque
+
+from . import metrics
+
+# ============================================================================
+# ЗАПАС ГОТОВЫХ СОБЫТИЙ
+# ============================================================================
+#
+# Большая часть запросов - несколько типовых конфигураций пучков. Для каждой
+# (id_1, id_2, интервал энергии пучка) держится запас заранее разыгранных
+# событий: запрос забирает готовое событие за O(1), а фоновый поток пополняет
+# запас пакетами simulate_batch в пуле процессов (без пула запаса нет). Время
+# ответа не зависит от того, сколько попыток понадобилось генератору.
+#
+# Запас заводится только для конфигураций, которые запросили не меньше
+# min_requests раз: разовый запрос не стоит пакета из сотен событий.
+#
+# События разыгрываются при нижней границе интервала энергии: √s растёт
+# вместе с энергией, так что всё, что разрешено там по массе, разрешено и при
+# любой энергии интервала. Параметры ответа (Mass, momentum, ...) считаются
+# по реальной энергии запроса из столкновения пакета - без каталога частиц,
+# поэтому веб-процесс при работе через пул каталог не загружает.
+#
+# Запросы с явным seed сюда не попадают - они должны воспроизводиться.
+
+ENERGY_BINS_PER_DECADE = 50
+
+
+def _run_batch_inline(id_1, id_2, beam_energy, n_events):
+    from .simulation import LoadAll
+    from .LHC_Simulator import simulate_batch
+
+    LoadAll()
+    return simulate_batch(id_1, id_2, beam_energy, n_events)
+
+
+class _Stock:
+    """Запас одной конфигурации: пакеты и номер следующего события в первом"""
+
+    def __init__(self, beam_energy):
+        self.beam_energy = beam_energy
+        self.requests = 0
+        self.batches = deque()
+        self.next = 0
+        self.count = 0
+        self.nbytes = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, batch):
+        self.batches.append(batch)
+        self.count += len(batch)
+        self.nbytes += _batch_nbytes(batch)
+
+    def pop(self):
+        if not self.batches:
+            return None
+        batch, i = self.batches[0], self.next
+        self.next += 1
+        self.count -= 1
+        if self.next == len(batch):
+            self.batches.popleft()
+            self.next = 0
+            self.nbytes -= _batch_nbytes(batch)
+        return batch, i
+
+
+def _batch_nbytes(batch):
+    return sum(a.nbytes for a in (batch.products, batch.offsets, batch.first, batch.found, batch.anim))
+
+
+class EventReservoir:
+    """
+    Запасы событий по конфигурациям пучков
+
+    Args:
+        events_per_config: целевой размер запаса одной конфигурации
+        memory_budget: предел памяти всех запасов (байт); при превышении
+            вытесняются давно не запрашивавшиеся конфигурации
+        runner: функция (id_1, id_2, beam_energy, n_events) -> EventBatch
+        min_requests: сколько раз конфигурацию должны запросить, прежде чем
+            для неё заводится запас
+        max_configs: сколько конфигураций (в том числе без запаса) помнить
+    """
+
+    def __init__(self, events_per_config=256, memory_budget=16 * 2**20, runner=None,
+                 min_requests=8, max_configs=256):
+        self.events_per_config = events_per_config
+        self.memory_budget = memory_budget
+        self.min_requests = max(1, min_requests)
+        self.max_configs = max(1, max_configs)
+        self._runner = runner or _run_batch_inline
+        self._configs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._queued = set()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # Запрос
+    # ------------------------------------------------------------------
+
+    def pop(self, options):
+        """
+        Готовое событие в формате Collide_Simulation (seed = null,
+        source = "reservoir") или None
+
+        None - конфигурация не подходит или запас пуст (он будет пополнен,
+        а запрос надо посчитать обычным путём).
+        """
+        id_1, id_2, energy = options.get('id_1'), options.get('id_2'), options.get('Energy')
+        if not isinstance(id_1, int) or not isinstance(id_2, int) or not isinstance(energy, (int, float)):
+            return None
+        bucket = self._bucket(energy)
+        if bucket is None:
+            return None
+        bin_index, bucket_energy = bucket
+        key = (id_1, id_2, bin_index)
+
+        with self._lock:
+            stock = self._configs.get(key)
+            if stock is None:
+                stock = self._configs[key] = _Stock(bucket_energy)
+                self._forget(keep=key)
+            self._configs.move_to_end(key)
+            stock.requests += 1
+            event = stock.pop()
+            if stock.requests >= self.min_requests and len(stock) < self.events_per_config // 2:
+                self._schedule(key)
+            if event is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        from .LHC_Simulator import ANIMATION_TYPES, collision_at, event_result
+
+        batch, i = event
+        first, second = batch.first[i].tolist()
+        result = event_result(
+            collision_at(batch.collision, float(energy)), batch.products_of(i).tolist(),
+            first, second, ANIMATION_TYPES[batch.anim[i]],
+        )
+        # Событие из пакета не воспроизводится отдельным зерном (события блока
+        # делят поток кандидатов, а разыграны при нижней границе интервала
+        # энергии): seed = null, source - откуда событие. Воспроизводимое
+        # событие клиент получает, передав seed - такие запросы идут мимо запаса
+        result[2][0]['seed'] = None
+        result[2][0]['source'] = "reservoir"
+        return result
+
+    @staticmethod
+    def _bucket(beam_energy):
+        """Номер интервала энергии пучка и его нижняя граница (None - энергия вне сетки)"""
+        if not beam_energy > 0:
+            return None
+        bin_index = int(floor(log10(beam_energy) * ENERGY_BINS_PER_DECADE))
+        # Округление не должно поднять границу выше энергии запроса
+        return bin_index, min(10 ** (bin_index / ENERGY_BINS_PER_DECADE), beam_energy)
+
+    # ------------------------------------------------------------------
+    # Пополнение
+    # ------------------------------------------------------------------
+
+    def _schedule(self, key):
+        """Поставить конфигурацию в очередь пополнения (под self._lock)"""
+        if key in self._queued:
+            return
+        self._queued.add(key)
+        self._pending.append(key)
+        self._wakeup.set()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refill_loop, name="event-reservoir", daemon=True)
+            self._thread.start()
+
+    def _refill_loop(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                if not self._pending:
+                    self._wakeup.clear()
+                    continue
+                key = self._pending.popleft()
+                stock = self._configs.get(key)
+                need = self.events_per_config - len(stock) if stock is not None else 0
+                beam_energy = stock.beam_energy if stock is not None else None
+
+            batch = None
+            if need > 0:
+                try:
+                    with metrics.timer("reservoir_refill"):
+                        batch = self._runner(key[0], key[1], beam_energy, need)
+                except Exception as e:
+                    metrics.swallowed("reservoir_refill", e)
+                    batch = None  # следующий запрос поставит конфигурацию в очередь снова
+
+            with self._lock:
+                self._queued.discard(key)
+                stock = self._configs.get(key)
+                if batch is not None and stock is not None:
+                    stock.add(batch)
+                    self._evict(keep=key)
+
+    def _forget(self, keep):
+        """Забыть самые давние конфигурации сверх max_configs (под self._lock)"""
+        while len(self._configs) > self.max_configs:
+            key = next(iter(self._configs))
+            if key == keep:
+                self._configs.move_to_end(key)
+                continue
+            del self._configs[key]
+
+    def _evict(self, keep):
+        """Вытеснить самые давние конфигурации сверх бюджета памяти (под self._lock)"""
+        total = sum(stock.nbytes for stock in self._configs.values())
+        for key in list(self._configs):
+            if total <= self.memory_budget:
+                break
+            if key == keep:
+                continue
+            total -= self._configs.pop(key).nbytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                "configs": len(self._configs),
+                "events": sum(len(stock) for stock in self._configs.values()),
+                "bytes": sum(stock.nbytes for stock in self._configs.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# ============================================================================
+# ЭКЗЕМПЛЯР ДЛЯ ВЕБ-ПРОЦЕССА
+# ============================================================================
+
+_reservoir = None
+_reservoir_lock = threading.Lock()
+
+
+def get_reservoir():
+    """
+    Запас из настроек SIMULATION_RESERVOIR_* (создаётся при первом вызове)
+
+    Запас пополняется только в пуле процессов: без пула пакеты считались бы
+    в веб-процессе и отнимали GIL у запросов.
+
+    Returns:
+        EventReservoir или None, если запас выключен или пула нет
+    """
+    global _reservoir
+
+    if _reservoir is not None:
+        return _reservoir
+
+    from django.conf import settings
+
+    events = getattr(settings, "SIMULATION_RESERVOIR_EVENTS", 0)
+    if not events or not getattr(settings, "SIMULATION_WORKERS", 0):
+        return None
+
+    from .pool import get_pool
+
+    with _reservoir_lock:
+        if _reservoir is None:
+            pool = get_pool()
+            _reservoir = EventReservoir(
+                events_per_config=events,
+                memory_budget=getattr(settings, "SIMULATION_RESERVOIR_MEMORY", 16 * 2**20),
+                runner=pool.run_batch,
+                min_requests=getattr(settings, "SIMULATION_RESERVOIR_MIN_REQUESTS", 8),
+                max_configs=getattr(settings, "SIMULATION_RESERVOIR_MAX_CONFIGS", 256),
+            )
+    return _reservoir
@@ -0,0 +1,52 @@
+import numpy as np
+
+# ============================================================================
+# ВЫБОРКИ С ВЕСАМИ
+# ============================================================================
+#
+# Таблицы строятся один раз (и кэшируются вызывающим кодом), после чего
+# каждая выборка стоит O(1) независимо от числа вариантов.
+
+
+class AliasTable:
+    """
+    Таблица псевдонимов Уолкера (алгоритм Воуза)
+
+    Выбор строки rows[i] с вероятностью weights[i] / sum(weights): одно
+    случайное целое и одно случайное число на выборку. Варианты с нулевым
+    весом в таблицу не попадают.
+    """
+
+    def __init__(self, rows, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        keep = weights > 0
+        self.rows = np.asarray(rows, dtype=np.int64)[keep]
+        self.weights = weights[keep]
+
+        n = len(self.rows)
+        self.prob = np.ones(n, dtype=np.float64)
+        self.alias = np.arange(n, dtype=np.int64)
+        if not n:
+            return
+
+        scaled = self.weights * (n / self.weights.sum())
+        small = np.flatnonzero(scaled < 1.0).tolist()
+        large = np.flatnonzero(scaled >= 1.0).tolist()
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Оставшиеся (из-за округления) выбираются всегда сами
+        self.prob[small + large] = 1.0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def draw(self, rng, size=None):
+        """Строки, выбранные с весами (size - форма результата, как у numpy)"""
+        i = rng.integers(0, len(self.rows), size=size)
+        own = rng.random(size=size) < self.prob[i]
+        return self.rows[np.where(own, i, self.alias[i])]
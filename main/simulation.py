@@ -0,0 +1,96 @@
+import threading
+
+from . import metrics
+from .LHC_Simulator import SimulationEvent, load_particles, make_rng, normalize_seed
+
+# ============================================================================
+# СИМУЛЯЦИЯ ДЛЯ API (без зависимостей от Django)
+# ============================================================================
+#
+# Модуль импортируется и веб-процессом, и воркерами пула симуляций
+# (main/pool.py), поэтому здесь не должно быть ничего из Django.
+
+# Глобальные переменные
+Load_particle = False
+particle_list = []
+resonances = []
+
+# Однократная загрузка: параллельные первые запросы ждут одну загрузку,
+# а не запускают каждый свою
+_load_lock = threading.Lock()
+_load_state = "cold"        # cold | loading | ready | failed
+_load_error = None
+
+
+def LoadAll():
+    """Загрузка частиц (один раз, потокобезопасно)"""
+    
+    global Load_particle, particle_list, resonances, _load_state, _load_error
+    
+    # Быстрый путь без блокировки: каталог уже загружен
+    if Load_particle:
+        return particle_list, resonances
+    
+    with _load_lock:
+        if not Load_particle:
+            _load_state = "loading"
+            try:
+                with metrics.timer("load"):
+                    loaded = load_particles()
+            except Exception as e:
+                _load_state = "failed"
+                _load_error = repr(e)
+                raise
+            particle_list, resonances = loaded
+            _load_error = None
+            _load_state = "ready"
+            Load_particle = True
+    
+    return particle_list, resonances
+
+
+def catalog_status():
+    """Состояние каталога в этом процессе (для /api/ready)"""
+    return {
+        "state": _load_state,
+        "particles": len(particle_list),
+        "resonances": len(resonances),
+        "error": _load_error,
+    }
+
+
+def Collide_Simulation(options):
+    """Симуляция столкновения"""
+    
+    # Загружаем частицы (если еще не загружены)
+    particle_list, resonances = LoadAll()
+    
+    # Получаем параметры
+    id_1 = options.get('id_1')
+    id_2 = options.get('id_2')
+    E = options.get('Energy')
+    
+    # Проверка входных данных
+    if id_1 is None or id_2 is None or E is None:
+        raise ValueError("Missing required parameters: id_1, id_2, Energy")
+    
+    # Зерно из запроса (или новое): по нему событие воспроизводится
+    seeded = options.get('seed') is not None
+    seed = normalize_seed(options.get('seed'))
+    
+    # Симуляция
+    with metrics.timer("event"):
+        finals, first_finals, values, init = SimulationEvent(
+            id_1, id_2, E, particle_list, resonances, rng=make_rng(seed), seeded=seeded
+        )
+    values[0]['seed'] = seed
+    
+    # Формируем результат
+    result = [
+        finals,
+        first_finals,
+        values,
+        init
+    ]
+    
+    return result
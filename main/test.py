@@ -1,6 +1,6 @@
 
 import json
-from LHC_Simulator import SimulationEvent, load_particles
+from main.LHC_Simulator import SimulationEvent, load_particles
 
 
 Load_particle = False
@@ -0,0 +1,272 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from . import catalog
+
+
+# Небольшой каталог без PDG-базы:
+# mcid, масса, 3Q, L_e, флаги, резонанс, имя, тип, спин
+PARTICLES = (
+    (2212, 0.938272, 3, 0, catalog.FLAG_BARYON, False, "p", "baryon", "1/2"),
+    (-2212, 0.938272, -3, 0, catalog.FLAG_BARYON, False, "pbar", "baryon", "1/2"),
+    (211, 0.139570, 3, 0, catalog.FLAG_MESON, False, "pi+", "meson", "0"),
+    (-211, 0.139570, -3, 0, catalog.FLAG_MESON, False, "pi-", "meson", "0"),
+    (111, 0.134977, 0, 0, catalog.FLAG_MESON, False, "pi0", "meson", "0"),
+    (22, 0.0, 0, 0, catalog.FLAG_BOSON, False, "gamma", "gauge_boson", "1"),
+    (11, 0.000511, -3, 1, catalog.FLAG_LEPTON, False, "e-", "lepton", "1/2"),
+    (-11, 0.000511, 3, -1, catalog.FLAG_LEPTON, False, "e+", "lepton", "1/2"),
+    (113, 0.775260, 0, 0, catalog.FLAG_MESON, True, "rho(770)0", "meson", "1"),
+    (2224, 1.232000, 6, 0, catalog.FLAG_BARYON, True, "Delta(1232)++", "baryon", "3/2"),
+)
+
+# Каналы: (продукты, доля); 999 нет в каталоге - канал отбрасывается
+DECAYS = {
+    113: [((211, -211), 0.99), ((111, 22), None), ((999, 22), 0.01)],
+    2224: [((2212, 211), 0.994), ((2212, 211, 111), None)],
+}
+
+
+def small_catalog():
+    """(ParticleTable, DecayTable, QuantumIndex по нерезонансам)"""
+    mcid, mass, charge3, l_e, flags, resonance, names, types, spins = zip(*PARTICLES)
+    n = len(mcid)
+    table = catalog.ParticleTable().load({
+        "mcid": np.array(mcid),
+        "mass": np.array(mass),
+        "width": np.zeros(n),
+        "charge3": np.array(charge3),
+        "L_e": np.array(l_e),
+        "L_mu": np.zeros(n),
+        "L_tau": np.zeros(n),
+        "flags": np.array(flags),
+        "resonance": np.array(resonance),
+    }, names, types, spins)
+    decays = catalog.DecayTable().load(catalog.DecayTable.columns_from_channels(DECAYS), table)
+    partners = catalog.QuantumIndex().load(table, np.flatnonzero(~table.resonance))
+    return table, decays, partners
+
+
+class SnapshotTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.table, self.decays, self.partners = small_catalog()
+
+    def write(self):
+        return catalog.write_snapshot(self.table, self.decays, self.partners, source={"test": 1}, root=self.root)
+
+
+class SnapshotRoundTripTest(SnapshotTestCase):
+    """Снимок читается теми же таблицами, массивы - через mmap"""
+
+    def test_round_trip(self):
+        path = self.write()
+        snapshot = catalog.open_snapshot(self.root)
+        self.assertIsNotNone(snapshot)
+        self.assertEqual(snapshot.path, path)
+        self.assertEqual(snapshot.index["source"], {"test": 1})
+        self.assertEqual(len(snapshot), len(self.table))
+
+        table = catalog.ParticleTable().load(snapshot.arrays, snapshot.names, snapshot.types, snapshot.spins)
+        for name, array in self.table.columns().items():
+            np.testing.assert_array_equal(getattr(table, name), array, err_msg=name)
+        self.assertEqual(table.names, self.table.names)
+        self.assertIsInstance(snapshot["mass"], np.memmap)
+        self.assertFalse(snapshot["mass"].flags.writeable)
+
+        decays = catalog.DecayTable().load(snapshot.arrays, table)
+        self.assertEqual(decays.ranges, self.decays.ranges)
+        np.testing.assert_array_equal(decays.keys, self.decays.keys)
+
+        partners = catalog.QuantumIndex().load_columns(snapshot.arrays)
+        self.assertEqual(partners.groups.keys(), self.partners.groups.keys())
+
+    def test_missing_or_outdated(self):
+        self.assertIsNone(catalog.open_snapshot(self.root))
+
+        path = self.write()
+        index_file = os.path.join(path, catalog.INDEX_FILE)
+        with open(index_file, encoding="utf-8") as f:
+            index = json.load(f)
+        index["version"] = catalog.SNAPSHOT_VERSION - 1
+        with open(index_file, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        self.assertIsNone(catalog.open_snapshot(self.root))
+
+
+class SnapshotGenerationTest(SnapshotTestCase):
+    """Поколения снимка и атомарное переключение указателя CURRENT"""
+
+    def generations(self):
+        base = catalog.snapshot_path(self.root)
+        return sorted(name for name in os.listdir(base) if name.startswith("g"))
+
+    def test_swap_keeps_open_snapshot_readable(self):
+        self.write()
+        held = catalog.open_snapshot(self.root)
+        mass = np.array(held["mass"])
+
+        second = self.write()
+        self.assertEqual(catalog.current_snapshot(self.root), second)
+        self.assertEqual(catalog.open_snapshot(self.root).path, second)
+        self.assertTrue(os.path.isdir(held.path))
+
+        # Третье поколение вытесняет первое, но отображённые массивы остаются
+        third = self.write()
+        self.assertFalse(os.path.exists(held.path))
+        np.testing.assert_array_equal(held["mass"], mass)
+        self.assertEqual(self.generations(), sorted(os.path.basename(p) for p in (second, third)))
+
+    def test_prune_keeps_current(self):
+        paths = [self.write() for _ in range(4)]
+        self.assertEqual(len(self.generations()), catalog.SNAPSHOT_KEEP)
+        self.assertIn(os.path.basename(paths[-1]), self.generations())
+
+    def test_crashed_writer_is_ignored(self):
+        path = self.write()
+        base = catalog.snapshot_path(self.root)
+        # Остатки записи, прерванной до переключения указателя
+        os.makedirs(os.path.join(base, ".g1-1.tmp"))
+        with open(os.path.join(base, ".g1-1.tmp", catalog.INDEX_FILE), "w") as f:
+            f.write("{")
+        with open(os.path.join(base, f".{catalog.CURRENT_FILE}.g1-1.tmp"), "w") as f:
+            f.write("g1-1")
+
+        self.assertEqual(catalog.open_snapshot(self.root).path, path)
+        self.write()
+        self.assertTrue(os.path.isdir(os.path.join(base, ".g1-1.tmp")))
+
+    def test_missing_generation(self):
+        path = self.write()
+        shutil.rmtree(path)
+        self.assertIsNone(catalog.open_snapshot(self.root))
+
+    def test_legacy_layout(self):
+        # Снимок старого вида: файлы прямо в vN, без CURRENT
+        path = self.write()
+        base = catalog.snapshot_path(self.root)
+        for name in os.listdir(path):
+            shutil.move(os.path.join(path, name), base)
+        os.remove(os.path.join(base, catalog.CURRENT_FILE))
+
+        snapshot = catalog.open_snapshot(self.root)
+        self.assertEqual(snapshot.path, base)
+        self.assertEqual(len(snapshot), len(self.table))
+
+
+class DecayTableTest(SimpleTestCase):
+
+    def setUp(self):
+        self.table, self.decays, _ = small_catalog()
+
+    def test_channels_resolved_at_load(self):
+        # Канал с 999 (нет в каталоге) отброшен, каналы резонанса подряд
+        self.assertEqual(len(self.decays), 4)
+        self.assertEqual(set(self.decays.ranges), {113, 2224})
+        rho = self.decays.channels_of(113)
+        self.assertEqual([self.decays.products_of(i).tolist() for i in rho], [[211, -211], [111, 22]])
+        self.assertEqual(list(self.decays.channels_of(12345)), [])
+
+        # Неизвестная доля - NaN, известные - как есть
+        self.assertEqual(self.decays.fraction[rho.start], 0.99)
+        self.assertTrue(np.isnan(self.decays.fraction[rho.start + 1]))
+
+    def test_mass_and_key_of_channel(self):
+        table = self.table
+        for channel in range(len(self.decays)):
+            products = self.decays.products_of(channel).tolist()
+            np.testing.assert_array_equal(self.decays.product_rows[
+                self.decays.offsets[channel]:self.decays.offsets[channel + 1]
+            ], table.rows(products))
+            self.assertAlmostEqual(self.decays.mass[channel], sum(table.mass_of(m) for m in products))
+            self.assertEqual(int(self.decays.keys[channel]), sum(table.key_of(m) for m in products))
+
+        # Каналы сохраняют квантовые числа резонанса
+        for mcid in self.decays.ranges:
+            for channel in self.decays.channels_of(mcid):
+                self.assertEqual(int(self.decays.keys[channel]), self.table.key_of(mcid))
+
+
+class QuantumIndexTest(SimpleTestCase):
+
+    def setUp(self):
+        self.table, _, self.partners = small_catalog()
+
+    def names(self, rows):
+        return [self.table.names[row] for row in rows]
+
+    def test_lookup_by_key_and_mass(self):
+        table = self.table
+        # Нейтральные без лептонного числа: γ, π0 (по массе)
+        self.assertEqual(self.names(self.partners.lookup(table.key_of(22))), ["gamma", "pi0"])
+        self.assertEqual(self.names(self.partners.lookup(table.key_of(22), 0.1)), ["gamma"])
+        self.assertEqual(self.names(self.partners.lookup(table.key_of(2212))), ["p"])
+        self.assertEqual(self.names(self.partners.lookup(table.key_of(2212), 0.5)), [])
+        # Ключа нет - пусто; резонансы в индекс не входят
+        self.assertEqual(len(self.partners.lookup(table.key_of(2224))), 0)
+        self.assertEqual(len(self.partners), int((~table.resonance).sum()))
+
+    def test_residual_lookup(self):
+        # Δ++ + партнёр = p + π+ + π+ + X: партнёр дополняет ключ до начального
+        table = self.table
+        initial = table.key_of(2212) + 2 * table.key_of(211)
+        residual = initial - table.key_of(2224)
+        self.assertEqual(self.names(self.partners.lookup(residual)), ["pi+"])
+
+
+class QuantumPackingTest(SimpleTestCase):
+    """Упаковка квантовых чисел в int64"""
+
+    def test_pack_is_linear(self):
+        rng = np.random.default_rng(0)
+        a = rng.integers(-40, 40, size=(100, len(catalog.QUANTUM_COLUMNS)))
+        b = rng.integers(-40, 40, size=(100, len(catalog.QUANTUM_COLUMNS)))
+        np.testing.assert_array_equal(
+            catalog.pack_quantum(a + b), catalog.pack_quantum(a) + catalog.pack_quantum(b)
+        )
+
+    def test_pack_distinguishes_components(self):
+        keys = catalog.pack_quantum(np.eye(len(catalog.QUANTUM_COLUMNS), dtype=np.int64))
+        self.assertEqual(len(set(keys.tolist())), len(catalog.QUANTUM_COLUMNS))
+        self.assertNotEqual(catalog.pack_quantum([1, 0, 0, 0, 0, 0, 0, 0]),
+                            catalog.pack_quantum([-1, 0, 0, 0, 0, 0, 0, 0]))
+
+    def test_state_key_round_trip(self):
+        quantum = [3, 3, -1, 1, 0, 0, -1, 0]   # заряд +1, барион 1, s=-1, c=1, L_mu=-1
+        state = catalog.quantum_state(quantum)
+        self.assertEqual(state["charge"], 1.0)
+        self.assertEqual(state["baryon"], 1.0)
+        self.assertEqual(state["strangeness"], -1)
+        self.assertEqual(catalog.state_key(state), int(catalog.pack_quantum(quantum)))
+
+
+class QuarkContentTest(SimpleTestCase):
+    """Кварковый состав и ароматовые числа по mcid"""
+
+    def test_quark_content(self):
+        d, u, s = (catalog.QUARK_FLAVOURS.index(q) for q in "dus")
+        net, valence = catalog.quark_content([2212, -2212, 321, 130, 111, 3122, 11])
+
+        # p = uud, p~ = u~u~d~
+        self.assertEqual((net[0, u], net[0, d]), (2, 1))
+        np.testing.assert_array_equal(net[1], -net[0])
+        self.assertEqual(valence[1].sum(), 3)
+        # K+ = u s~
+        self.assertEqual((net[2, u], net[2, s]), (1, -1))
+        # K0_L - смесь d s~ и s d~: аромат нулевой, валентных кварка два
+        self.assertFalse(net[3].any())
+        self.assertEqual(valence[3].sum(), 2)
+        # π0: суммарно ноль, Λ = uds, электрон без кварков
+        self.assertFalse(net[4].any())
+        self.assertEqual((net[5, u], net[5, d], net[5, s]), (1, 1, 1))
+        self.assertFalse(valence[6].any())
+
+        numbers = catalog.flavour_numbers(net)
+        self.assertEqual(numbers["baryon3"].tolist(), [3, -3, 0, 0, 0, 3, 0])
+        self.assertEqual(numbers["s"].tolist(), [0, 0, 1, 0, 0, -1, 0])
@@ -0,0 +1,73 @@
+import struct
+
+from django.test import SimpleTestCase
+
+from . import formats
+
+
+class NegotiateTest(SimpleTestCase):
+
+    def test_query_format(self):
+        self.assertEqual(formats.negotiate("binary", "application/json"), "binary")
+        self.assertEqual(formats.negotiate("columnar"), "columnar")
+        # Явно запрошенный неизвестный формат - ошибка (406)
+        self.assertIsNone(formats.negotiate("xml"))
+
+    def test_accept(self):
+        self.assertEqual(formats.negotiate(None, None), "json")
+        self.assertEqual(formats.negotiate(None, "application/vnd.lhc.event"), "binary")
+        self.assertEqual(formats.negotiate(None, "application/octet-stream"), "binary")
+        self.assertEqual(
+            formats.negotiate(None, "application/json;q=0.5, application/vnd.lhc.columnar+json"), "columnar"
+        )
+        self.assertEqual(formats.negotiate(None, "application/vnd.lhc.event;q=0, */*;q=0.1"), "json")
+
+    def test_unsupported_accept_falls_back_to_json(self):
+        browser = "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp"
+        for accept in (browser, "text/*", "application/xml", "application/vnd.lhc.event;q=0"):
+            self.assertEqual(formats.negotiate(None, accept), "json", accept)
+
+
+class BinaryFormatTest(SimpleTestCase):
+    """Раскладка application/vnd.lhc.event"""
+
+    RESULT = [
+        [{"id_1": 22, "id_2": 13, "id_3": -13}],
+        [{"id_1": 11, "id_2": -11}],
+        [{
+            "Mass": 100.0, "BaryonNum": 0.0, "S,B,C": [0, 0, 0], "Charge": 0.0,
+            "track_count": 1, "momentum": 0.25, "type": "Muon Event", "seed": 42,
+        }],
+        [{"init_id1": 11, "init_id2:": -11}],
+    ]
+
+    def test_layout(self):
+        body, content_type = formats.encode(self.RESULT, "binary")
+        self.assertEqual(content_type, "application/vnd.lhc.event")
+
+        magic, version, _, n_events, n_products = formats.HEADER.unpack_from(body, 0)
+        self.assertEqual((magic, version, n_events, n_products), (formats.MAGIC, formats.VERSION, 1, 3))
+
+        offset = formats.HEADER.size
+        record = formats.RECORD.unpack_from(body, offset)
+        self.assertEqual(record, (100.0, 0.0, 0.0, 0.25, 0, 0, 0, 1, 11, -11, 42))
+        offset += formats.RECORD.size
+
+        def take(fmt, count):
+            nonlocal offset
+            values = struct.unpack_from(f"<{count}{fmt}", body, offset)
+            offset += struct.calcsize(f"<{count}{fmt}")
+            return list(values)
+
+        self.assertEqual(take("i", n_events + 1), [0, 3])
+        self.assertEqual(take("i", 2 * n_events), [11, -11])
+        self.assertEqual(take("b", n_events), [formats.ANIMATION_TYPES.index("Muon Event")])
+        self.assertEqual(take("i", n_products), [22, 13, -13])
+        self.assertEqual(offset, len(body))
+
+    def test_missing_seed(self):
+        result = [list(part) for part in self.RESULT]
+        result[2] = [dict(self.RESULT[2][0], seed=None)]
+        body = formats.encode_binary(formats.columns(result))
+        record = formats.RECORD.unpack_from(body, formats.HEADER.size)
+        self.assertEqual(record[-1], -1)
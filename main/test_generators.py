@@ -0,0 +1,296 @@
+from types import SimpleNamespace
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from . import catalog
+
+
+# Конфигурации для воспроизведения: e+e- и π+p (события находятся быстро)
+REPLAY_CONFIGS = ((11, -11, 50.0), (211, 2212, 5.0))
+REPLAY_SEEDS = range(1, 9)
+
+
+class EngineTestCase(SimpleTestCase):
+    """Тесты генератора на каталоге из снимка"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from .simulation import LoadAll
+        LoadAll()
+
+
+class ConservationBatchTest(EngineTestCase):
+    """check_conservation_batch против поштучной проверки по столбцам каталога"""
+
+    def reference(self, rows, initial_quantum, sqrt_s):
+        from .LHC_Simulator import PARTICLES
+
+        rows = [row for row in rows if row >= 0]
+        mass = sum(float(PARTICLES.mass[row]) for row in rows)
+        quantum = sum((PARTICLES.quantum[row] for row in rows), np.zeros(len(catalog.QUANTUM_COLUMNS), dtype=np.int64))
+        return mass <= sqrt_s * 1.1 and (quantum == initial_quantum).all()
+
+    def test_matches_scalar_check(self):
+        from .LHC_Simulator import PARTICLES, check_conservation_batch
+
+        rng = np.random.default_rng(3)
+        n = len(PARTICLES)
+        for sqrt_s in (1.0, 10.0, 200.0):
+            # Начальное состояние - сумма случайного набора, чтобы часть кандидатов проходила
+            source = rng.integers(0, n, size=2)
+            initial_quantum = PARTICLES.quantum[source].sum(axis=0)
+            initial_state = catalog.quantum_state(initial_quantum)
+
+            candidates = rng.integers(0, n, size=(400, 4))
+            # Короткие кандидаты дополнены -1
+            lengths = rng.integers(1, 5, size=len(candidates))
+            candidates[np.arange(4) >= lengths[:, np.newaxis]] = -1
+            candidates[:50, :2] = source
+            candidates[:50, 2:] = -1
+
+            accepted = check_conservation_batch(candidates, initial_state, sqrt_s)
+            expected = [self.reference(row, initial_quantum, sqrt_s) for row in candidates]
+            self.assertEqual(accepted.tolist(), expected)
+            self.assertTrue(accepted.any() or sqrt_s < PARTICLES.mass[source].sum() / 1.1)
+
+    def test_scalar_wrapper(self):
+        from .LHC_Simulator import PARTICLES, check_conservation
+
+        def particles(*mcids):
+            return [SimpleNamespace(mcid=mcid) for mcid in mcids]
+
+        initial_state = catalog.quantum_state(PARTICLES.quantum_of(2212) + PARTICLES.quantum_of(-211))
+        self.assertTrue(check_conservation(particles(2112, 111), initial_state, 10.0))
+        self.assertFalse(check_conservation(particles(2212, 111), initial_state, 10.0))
+        self.assertFalse(check_conservation(particles(2112, 111), initial_state, 0.5))
+
+
+class BatchTest(EngineTestCase):
+    """Пакет делится по блокам STREAM_BLOCK, события блока - из общего потока кандидатов"""
+
+    def tearDown(self):
+        from .LHC_Simulator import reset_acceptance_stats
+        reset_acceptance_stats()
+
+    def test_batch_split_by_blocks(self):
+        from .LHC_Simulator import STREAM_BLOCK, simulate_batch
+
+        for id_1, id_2, energy in REPLAY_CONFIGS:
+            whole = simulate_batch(id_1, id_2, energy, 2 * STREAM_BLOCK + 3, seed=5)
+            head = simulate_batch(id_1, id_2, energy, STREAM_BLOCK, seed=5)
+            tail = simulate_batch(id_1, id_2, energy, STREAM_BLOCK + 3, seed=5, first_block=1)
+            self.assertEqual(
+                [whole.event(i) for i in range(len(whole))],
+                [head.event(i) for i in range(len(head))] + [tail.event(i) for i in range(len(tail))],
+            )
+
+    def test_stream_events_conserve(self):
+        from .LHC_Simulator import PARTICLES, STREAM_BLOCK, simulate_batch
+
+        for id_1, id_2, energy in ((11, -11, 50.0), (13, 13, 50.0)):
+            batch = simulate_batch(id_1, id_2, energy, STREAM_BLOCK, seed=9)
+            self.assertTrue(batch.found.all())
+            for i in range(len(batch)):
+                products = batch.products_of(i).tolist()
+                self.assertEqual(sum(PARTICLES.key_of(m) for m in products), batch.collision.initial_key)
+                self.assertLessEqual(sum(PARTICLES.mass_of(m) for m in products), batch.collision.sqrt_s * 1.1)
+            # События блока различны: каждое берёт своего кандидата из потока
+            self.assertGreater(len({tuple(batch.products_of(i).tolist()) for i in range(len(batch))}), 1)
+
+    def test_stream_charges_each_budget(self):
+        from .LHC_Simulator import (
+            AttemptBudget, CANDIDATE_STREAMS, make_rng, prepare_collision, setup_lepton_lepton, stream_events,
+        )
+
+        setup = setup_lepton_lepton(prepare_collision(11, -11, 50.0), None, None)
+        budgets = [AttemptBudget(3) for _ in range(200)]
+        results = list(stream_events(setup, make_rng(1, 0), budgets, *CANDIDATE_STREAMS['lepton-lepton']))
+        self.assertEqual(len(results), len(budgets))
+        for (result, used), budget in zip(results, budgets):
+            self.assertEqual(used, budget.used)
+            self.assertLessEqual(used, 3)
+            if result is None:
+                self.assertEqual(used, 3)
+
+
+class SeedReplayTest(EngineTestCase):
+    """Одно зерно - одно событие: в запросе и в пуле, при любой статистике приёма"""
+
+    def tearDown(self):
+        from .LHC_Simulator import reset_acceptance_stats
+        reset_acceptance_stats()
+
+    def simulate(self, id_1, id_2, energy, seed):
+        from .simulation import Collide_Simulation
+        return Collide_Simulation({"id_1": id_1, "id_2": id_2, "Energy": energy, "seed": seed})
+
+    def test_same_seed_same_event(self):
+        for config in REPLAY_CONFIGS:
+            for seed in REPLAY_SEEDS:
+                self.assertEqual(self.simulate(*config, seed), self.simulate(*config, seed))
+
+    def test_inline_and_pool(self):
+        from .pool import SimulationPool
+
+        pool = SimulationPool(1, timeout=120.0)
+        try:
+            for config in REPLAY_CONFIGS:
+                for seed in REPLAY_SEEDS:
+                    options = {"id_1": config[0], "id_2": config[1], "Energy": config[2], "seed": seed}
+                    self.assertEqual(pool.run(options), self.simulate(*config, seed))
+        finally:
+            pool.shutdown()
+
+    def test_cold_and_warm_acceptance_stats(self):
+        from .LHC_Simulator import (
+            DEFAULT_ATTEMPTS, HOPELESS_BUDGETS, MIN_OBSERVATIONS,
+            acceptance_key, prepare_collision, record_acceptance, reset_acceptance_stats,
+        )
+
+        for config in REPLAY_CONFIGS:
+            reset_acceptance_stats()
+            cold = [self.simulate(*config, seed) for seed in REPLAY_SEEDS]
+
+            # Тёплая статистика: много удач (короткий адаптивный бюджет) ...
+            key = acceptance_key(prepare_collision(*config))
+            record_acceptance(key, MIN_OBSERVATIONS, MIN_OBSERVATIONS, 0.001, requests=MIN_OBSERVATIONS)
+            self.assertEqual([self.simulate(*config, seed) for seed in REPLAY_SEEDS], cold)
+
+            # ... и «безнадёжная» конфигурация: без зерна было бы рассеяние
+            reset_acceptance_stats()
+            default = DEFAULT_ATTEMPTS[key[0]]
+            record_acceptance(key, HOPELESS_BUDGETS * default * 2, 0, 1.0, requests=MIN_OBSERVATIONS)
+            self.assertEqual([self.simulate(*config, seed) for seed in REPLAY_SEEDS], cold)
+
+
+class FeasibilityTest(EngineTestCase):
+    """Оракул достижимости: «недостижимо» - генератор действительно ничего не находит"""
+
+    def collision(self, id_1, id_2, sqrt_s):
+        """Столкновение с заданной √s (энергия пучка подбирается)"""
+        from .LHC_Simulator import PARTICLES, prepare_collision
+
+        m1, m2 = PARTICLES.mass_of(id_1), PARTICLES.mass_of(id_2)
+        energy = (sqrt_s ** 2 - m1 ** 2 - m2 ** 2) / (2 * m2)
+        collision = prepare_collision(id_1, id_2, energy)
+        self.assertAlmostEqual(collision.sqrt_s, sqrt_s, places=6)
+        return collision
+
+    def generate(self, collision, limit=20000):
+        """Генератор без оракула, с большим постоянным бюджетом"""
+        from .LHC_Simulator import GENERATORS, AttemptBudget, make_rng
+
+        setup_generator, generate = GENERATORS[collision.interaction_type]
+        setup = setup_generator(collision, None, None)
+        if setup is None:
+            return None
+        return generate(setup, make_rng(0), AttemptBudget(limit))
+
+    def threshold(self, collision):
+        from .LHC_Simulator import threshold_sqrt_s
+        beams = () if collision.interaction_type == 'hadron-hadron' else (collision.id1, collision.id2)
+        return threshold_sqrt_s(collision.interaction_type, collision.initial_key, *beams)
+
+    def test_lepton_scattering_threshold(self):
+        from .LHC_Simulator import PARTICLES, is_feasible, prepare_collision
+
+        # τ-τ- в покое: √s = √2 m_τ, а пара τ-τ- не укладывается в 1.1 √s
+        collision = prepare_collision(15, 15, 0.0)
+        self.assertFalse(is_feasible(collision))
+        self.assertIsNone(self.generate(collision))
+
+        threshold = self.threshold(collision)
+        self.assertAlmostEqual(threshold, 2 * PARTICLES.mass_of(15) / 1.1)
+        self.assertIsNone(self.generate(self.collision(15, 15, threshold * 0.999)))
+        above = self.collision(15, 15, threshold * 1.001)
+        self.assertTrue(is_feasible(above))
+        self.assertEqual(sorted(self.generate(above)[0][:2]), [15, 15])
+
+    def test_annihilation(self):
+        from .LHC_Simulator import is_feasible, prepare_collision
+
+        # e+e- → γγ возможно при любой энергии
+        for id_1, id_2 in ((11, -11), (15, -15)):
+            collision = prepare_collision(id_1, id_2, 0.0)
+            self.assertEqual(self.threshold(collision), 0.0)
+            self.assertTrue(is_feasible(collision))
+            self.assertIsNotNone(self.generate(collision))
+
+    def test_annihilation_without_photon(self):
+        from .LHC_Simulator import PARTICLES, combination_threshold, hadron_combinations, threshold_sqrt_s
+
+        # Без γ в каталоге порог - самая лёгкая пара μ+μ- или адронная комбинация
+        expected = min(
+            2 * PARTICLES.mass_of(13) / 1.1,
+            combination_threshold(hadron_combinations(), 0),
+        )
+        key = PARTICLES.key_of(11) + PARTICLES.key_of(-11)
+        threshold_sqrt_s.cache_clear()
+        self.addCleanup(threshold_sqrt_s.cache_clear)
+        photon = PARTICLES.index.pop(22)
+        try:
+            self.assertAlmostEqual(threshold_sqrt_s('lepton-lepton', key, 11, -11), expected)
+        finally:
+            PARTICLES.index[22] = photon
+
+    def test_infeasible_is_sound(self):
+        from .LHC_Simulator import is_feasible
+
+        # Чуть ниже порога генератор не находит событий: p p (резонанс +
+        # партнёр) и τ-τ- (рассеяние)
+        for id_1, id_2 in ((2212, 2212), (15, 15)):
+            threshold = self.threshold(self.collision(id_1, id_2, 50.0))
+            below = self.collision(id_1, id_2, threshold * 0.999)
+            self.assertFalse(is_feasible(below))
+            self.assertIsNone(self.generate(below, limit=5000), (id_1, id_2))
+            self.assertTrue(is_feasible(self.collision(id_1, id_2, threshold * 1.001)))
+
+        # e- p: ни одна комбинация фрагментов не сохраняет квантовые числа
+        collision = self.collision(11, 2212, 50.0)
+        self.assertEqual(self.threshold(collision), float("inf"))
+        self.assertIsNone(self.generate(collision, limit=5000))
+
+
+class ChannelDrawTest(EngineTestCase):
+    """Канал распада резонанса - по долям ветвления среди возможных"""
+
+    DRAWS = 100_000
+
+    def frequencies(self, mcid, initial_key, mass_budget):
+        from .LHC_Simulator import DECAYS, draw_channel
+
+        rng = np.random.default_rng(11)
+        start, stop = DECAYS.ranges[mcid]
+        counts = np.zeros(stop - start)
+        for _ in range(self.DRAWS):
+            counts[draw_channel(mcid, initial_key, mass_budget, rng) - start] += 1
+        return counts / self.DRAWS
+
+    def test_fractions_with_open_channels(self):
+        from .LHC_Simulator import DECAYS, PARTICLES, channel_fractions
+
+        # Z0 + γ: партнёр любого канала - фотон, все каналы открыты
+        start, stop = DECAYS.ranges[23]
+        observed = self.frequencies(23, PARTICLES.key_of(23), 1000.0)
+        np.testing.assert_allclose(observed, channel_fractions()[start:stop], atol=0.005)
+
+    def test_closed_channels_renormalized(self):
+        from .LHC_Simulator import DECAYS, PARTICLES, channel_fractions
+
+        # Бюджет 1 ГэВ закрывает тяжёлые каналы, остальные делят их долю
+        start, stop = DECAYS.ranges[23]
+        open_ = DECAYS.mass[start:stop] <= 1.0
+        expected = np.where(open_, channel_fractions()[start:stop], 0.0)
+        observed = self.frequencies(23, PARTICLES.key_of(23), 1.0)
+        self.assertFalse(observed[~open_].any())
+        np.testing.assert_allclose(observed, expected / expected.sum(), atol=0.005)
+
+    def test_no_possible_channel(self):
+        from .LHC_Simulator import PARTICLES, draw_channel
+
+        rng = np.random.default_rng(0)
+        # Нет энергии ни на один канал; нет партнёра с барионным числом 2
+        self.assertIsNone(draw_channel(113, PARTICLES.key_of(113), 0.0, rng))
+        self.assertIsNone(draw_channel(113, 2 * PARTICLES.key_of(2212), 1000.0, rng))
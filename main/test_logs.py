@@ -0,0 +1,76 @@
+import io
+import sys
+import logging
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .logs import BackgroundHandler, SampledFilter, StructuredFormatter
+
+
+def record(name="main.LHC_Simulator", level=logging.DEBUG, msg="event", **extra):
+    return logging.makeLogRecord({"name": name, "levelno": level, "levelname": logging.getLevelName(level),
+                                  "msg": msg, **extra})
+
+
+class SampledFilterTest(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch("main.logs.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rate_and_skipped(self):
+        sampled = SampledFilter(rate=10, burst=2)
+        records = [record() for _ in range(5)]
+        self.assertEqual([sampled.filter(r) for r in records], [True, True, False, False, False])
+        self.assertEqual(records[0].skipped, 0)
+
+        # За 0.15 с набирается один токен; следующая запись несёт число отброшенных
+        self.now += 0.15
+        later = record()
+        self.assertTrue(sampled.filter(later))
+        self.assertEqual(later.skipped, 3)
+        self.assertFalse(sampled.filter(record()))
+
+    def test_warnings_and_loggers(self):
+        sampled = SampledFilter(rate=1, burst=1)
+        self.assertTrue(sampled.filter(record()))
+        self.assertFalse(sampled.filter(record()))
+        # WARNING и выше не ограничиваются, у другого логгера своё ведро
+        self.assertTrue(all(sampled.filter(record(level=logging.WARNING)) for _ in range(10)))
+        self.assertTrue(sampled.filter(record(name="main.pool")))
+
+    def test_unlimited(self):
+        sampled = SampledFilter(rate=0)
+        self.assertTrue(all(sampled.filter(record()) for _ in range(1000)))
+
+
+class BackgroundHandlerTest(SimpleTestCase):
+
+    def test_extras_snapshot_at_call(self):
+        stream = io.StringIO()
+        handler = BackgroundHandler(stream)
+        handler.setFormatter(StructuredFormatter("%(levelname)s %(message)s"))
+
+        products = [22, 22]
+        handler.handle(record(msg="found %s", args=("event",), products=products))
+        # Вызывающий код меняет поле сразу после записи в журнал
+        products.append(111)
+        try:
+            handler.handle(record(level=logging.ERROR, msg="failed", exc_info=self.exc_info()))
+        finally:
+            handler._stop()
+
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[0], "DEBUG found event products=[22, 22]")
+        self.assertEqual(lines[1], "ERROR failed")
+        self.assertIn("ZeroDivisionError", stream.getvalue())
+
+    @staticmethod
+    def exc_info():
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            return sys.exc_info()
@@ -0,0 +1,55 @@
+import os
+
+from django.test import SimpleTestCase, override_settings
+
+from . import pool
+
+
+class WarmUpTest(SimpleTestCase):
+    """Прогрев пула ограничен по времени"""
+
+    def setUp(self):
+        self.addCleanup(setattr, pool, "_pool", pool._pool)
+        self.addCleanup(setattr, pool, "_pool_state", pool._pool_state)
+        self.addCleanup(setattr, pool, "_pool_error", pool._pool_error)
+        pool._pool, pool._pool_state, pool._pool_error = None, "cold", None
+
+    def test_warm_up_deadline(self):
+        # spawn-воркер не успеет загрузить каталог за миллисекунду
+        simulation_pool = pool.SimulationPool(1, warm_up_timeout=0.001)
+        try:
+            with self.assertRaises(pool.SimulationTimeout):
+                simulation_pool.warm_up()
+        finally:
+            simulation_pool.shutdown(wait=False)
+
+    @override_settings(SIMULATION_WORKERS=1, SIMULATION_WARM_UP_TIMEOUT=0.001)
+    def test_expired_warm_up_fails_pool(self):
+        with self.assertRaises(pool.SimulationTimeout):
+            pool.get_pool()
+        ready, status = pool.readiness()
+        self.assertFalse(ready)
+        self.assertEqual(status["state"], "failed")
+        self.assertIn("SimulationTimeout", status["error"])
+        self.assertIsNone(pool._pool)
+
+
+class ForkServerTest(SimpleTestCase):
+    """fork: воркеры порождаются из forkserver с уже загруженным каталогом"""
+
+    def test_workers_share_preloaded_catalog(self):
+        simulation_pool = pool.SimulationPool(2, max_tasks_per_child=2, start_method="fork")
+        try:
+            pids = simulation_pool.warm_up()
+            self.assertNotIn(os.getpid(), pids)
+            for stats in simulation_pool.stats():
+                self.assertEqual(stats["start_method"], "fork")
+                # LoadAll в воркере ничего не грузит: каталог пришёл из forkserver
+                self.assertLess(stats["load_seconds"], 0.05)
+
+            # Воркеры, выработавшие max_tasks_per_child, заменяются новыми из forkserver
+            options = {"id_1": 11, "id_2": -11, "Energy": 50.0, "seed": 1}
+            results = [simulation_pool.run(options) for _ in range(6)]
+            self.assertEqual(results, [results[0]] * 6)
+        finally:
+            simulation_pool.shutdown()
@@ -0,0 +1,110 @@
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from . import reservoir
+
+
+def wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Запас не пополнился вовремя")
+        time.sleep(0.01)
+
+
+class EventReservoirTest(SimpleTestCase):
+    """Запас событий: выдача, пополнение в фоне, вытеснение"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from .simulation import LoadAll
+        LoadAll()
+
+    def setUp(self):
+        self.runs = []
+
+    def runner(self, id_1, id_2, beam_energy, n_events):
+        from .LHC_Simulator import simulate_batch
+        self.runs.append((id_1, id_2, beam_energy, n_events))
+        return simulate_batch(id_1, id_2, beam_energy, n_events, seed=len(self.runs))
+
+    def options(self, energy=50.0, id_1=11, id_2=-11):
+        return {"id_1": id_1, "id_2": id_2, "Energy": energy}
+
+    def test_pop_after_refill(self):
+        from .LHC_Simulator import collision_at, prepare_collision
+
+        stock = reservoir.EventReservoir(events_per_config=8, runner=self.runner, min_requests=3)
+        # Пока конфигурацию не запросили min_requests раз, запас не заводится
+        self.assertIsNone(stock.pop(self.options()))
+        self.assertIsNone(stock.pop(self.options()))
+        self.assertEqual(self.runs, [])
+        self.assertIsNone(stock.pop(self.options()))
+        wait_for(lambda: stock.stats()["events"] == 8)
+
+        # Пакет разыгран при нижней границе интервала энергии, не выше запроса
+        (_, _, bucket_energy, n_events), = self.runs
+        self.assertEqual(n_events, 8)
+        self.assertLessEqual(bucket_energy, 50.0)
+
+        result = stock.pop(self.options())
+        self.assertIsNotNone(result)
+        values = result[2][0]
+        self.assertIsNone(values["seed"])
+        self.assertEqual(values["source"], "reservoir")
+        # Кинематика - по энергии запроса, а не интервала
+        self.assertAlmostEqual(values["momentum"], collision_at(prepare_collision(11, -11, 1.0), 50.0).momentum)
+        self.assertEqual(stock.stats()["events"], 7)
+        self.assertEqual((stock.hits, stock.misses), (1, 3))
+
+    def test_refill_below_half(self):
+        stock = reservoir.EventReservoir(events_per_config=8, runner=self.runner, min_requests=1)
+        stock.pop(self.options())
+        wait_for(lambda: stock.stats()["events"] == 8)
+        for _ in range(4):
+            self.assertIsNotNone(stock.pop(self.options()))
+        self.assertEqual(len(self.runs), 1)
+        # Запас опустился ниже половины - дозаказываются недостающие события
+        self.assertIsNotNone(stock.pop(self.options()))
+        wait_for(lambda: stock.stats()["events"] == 8)
+        self.assertEqual(self.runs[1][3], 5)
+
+    def test_unsupported_options(self):
+        stock = reservoir.EventReservoir(runner=self.runner, min_requests=1)
+        self.assertIsNone(stock.pop({"id_1": "11", "id_2": -11, "Energy": 50.0}))
+        self.assertIsNone(stock.pop(self.options(energy=0.0)))
+        self.assertEqual(stock.stats()["configs"], 0)
+
+    def test_memory_eviction(self):
+        stock = reservoir.EventReservoir(events_per_config=8, runner=self.runner, min_requests=1)
+        stock.pop(self.options(50.0))
+        wait_for(lambda: stock.stats()["events"] == 8)
+        # Бюджет памяти - на один запас: новая конфигурация вытесняет давнюю
+        stock.memory_budget = stock.stats()["bytes"]
+        stock.pop(self.options(5.0, 13, 13))
+        wait_for(lambda: len(self.runs) == 2 and stock.stats()["events"] == 8)
+        self.assertEqual(stock.stats()["configs"], 1)
+        self.assertIsNone(stock.pop(self.options(50.0)))
+
+    def test_max_configs(self):
+        stock = reservoir.EventReservoir(runner=self.runner, min_requests=100, max_configs=2)
+        for energy in (1.0, 10.0, 100.0):
+            stock.pop(self.options(energy))
+        self.assertEqual(stock.stats()["configs"], 2)
+
+
+class GetReservoirTest(SimpleTestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, reservoir, "_reservoir", reservoir._reservoir)
+        reservoir._reservoir = None
+
+    @override_settings(SIMULATION_WORKERS=0, SIMULATION_RESERVOIR_EVENTS=256)
+    def test_no_reservoir_without_pool(self):
+        self.assertIsNone(reservoir.get_reservoir())
+
+    @override_settings(SIMULATION_WORKERS=1, SIMULATION_RESERVOIR_EVENTS=0)
+    def test_disabled(self):
+        self.assertIsNone(reservoir.get_reservoir())
@@ -0,0 +1,80 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from .sampling import AliasTable
+
+
+class AliasTableTest(SimpleTestCase):
+
+    def test_distribution(self):
+        rows = [10, 11, 12, 13, 14]
+        weights = [1.0, 2.0, 3.0, 0.0, 4.0]
+        table = AliasTable(rows, weights)
+        self.assertEqual(len(table), 4)
+
+        draws = table.draw(np.random.default_rng(0), size=200_000)
+        counts = {row: int(np.count_nonzero(draws == row)) for row in rows}
+        self.assertEqual(counts[13], 0)
+        for row, weight in zip(rows, weights):
+            self.assertAlmostEqual(counts[row] / len(draws), weight / 10.0, delta=0.005)
+
+    def test_same_rng_same_draws(self):
+        table = AliasTable([1, 2, 3], [0.2, 0.5, 0.3])
+        np.testing.assert_array_equal(
+            table.draw(np.random.default_rng(7), size=100),
+            table.draw(np.random.default_rng(7), size=100),
+        )
+
+
+class ThermalSamplerTest(SimpleTestCase):
+    """Тяжёлые состояния остаются достижимыми при тепловых весах"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from .simulation import LoadAll
+        LoadAll()
+
+    def names(self, rows):
+        from .LHC_Simulator import PARTICLES
+        return {PARTICLES.name_of(int(PARTICLES.mcid[row])) for row in rows}
+
+    def test_resonance_cut_is_09_sqrt_s(self):
+        from .LHC_Simulator import prepare_collision, species_sampler
+
+        # √s ≈ 110: W и Z легче 0.9 √s, но тяжелее 0.7 √s
+        collision = prepare_collision(2212, 2212, 6500.0)
+        sampler = species_sampler(collision.interaction_type, collision.sqrt_s)
+        self.assertLessEqual({"W+", "W-", "Z0"}, self.names(sampler.rows))
+        self.assertNotIn("H", self.names(sampler.rows))
+
+    def test_heavy_states_are_drawn(self):
+        from .LHC_Simulator import MIN_RELATIVE_WEIGHT, prepare_collision, species_sampler
+
+        collision = prepare_collision(2212, -2212, 50000.0)
+        sampler = species_sampler(collision.interaction_type, collision.sqrt_s)
+        heavy = {"W+", "W-", "Z0", "H", "t", "tbar", "Upsilon(1S)", "B+"}
+        self.assertLessEqual(heavy, self.names(sampler.rows))
+        self.assertTrue((sampler.weights >= sampler.weights.max() * MIN_RELATIVE_WEIGHT).all())
+
+        draws = sampler.draw(np.random.default_rng(0), size=1_000_000)
+        self.assertLessEqual(heavy, self.names(np.unique(draws)))
+
+    def test_boson_event_from_heavy_resonance(self):
+        from .LHC_Simulator import (
+            animation_type, bin_temperature, prepare_collision, sqrt_s_bin, thermal_weights, try_resonance,
+        )
+
+        # p p~ при √s ≈ 306: H → Z0 γ и t → H u дают события с бозонами
+        collision = prepare_collision(2212, -2212, 50000.0)
+        weights = thermal_weights(collision.interaction_type, bin_temperature(sqrt_s_bin(collision.sqrt_s)))
+        rng = np.random.default_rng(1)
+        for resonance, expected in ((25, "W/Z Boson"), (6, "Higgs Boson")):
+            seen = set()
+            for _ in range(2000):
+                result = try_resonance(resonance, collision.initial_key, collision.sqrt_s * 1.1, weights, rng)
+                if result is not None:
+                    seen.add(animation_type(tuple(result[0])))
+                if expected in seen:
+                    break
+            self.assertIn(expected, seen)
@@ -0,0 +1,76 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from . import simulation
+
+
+class ColdCatalogTestCase(SimpleTestCase):
+    """Каталог процесса на время теста «не загружен»; загрузка подменяется"""
+
+    def setUp(self):
+        for name in ("Load_particle", "particle_list", "resonances", "_load_state", "_load_error"):
+            self.addCleanup(setattr, simulation, name, getattr(simulation, name))
+        simulation.Load_particle = False
+        simulation.particle_list, simulation.resonances = [], []
+        simulation._load_state, simulation._load_error = "cold", None
+
+        self.release = threading.Event()
+        self.calls = 0
+
+        def slow_load():
+            self.calls += 1
+            self.release.wait(5)
+            return ["particle"], ["resonance"]
+
+        patcher = mock.patch.object(simulation, "load_particles", slow_load)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class LoadAllTest(ColdCatalogTestCase):
+
+    def test_single_flight(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(simulation.LoadAll())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        self.assertEqual(simulation.catalog_status()["state"], "loading")
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [(["particle"], ["resonance"])] * 8)
+        self.assertEqual(simulation.catalog_status()["state"], "ready")
+
+    def test_failed_load_is_retried(self):
+        with mock.patch.object(simulation, "load_particles", side_effect=OSError("no snapshot")):
+            with self.assertRaises(OSError):
+                simulation.LoadAll()
+        self.assertEqual(simulation.catalog_status()["state"], "failed")
+
+        self.release.set()
+        simulation.LoadAll()
+        self.assertEqual(simulation.catalog_status()["state"], "ready")
+        self.assertIsNone(simulation.catalog_status()["error"])
+
+
+@override_settings(SIMULATION_WORKERS=0)
+class ReadyEndpointTest(ColdCatalogTestCase):
+
+    def test_503_until_catalog_loaded(self):
+        response = self.client.get("/api/ready", HTTP_HOST="localhost")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["state"], "cold")
+
+        self.release.set()
+        simulation.LoadAll()
+        response = self.client.get("/api/ready", HTTP_HOST="localhost")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            "mode": "inline", "state": "ready", "particles": 1, "resonances": 1, "error": None,
+        })
@@ -0,0 +1,66 @@
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Модули, которые не должны загружаться при обычном старте Django
+# (manage.py, админка, URLconf) - только при первой симуляции
+SIMULATOR_MODULES = ("pdg", "particle", "sqlalchemy", "main.LHC_Simulator")
+
+# Суммарное время импортов при старте (сек): сейчас около 1 с, в основном
+# daphne и django; на медленной машине предел задаётся STARTUP_IMPORT_BUDGET
+STARTUP_IMPORT_BUDGET = float(os.environ.get("STARTUP_IMPORT_BUDGET", "3.0"))
+
+STARTUP_SCRIPT = """
+import django
+django.setup()
+import lhc_simulator.urls
+"""
+
+
+class StartupImportTest(SimpleTestCase):
+    """Бюджет импорта: симулятор не должен утекать в старт Django"""
+
+    def test_simulator_not_imported_on_startup(self):
+        env = dict(os.environ)
+        env.setdefault("DJANGO_SETTINGS_MODULE", "lhc_simulator.settings")
+        env["SIMULATION_WARM_UP"] = "False"
+
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+            cwd=BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr[-2000:])
+
+        # Формат строк: "import time: self [us] | cumulative | imported package",
+        # вложенность - два пробела на уровень перед именем
+        imported = {}
+        total = 0
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|", 2)
+            if cumulative.strip().isdigit():
+                imported[name.strip()] = int(cumulative)
+                if not name.startswith("  "):
+                    total += int(cumulative)
+
+        leaked = sorted(
+            name for name in imported
+            if any(name == m or name.startswith(m + ".") for m in SIMULATOR_MODULES)
+        )
+        self.assertEqual(leaked, [], f"При старте импортированы: {leaked}")
+
+        slowest = sorted(imported.items(), key=lambda item: -item[1])[:5]
+        self.assertLessEqual(
+            total / 1e6, STARTUP_IMPORT_BUDGET,
+            f"Импорты при старте заняли {total / 1e6:.2f} с, самые долгие: {slowest}",
+        )
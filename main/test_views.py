@@ -0,0 +1,133 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+@override_settings(SIMULATION_WORKERS=0, SIMULATION_RESERVOIR_EVENTS=0)
+class SimulationViewTestCase(TestCase):
+    """POST /api/simulation/ от имени пользователя с JWT"""
+
+    URL = "/api/simulation/"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="physicist", email="physicist@example.com", password="x",
+        )
+
+    def post(self, inputs, path=None, user=None, **headers):
+        token = AccessToken.for_user(user or self.user)
+        return self.client.post(
+            path or self.URL, data=json.dumps([inputs]), content_type="application/json",
+            HTTP_HOST="localhost", HTTP_AUTHORIZATION=f"Bearer {token}", **headers,
+        )
+
+
+class SeedValidationTest(SimulationViewTestCase):
+
+    def test_invalid_seed_is_400(self):
+        for seed in ("42", -1, 2 ** 53, 1.5, True):
+            response = self.post({"id_1": 11, "id_2": -11, "Energy": 50.0, "seed": seed})
+            self.assertEqual(response.status_code, 400, seed)
+            self.assertIn("seed must be an integer", response.json()["error"])
+
+    def test_non_object_payload_is_400(self):
+        response = self.post(1)
+        self.assertEqual(response.status_code, 400)
+
+    def test_seed_replays_event(self):
+        inputs = {"id_1": 11, "id_2": -11, "Energy": 50.0, "seed": 2 ** 53 - 1}
+        first = self.post(inputs)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()[2][0]["seed"], 2 ** 53 - 1)
+        self.assertEqual(self.post(inputs).json(), first.json())
+
+
+@override_settings(SIMULATION_PROFILE_TOP=5, SIMULATION_PROFILE_KEEP=2)
+class ProfilingTest(SimulationViewTestCase):
+    """?profile=1 - профиль запроса только для сотрудников"""
+
+    INPUTS = {"id_1": 11, "id_2": -11, "Energy": 50.0, "seed": 7}
+
+    def test_staff_gets_profile(self):
+        from .models import SimulationProfile
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.post(self.INPUTS, path=self.URL + "?profile=1")
+        self.assertEqual(response.status_code, 200)
+        profiled = response.json()
+        profile = profiled[2][0].pop("profile")
+        self.assertEqual(len(profile["top"]), 5)
+        self.assertGreater(profile["seconds"], 0)
+
+        stored = SimulationProfile.objects.get(pk=profile["id"])
+        self.assertEqual((stored.user, stored.options), (self.user, self.INPUTS))
+        # Под профилировщиком - то же событие
+        self.assertEqual(self.post(self.INPUTS).json(), profiled)
+
+        # Хранятся только SIMULATION_PROFILE_KEEP последних
+        for _ in range(2):
+            self.post(self.INPUTS, path=self.URL + "?profile=1")
+        self.assertEqual(SimulationProfile.objects.count(), 2)
+        self.assertFalse(SimulationProfile.objects.filter(pk=profile["id"]).exists())
+
+    def test_profile_ignored_for_other_users(self):
+        from .models import SimulationProfile
+
+        response = self.post(self.INPUTS, path=self.URL + "?profile=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("profile", response.json()[2][0])
+        self.assertFalse(SimulationProfile.objects.exists())
+
+    def test_requires_authentication(self):
+        response = self.client.post(
+            self.URL + "?profile=1", data=json.dumps([self.INPUTS]), content_type="application/json",
+            HTTP_HOST="localhost",
+        )
+        self.assertEqual(response.status_code, 401)
+
+class MetricsAccessTest(SimpleTestCase):
+    """/metrics - только с METRICS_ALLOWED_IPS и не через прокси"""
+
+    def get(self, **meta):
+        return self.client.get("/metrics", HTTP_HOST="localhost", **meta)
+
+    def test_local_collector(self):
+        response = self.get(REMOTE_ADDR="127.0.0.1")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+
+    def test_other_address_or_proxy(self):
+        self.assertEqual(self.get(REMOTE_ADDR="203.0.113.7").status_code, 403)
+        # Запрос через прокси с того же хоста
+        self.assertEqual(self.get(REMOTE_ADDR="127.0.0.1", HTTP_X_FORWARDED_FOR="203.0.113.7").status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=["10.0.0.5"])
+    def test_allowed_ips_setting(self):
+        self.assertEqual(self.get(REMOTE_ADDR="10.0.0.5").status_code, 200)
+        self.assertEqual(self.get(REMOTE_ADDR="127.0.0.1").status_code, 403)
+
+
+class ContentNegotiationTest(SimulationViewTestCase):
+
+    INPUTS = {"id_1": 11, "id_2": -11, "Energy": 50.0, "seed": 3}
+
+    def test_browser_accept_gets_json(self):
+        response = self.post(self.INPUTS, HTTP_ACCEPT="text/html,application/xhtml+xml;q=0.9")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.json()[2][0]["seed"], 3)
+
+    def test_binary(self):
+        from . import formats
+
+        response = self.post(self.INPUTS, HTTP_ACCEPT="application/vnd.lhc.event")
+        self.assertEqual(response["Content-Type"], "application/vnd.lhc.event")
+        self.assertEqual(formats.HEADER.unpack_from(response.content, 0)[0], formats.MAGIC)
+
+    def test_unknown_query_format_is_406(self):
+        response = self.post(self.INPUTS, path=self.URL + "?format=xml")
+        self.assertEqual(response.status_code, 406)
+        self.assertIn("json", response.json()["formats"])
@@ -1,5 +1,5 @@
 from django.urls import path
-from main.views import get_inputs, csrf
+from main.views import get_inputs, csrf, ready, metrics_view
 
 
 urlpatterns = [
@@ -8,4 +8,7 @@ urlpatterns = [
     path('api/simulation/', get_inputs),
     path("api/csrf/", csrf),
     path("api/csrf", csrf),   # чтобы и без слеша работало
+    path("api/ready", ready),
+    path("api/ready/", ready),
+    path("metrics", metrics_view),
 ]
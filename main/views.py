@@ -1,21 +1,23 @@
-from rest_framework.decorators import api_view
-from rest_framework.response import Response
 import json
-from django.http import JsonResponse
-from .LHC_Simulator import SimulationEvent, load_particles
-from django.views.decorators.csrf import ensure_csrf_cookie
-from django.views.decorators.http import require_GET
+import asyncio
+import functools
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from . import formats, metrics
+from .pool import get_pool, readiness, PoolBusy, SimulationTimeout
+from .reservoir import get_reservoir
+from .models import SimulationProfile
+from django.views.decorators.csrf import ensure_csrf_cookie, csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.response import Response
-from accounts.utils import add_simulation_rating
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from accounts.utils import aadd_simulation_rating
 
 
-# Глобальные переменные
-Load_particle = False
-particle_list = []
-resonances = []  # ← Добавь эту переменную!
+_jwt_auth = JWTAuthentication()
+
 
 @require_GET
 @ensure_csrf_cookie
@@ -24,11 +26,87 @@ def csrf(request):
     return JsonResponse({"detail": "CSRF cookie set"})
 
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def get_inputs(request):
+@require_GET
+def ready(request):
+    # Для балансировщика: 503, пока каталог (или пул) не прогрет
+    is_ready, status = readiness()
+    return JsonResponse(status, status=200 if is_ready else 503)
+
+
+@require_GET
+def metrics_view(request):
+    # Только для локального сборщика: не через прокси и не снаружи
+    if (request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS
+            or "HTTP_X_FORWARDED_FOR" in request.META):
+        return HttpResponseForbidden("Forbidden")
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+async def authenticate(request):
+    """JWT-аутентификация как в DRF (IsAuthenticated), но для async-представления"""
     try:
-        data = request.data  # ✅ DRF сам парсит JSON и кэширует body
+        auth = await sync_to_async(_jwt_auth.authenticate)(request)
+    except AuthenticationFailed as e:
+        return None, JsonResponse({"detail": str(e.detail)}, status=401)
+
+    if auth is None:
+        return None, JsonResponse(
+            {"detail": "Authentication credentials were not provided."}, status=401
+        )
+    return auth[0], None
+
+
+async def run_simulation(inputs, profile=0):
+    """
+    Симуляция вне event loop: в пуле процессов или в потоке
+
+    Если клиент отключился, задача отменяется вместе с ожиданием: ещё не
+    начатая симуляция снимается с очереди пула, начатая доработает сама.
+    profile > 0 - симуляция под профилировщиком, результат - пара
+    (результат, профиль).
+    """
+    # Типовые конфигурации - из запаса готовых событий (кроме запросов
+    # с seed и профилируемых). Такое событие не воспроизводится отдельным
+    # зерном: в ответе seed = null и source = "reservoir"
+    if inputs.get('seed') is None and not profile:
+        reservoir = await sync_to_async(get_reservoir, thread_sensitive=False)()
+        if reservoir is not None:
+            result = await sync_to_async(reservoir.pop, thread_sensitive=False)(inputs)
+            if result is not None:
+                metrics.inc("simulation_requests_total", source="reservoir")
+                return result
+
+    pool = await sync_to_async(get_pool, thread_sensitive=False)()
+    if pool is None:
+        # Симулятор импортируется только здесь: загрузка URLconf (manage.py,
+        # админка) не тянет numpy и каталог
+        from .simulation import Collide_Simulation
+        metrics.inc("simulation_requests_total", source="inline")
+        loop = asyncio.get_running_loop()
+        if profile:
+            from .profiling import profile_call
+            return await loop.run_in_executor(
+                None, functools.partial(profile_call, Collide_Simulation, inputs, top=profile)
+            )
+        return await loop.run_in_executor(None, Collide_Simulation, inputs)
+
+    metrics.inc("simulation_requests_total", source="pool")
+    future = asyncio.wrap_future(pool.submit_simulation(inputs, profile))
+    try:
+        return await asyncio.wait_for(future, pool.timeout)
+    except asyncio.TimeoutError:
+        raise SimulationTimeout("Симуляция не завершилась вовремя")
+
+
+@csrf_exempt  # аутентификация по JWT, как у DRF-представлений
+@require_POST
+async def get_inputs(request):
+    user, error = await authenticate(request)
+    if error is not None:
+        return error
+
+    try:
+        data = json.loads(request.body)
     except Exception as e:
         return JsonResponse({"error": f"Invalid JSON: {str(e)}"}, status=400)
 
@@ -36,70 +114,74 @@ def get_inputs(request):
         return JsonResponse({"error": "Payload must be a non-empty list"}, status=400)
 
     inputs = data[0]
+    if not isinstance(inputs, dict):
+        return JsonResponse({"error": "Payload items must be objects"}, status=400)
+
+    # Зерно проверяется до симуляции: ошибка клиента - 400, а не 500
+    if inputs.get("seed") is not None:
+        from .LHC_Simulator import normalize_seed
+        try:
+            normalize_seed(inputs["seed"])
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+    # Формат ответа: ?format= или Accept (ошибки - всегда JSON); 406 - только
+    # для неизвестного ?format=, неподходящий Accept получает json
+    fmt = formats.negotiate(request.GET.get("format"), request.headers.get("Accept"))
+    if fmt is None:
+        return JsonResponse(
+            {"error": "Unsupported response format", "formats": formats.available()}, status=406
+        )
+
+    # ?profile=1 - профиль запроса (только для сотрудников)
+    profile = settings.SIMULATION_PROFILE_TOP if user.is_staff and request.GET.get("profile") == "1" else 0
 
     try:
-        result = Collide_Simulation(inputs)
+        # Симуляция в пуле процессов (если включён), иначе в потоке
+        with metrics.timer("simulation"):
+            result = await run_simulation(inputs, profile)
+
+        if profile:
+            result, report = result
+            stored = await sync_to_async(SimulationProfile.store)(
+                user=user, options=inputs, seconds=report["seconds"], top=report["top"],
+                keep=settings.SIMULATION_PROFILE_KEEP,
+            )
+            result[2][0]["profile"] = {"id": stored.pk, **report}
 
         simulation_type = 'hadron-hadron'
         energy = 13
-        
+
         # Запускаем симуляцию
         simulation_results = result
-        
-        # Добавляем рейтинг
-        rating_update = add_simulation_rating(
-            user=request.user,
-            simulation_type=simulation_type,
-            energy=energy,
-            simulation_results=simulation_results
-        )
 
+        # Добавляем рейтинг
+        with metrics.timer("rating"):
+            rating_update = await aadd_simulation_rating(
+                user=user,
+                simulation_type=simulation_type,
+                energy=energy,
+                simulation_results=simulation_results
+            )
+
+    except asyncio.CancelledError:
+        # Клиент отключился - ожидание уже отменено, ответ не нужен
+        raise
+    except PoolBusy as e:
+        metrics.inc("simulation_responses_total", status=503)
+        return JsonResponse({"error": str(e)}, status=503)
+    except SimulationTimeout as e:
+        metrics.inc("simulation_responses_total", status=504)
+        return JsonResponse({"error": str(e)}, status=504)
     except Exception as e:
+        metrics.swallowed("get_inputs", e)
+        metrics.inc("simulation_responses_total", status=500)
         return JsonResponse({"error": str(e)}, status=500)
 
-    return JsonResponse(result, safe=False)
-
-
-
-def LoadAll():
-    """Загрузка частиц (один раз)"""
-    
-    global Load_particle, particle_list, resonances  # ← ВАЖНО! Объяви все глобальные переменные
-    
-    if Load_particle is False:
-        # Загружаем частицы
-        particle_list, resonances = load_particles()
-        Load_particle = True
-    
-    return particle_list, resonances
-
-
-def Collide_Simulation(options):
-    """Симуляция столкновения"""
-    
-    # Загружаем частицы (если еще не загружены)
-    particle_list, resonances = LoadAll()
-    
-    # Получаем параметры
-    id_1 = options.get('id_1')
-    id_2 = options.get('id_2')
-    E = options.get('Energy')
-    
-    # Проверка входных данных
-    if id_1 is None or id_2 is None or E is None:
-        raise ValueError("Missing required parameters: id_1, id_2, Energy")
-    
-    # Симуляция
-    finals, first_finals, values, init = SimulationEvent(
-        id_1, id_2, E, particle_list, resonances
-    )
-    
-    # Формируем результат
-    result = [
-        finals,
-        first_finals,
-        values,
-        init
-    ]
-    
-    return result
\ No newline at end of file
+    metrics.inc("simulation_responses_total", status=200)
+
+    with metrics.timer("encode", format=fmt):
+        body, content_type = formats.encode(result, fmt)
+    response = HttpResponse(body, content_type=content_type)
+    response["Vary"] = "Accept"
+    return response